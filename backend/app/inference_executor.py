@@ -0,0 +1,130 @@
+# backend/app/inference_executor.py
+# Runs blocking model calls on a dedicated thread pool so the asyncio event
+# loop (and /healthz, Firestore routes, ...) keeps serving during CNN14 passes.
+#
+# Admission control: at most `workers` calls run and `max_queue` wait; beyond
+# that submit raises QueueFullError and the route answers 503 + Retry-After
+# instead of letting latency grow without bound.
+#
+# Env:
+#   FROGNET_INFER_WORKERS  threads running inference (default 8; keep >= FROGNET_MAX_BATCH
+#                          so the micro-batcher can actually see concurrent requests)
+#   FROGNET_MAX_QUEUE      max requests waiting for a worker (default 32)
+
+from __future__ import annotations
+import asyncio, math, os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class QueueFullError(RuntimeError):
+    def __init__(self, depth: int, retry_after: int):
+        super().__init__(f"Inference queue is full ({depth} waiting); retry in {retry_after}s")
+        self.depth = depth
+        self.retry_after = retry_after
+
+
+class InferenceExecutor:
+    def __init__(self, workers: int = 8, max_queue: int = 32):
+        self.workers = max(1, int(workers))
+        self.max_queue = max(0, int(max_queue))
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="frognet-infer")
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._running = 0
+        self._avg_run_s = 0.5          # EWMA of run time, seeds the Retry-After estimate
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "cancelled": 0}
+
+    @classmethod
+    def from_env(cls) -> "InferenceExecutor":
+        return cls(
+            workers=int(os.getenv("FROGNET_INFER_WORKERS", "8")),
+            max_queue=int(os.getenv("FROGNET_MAX_QUEUE", "32")),
+        )
+
+    def retry_after(self) -> int:
+        """Seconds until a queued slot is likely free (at least 1)."""
+        with self._lock:
+            backlog = self._waiting + self._running
+            avg = self._avg_run_s
+        return max(1, math.ceil(backlog * avg / self.workers))
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Tuple[Any, Dict[str, float]]:
+        """
+        Await fn(*args, **kwargs) on a worker thread.
+        Returns (result, {"queue_depth", "queue_ms", "run_ms"}).
+        Raises QueueFullError when the wait queue is at capacity. If the caller
+        is cancelled (client disconnect) while still queued, the call never runs
+        and its queue slot is released.
+        """
+        with self._lock:
+            if self._waiting + self._running >= self.workers + self.max_queue:
+                self.stats["rejected"] += 1
+                depth = self._waiting
+                reject = True
+            else:
+                depth = self._waiting
+                self._waiting += 1
+                self.stats["submitted"] += 1
+                reject = False
+        if reject:
+            raise QueueFullError(depth, self.retry_after())
+
+        t_submit = time.perf_counter()
+        timing: Dict[str, float] = {"queue_depth": depth}
+
+        def _call():
+            t_start = time.perf_counter()
+            with self._lock:
+                self._waiting -= 1
+                self._running += 1
+            timing["queue_ms"] = round((t_start - t_submit) * 1000.0, 2)
+            ok = False
+            try:
+                out = fn(*args, **kwargs)
+                ok = True
+                return out
+            finally:
+                run_s = time.perf_counter() - t_start
+                timing["run_ms"] = round(run_s * 1000.0, 2)
+                with self._lock:
+                    self._running -= 1
+                    self._avg_run_s = 0.8 * self._avg_run_s + 0.2 * run_s
+                    self.stats["completed" if ok else "failed"] += 1
+
+        def _release_if_cancelled(fut):
+            # Cancelled before a worker picked it up: _call never runs, so give the slot back here
+            if fut.cancelled():
+                with self._lock:
+                    self._waiting -= 1
+                    self.stats["cancelled"] += 1
+
+        fut = self._pool.submit(_call)
+        fut.add_done_callback(_release_if_cancelled)
+        result = await asyncio.wrap_future(fut)
+        return result, timing
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self.stats)
+            out.update(waiting=self._waiting, running=self._running,
+                       workers=self.workers, max_queue=self.max_queue,
+                       avg_run_ms=round(self._avg_run_s * 1000.0, 1))
+        return out
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_executor: Optional[InferenceExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> InferenceExecutor:
+    """Process-wide executor, created on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = InferenceExecutor.from_env()
+    return _executor
@@ -1,9 +1,12 @@
 # backend/app/main.py
+import time
+_T0 = time.perf_counter()   # process start, for the /readyz startup report
+
 from fastapi import FastAPI, Depends, File, UploadFile
 from fastapi.security import HTTPBearer
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
-from backend.app.routes import audio, users, recordings, approvals, feedback, auth, admin, settings
 
 # Load env first
 load_dotenv()
@@ -14,7 +17,11 @@ import backend.firebase  # DO NOT remove; sets up credentials/app
 # Routers
 from backend.app.routes import audio, users, recordings, approvals, feedback, auth, admin, settings
 from backend.app.routes import ml_runtime            # -> /ml/predict
+from backend.app.routes import ml_stream             # -> ws /ml/stream
+from backend.app.routes import model as model_routes # -> /model/latest, /model/registry
+from backend.app import metrics                      # -> /metrics (Prometheus)
 #from backend.app.routes import ml as ml_plain        # -> /predict
+_T_ROUTES = time.perf_counter()   # ML imports are deferred, so this stays light
 
 # Makes Swagger show lock icon + handle Authorization header automatically
 security = HTTPBearer()
@@ -34,7 +41,10 @@ app.add_middleware(
 # -------- Public/unprotected routes --------
 app.include_router(auth.router)
 app.include_router(ml_runtime.router)   # /ml/predict
+app.include_router(ml_stream.router)    # ws /ml/stream
 #app.include_router(ml_plain.router)     # /predict
+app.include_router(model_routes.router) # /model/* (writes check admin role)
+app.include_router(metrics.router)      # /metrics
 app.include_router(admin.router)
 app.include_router(settings.router)
 
@@ -49,15 +59,17 @@ app.include_router(feedback.router, dependencies=[Depends(security)])
 # from backend.app.routes import email
 # app.include_router(email.router, dependencies=[Depends(security)])  # re-enable after SMTP config
 
+_T_SERVING = None
+
 @app.on_event("startup")
 def warm_model() -> None:
-    """Load the ML model once on startup to avoid first-request latency."""
-    try:
-        from backend.app.routes.ml_runtime import get_model
-        get_model()
-        print("✅ ML model preloaded")
-    except Exception as e:
-        print(f"⚠️ ML warmup failed: {e}")
+    """Start loading the ML model in the background; the server answers right away."""
+    global _T_SERVING
+    _T_SERVING = time.perf_counter()
+    ml_runtime.start_background_load()
+    # Background scoring of uploads (FROGNET_SCORING_WORKERS=0 disables)
+    from backend.app.scoring_jobs import start_workers
+    start_workers()
 
 @app.get("/")
 def read_root():
@@ -65,8 +77,20 @@ def read_root():
 
 @app.get("/healthz")
 def healthz():
+    """Liveness: the process is up (the model may still be loading)."""
     return {"ok": True}
 
+@app.get("/readyz")
+def readyz():
+    """Readiness: 200 once the model is loaded and warmed up, 503 before that."""
+    ml = ml_runtime.readiness()
+    phases = {"import_app": round((_T_ROUTES - _T0) * 1000.0, 1)}
+    if _T_SERVING is not None:
+        phases["until_serving"] = round((_T_SERVING - _T0) * 1000.0, 1)
+    phases.update(ml["phases_ms"])
+    body = {"ready": ml["state"] == "ready", "model": ml["state"], "error": ml["error"], "startup_ms": phases}
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
 @app.post("/_debug_upload")
 async def _debug_upload(file: UploadFile = File(...)):
     data = await file.read()
@@ -0,0 +1,205 @@
+# backend/app/metrics.py
+# Minimal in-process Prometheus metrics (text exposition format 0.0.4) for
+# the inference path, served at GET /metrics. Self-contained so the API
+# image needs no extra dependency; observe() is a lock + a bisect.
+#
+#   frognet_stage_seconds{stage}         upload_read, decode, resample, gate, student, logmel,
+#                                        cnn14, head, topk, queue_wait, batcher_wait
+#   frognet_gate_windows_total{outcome}  windows kept / skipped by the activity gate
+#   frognet_frog_check_total{outcome}    clips the AudioSet frog check found likely / unlikely
+#   frognet_cascade_total{outcome}       clips the cascade student answered / escalated to CNN14
+#   frognet_request_seconds{endpoint}    end-to-end handler time
+#   frognet_requests_total{endpoint,status}
+#   frognet_batch_rows                   rows per CNN14 batch (micro-batcher)
+#   frognet_clip_seconds                 decoded audio duration
+#   frognet_queue_waiting / _running     inference executor, sampled at scrape
+#   frognet_emb_cache_*                  embedding cache counters, sampled at scrape
+
+from __future__ import annotations
+import bisect, math, threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _fmt_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    return repr(float(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str):
+        self.name, self.doc = name, doc
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Labels:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str):
+        super().__init__(name, doc)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self):
+        with self._lock:
+            return [f"{self.name}{_fmt_labels(k)} {_fmt_value(v)}" for k, v in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """Value pulled from a callback at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, doc: str, fn: Callable[[], Optional[float]]):
+        super().__init__(name, doc)
+        self._fn = fn
+
+    def _samples(self):
+        try:
+            v = self._fn()
+        except Exception:
+            v = None
+        return [] if v is None else [f"{self.name} {_fmt_value(v)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, doc)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, List[float]] = {}  # per label set: bucket counts..., +Inf count, sum
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            s[i] += 1
+            s[-1] += value
+
+    def _samples(self):
+        out = []
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for key, s in sorted(series.items()):
+            cum = 0.0
+            for b, c in zip(self.buckets, s):
+                cum += c
+                out.append(f"{self.name}_bucket{_fmt_labels(key, ('le', _fmt_value(b)))} {_fmt_value(cum)}")
+            cum += s[len(self.buckets)]
+            out.append(f"{self.name}_bucket{_fmt_labels(key, ('le', '+Inf'))} {_fmt_value(cum)}")
+            out.append(f"{self.name}_sum{_fmt_labels(key)} {_fmt_value(s[-1])}")
+            out.append(f"{self.name}_count{_fmt_labels(key)} {_fmt_value(cum)}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for m in metrics:
+            lines += m.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram("frognet_stage_seconds", "Time spent per inference stage."))
+REQUEST_SECONDS = REGISTRY.register(Histogram("frognet_request_seconds", "End-to-end ML request time."))
+REQUESTS = REGISTRY.register(Counter("frognet_requests_total", "ML requests by endpoint and outcome."))
+BATCH_ROWS = REGISTRY.register(Histogram(
+    "frognet_batch_rows", "Rows (windows or clips) per micro-batched CNN14 pass.", (1, 2, 4, 8, 16, 32, 64, 128)))
+CLIP_SECONDS = REGISTRY.register(Histogram(
+    "frognet_clip_seconds", "Decoded audio duration.", (1, 2, 5, 10, 20, 30, 60, 120, 300, 600)))
+GATE_WINDOWS = REGISTRY.register(Counter(
+    "frognet_gate_windows_total", "Windows kept or skipped by the activity gate before CNN14."))
+FROG_CHECKS = REGISTRY.register(Counter(
+    "frognet_frog_check_total", "Clips by outcome of the open-set AudioSet frog check."))
+CASCADE_CLIPS = REGISTRY.register(Counter(
+    "frognet_cascade_total", "Clips answered by the cascade student or escalated to CNN14."))
+NOT_STAGES = ("gate_windows", "gate_kept", "frog_score", "frog_likely", "cascade_clips", "cascade_escalated")
+
+
+def observe_stages(timings_ms: Dict[str, float]):
+    """Record a per-request stage breakdown (ms, as filled in by Predictor.trace_stages)."""
+    if "gate_windows" in timings_ms:
+        kept = timings_ms.get("gate_kept", 0)
+        GATE_WINDOWS.inc(kept, outcome="kept")
+        GATE_WINDOWS.inc(timings_ms["gate_windows"] - kept, outcome="skipped")
+    if "frog_likely" in timings_ms:
+        FROG_CHECKS.inc(outcome="likely" if timings_ms["frog_likely"] else "unlikely")
+    if "cascade_clips" in timings_ms:
+        escalated = timings_ms.get("cascade_escalated", 0)
+        CASCADE_CLIPS.inc(timings_ms["cascade_clips"] - escalated, outcome="student")
+        CASCADE_CLIPS.inc(escalated, outcome="escalated")
+    for stage, ms in timings_ms.items():
+        if stage == "audio_sec":
+            CLIP_SECONDS.observe(ms)
+        elif stage not in NOT_STAGES:
+            STAGE_SECONDS.observe(ms / 1000.0, stage=stage)
+
+
+def observe_batch(rows: int, items: int):
+    """Hook for BatchScheduler.on_batch."""
+    BATCH_ROWS.observe(rows)
+
+
+def register_sampled_gauges(executor_snapshot: Callable[[], dict], cache_snapshot: Callable[[], Optional[dict]]):
+    """Executor / cache gauges, read at scrape time (idempotent)."""
+    def pick(fn, key):
+        def _get():
+            snap = fn()
+            return None if not snap else snap.get(key)
+        return _get
+    for key in ("waiting", "running", "rejected"):
+        REGISTRY.register(Gauge(f"frognet_queue_{key}", f"Inference executor {key}.", pick(executor_snapshot, key)))
+    for key in ("hits", "disk_hits", "misses", "entries", "bytes"):
+        REGISTRY.register(Gauge(f"frognet_emb_cache_{key}", f"Embedding cache {key}.", pick(cache_snapshot, key)))
+
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,5 +1,5 @@
 from __future__ import annotations
-import os, sys, time, tempfile, traceback
+import io, os, sys, threading, time, traceback
 from pathlib import Path
 from typing import Optional
 
@@ -12,39 +12,47 @@ ROUTE_DIR = Path(__file__).resolve().parent          # backend/app/routes
 BACKEND_DIR = ROUTE_DIR.parent.parent                # backend
 MODEL_DIR = BACKEND_DIR / "model"                    # backend/model
 
-# so we can: from Predictor import ...
+# so we can: from Predictor import ... (deferred: torch/librosa are slow to import)
 sys.path.append(str(MODEL_DIR))
 
-from Predictor import from_pretrained, predict_one   # from backend/model/Predictor.py
-
 # You can override this via env var on Cloud Run if needed
 MODEL_FILE = os.getenv("FROGNET_WEIGHTS", "frognet_head_maxprob_a3_k3.pth")
 
 router = APIRouter(tags=["ML"])   # no prefix → we’ll define full paths on routes
 
-
-print(f"[ml_runtime] loading model from {MODEL_DIR} / {MODEL_FILE}")
-_model, _preprocess, _idx_to_class = from_pretrained(str(MODEL_DIR), filename=MODEL_FILE)
-print(f"[ml_runtime] classes: {sorted(_idx_to_class.values())}")
+_model = _preprocess = _idx_to_class = None
+_predict_one = None
+_model_lock = threading.Lock()
 
 
 def get_model():
-    """Used by main.py warmup."""
+    """Load the model on first use (also used by main.py warmup)."""
+    global _model, _preprocess, _idx_to_class, _predict_one
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from Predictor import from_pretrained, predict_one   # from backend/model/Predictor.py
+                print(f"[ml_runtime] loading model from {MODEL_DIR} / {MODEL_FILE}")
+                model, preprocess, idx_to_class = from_pretrained(str(MODEL_DIR), filename=MODEL_FILE)
+                print(f"[ml_runtime] classes: {sorted(idx_to_class.values())}")
+                _preprocess, _idx_to_class, _predict_one = preprocess, idx_to_class, predict_one
+                _model = model
     return _model
 
 
-def _infer(local_path: str, topk: int = 3):
+def _infer(audio, topk: int = 3):
+    """audio: path, bytes or file-like (decoded in memory by Predictor)."""
+    model = get_model()
     t0 = time.perf_counter()
-    name, conf, topk_out = predict_one(local_path, _model, _preprocess, _idx_to_class, topk=topk)
+    name, conf, topk_out = _predict_one(audio, model, _preprocess, _idx_to_class, topk=topk)
     return name, conf, topk_out, (time.perf_counter() - t0) * 1000.0
 
 
-def _save_to_tmp(upload: UploadFile) -> str:
-    suffix = Path(upload.filename or "audio").suffix or ".wav"
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        data = upload.file.read()
-        tmp.write(data)
-        return tmp.name
+def _read_upload(upload: UploadFile) -> io.BytesIO:
+    """Keep the upload in memory; .name is the suffix hint for odd formats."""
+    buf = io.BytesIO(upload.file.read())
+    buf.name = upload.filename or "audio.wav"
+    return buf
 
 
 @router.get("/health-ml")
@@ -71,17 +79,16 @@ async def predict_endpoint(
     if not file and not audio_url:
         return JSONResponse({"error": "No audio provided"}, status_code=400)
 
-    local_path: Optional[str] = None
     try:
         if file:
-            local_path = _save_to_tmp(file)
+            audio = _read_upload(file)
         else:
             return JSONResponse(
                 {"error": "audio_url not supported in this build"},
                 status_code=400,
             )
 
-        name, conf, topk_out, ms = _infer(local_path, topk=topk)
+        name, conf, topk_out, ms = _infer(audio, topk=topk)
         return {
             "species": name,
             "confidence": round(float(conf), 4),
@@ -101,9 +108,3 @@ async def predict_endpoint(
             },
             status_code=500,
         )
-    finally:
-        if local_path and os.path.exists(local_path):
-            try:
-                os.remove(local_path)
-            except Exception:
-                pass
@@ -9,6 +9,7 @@ from google.cloud import firestore
 
 from backend.utils.roles import get_user_role
 from backend import firebase
+from backend.app.scoring_jobs import enqueue_indexing
 from .auth import get_current_user
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
@@ -123,6 +124,9 @@ def update_submission_status(
         }
     )
 
+    if new_status == "approved":
+        enqueue_indexing(recording_id, old_data)
+
     return {"message": f"Recording {recording_id} marked as {new_status}"}
 
 
@@ -226,6 +230,9 @@ def update_status(
         }
     )
 
+    if new_status == "approved":
+        enqueue_indexing(recording_id, old_data)
+
     return {"message": f"Status for {recording_id} updated to {new_status}"}
 
 
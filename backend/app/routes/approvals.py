@@ -6,6 +6,7 @@ from typing import Optional, Dict, List
 from datetime import datetime
 from firebase_admin import firestore
 
+from backend.app.scoring_jobs import enqueue_indexing
 from .auth import get_current_user
 
 router = APIRouter(prefix="/approvals", tags=["Approvals"])
@@ -42,8 +43,11 @@ def create_approval(approval: Approval, admin=Depends(require_admin)):
 
     # 2) mark associated recording as approved
     rec_ref = db.collection("recordings").document(approval.recordingId)
-    if rec_ref.get().exists:
+    rec = rec_ref.get()
+    if rec.exists:
         rec_ref.update({"status": "approved"})
+        if approval.approved:
+            enqueue_indexing(approval.recordingId, rec.to_dict() or {})
 
     # 3) update the expert profile
     expert_ref = db.collection("users").document(approval.expertId)
@@ -6,6 +6,7 @@ from typing import Optional
 import os, uuid
 
 from backend.firebase import db  # Firestore handle
+from backend.app.scoring_jobs import enqueue_scoring, review_source
 
 router = APIRouter()
 
@@ -74,6 +75,9 @@ async def upload_audio(
 
     db.collection("recordings").document(recording_id).set(doc)
 
+    # ML handoff: a scoring worker fills predictedSpecies and moves it to "pending" review
+    enqueue_scoring(recording_id, review_source(path=path))
+
     return {"message": "Audio uploaded", "recordingId": recording_id, "file": filename}
 
 # ===== Serve audio back =====
@@ -1,24 +1,75 @@
 # backend/app/routes/ml_runtime.py
 from __future__ import annotations
 
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from types import SimpleNamespace
+from typing import List
+import asyncio
+import base64
+import binascii
+import importlib
+import io
+import json
 import os
-import shutil
-import tempfile
 import threading
+import time
+import zipfile
 
-# ----  (allow several possible locations) ----
-try:
-    # If model code lives under backend/app/model
-    from backend.app.model.Predictor import from_pretrained, predict_one
-except ModuleNotFoundError:
-    try:
-        # If model code lives under backend/model
-        from backend.model.Predictor import from_pretrained, predict_one
-    except ModuleNotFoundError:
-        # If you kept a top-level /model folder
-        from model.Predictor import from_pretrained, predict_one  # type: ignore
+from backend.app import metrics
+from backend.app.inference_executor import QueueFullError, get_executor
+
+# ---- Deferred ML imports ----
+# torch / librosa / numba take seconds to import, so they are pulled in on
+# first use (normally by the background loader) instead of at app import.
+_PREDICTOR_MODULES = (
+    "backend.app.model.Predictor",  # model code under backend/app/model
+    "backend.model.Predictor",      # model code under backend/model
+    "model.Predictor",              # a top-level /model folder
+)
+_ml = None
+
+def _import_ml() -> SimpleNamespace:
+    """Import Predictor and its siblings from the first location that exists."""
+    global _ml
+    if _ml is not None:
+        return _ml
+    for modname in _PREDICTOR_MODULES:
+        try:
+            pred = importlib.import_module(modname)
+        except ModuleNotFoundError as e:
+            # Only skip when the location itself is missing, not a dependency
+            if e.name and not modname.startswith(e.name):
+                raise
+            continue
+        pkg = modname.rsplit(".", 1)[0]
+
+        def _sibling(mod: str, attr: str):
+            try:
+                return getattr(importlib.import_module(f"{pkg}.{mod}"), attr)
+            except ModuleNotFoundError:
+                return None
+
+        _ml = SimpleNamespace(
+            from_pretrained=pred.from_pretrained,
+            predict_one=pred.predict_one,
+            predict_waves=getattr(pred, "predict_waves", None),
+            predict_embeddings=getattr(pred, "predict_embeddings", None),
+            predict_timeline=getattr(pred, "predict_timeline", None),
+            trace_stages=getattr(pred, "trace_stages", None),
+            RejectedClip=getattr(pred, "RejectedClip", None),
+            PANN_SR=getattr(pred, "PANN_SR", 32000),
+            EmbeddingCache=_sibling("embedding_cache", "EmbeddingCache"),
+            ReplicaPool=_sibling("replicas", "ReplicaPool"),
+            ModelRegistry=_sibling("registry", "ModelRegistry"),
+            VectorIndex=_sibling("vector_index", "VectorIndex"),
+            decode_audio=_sibling("audio_io", "decode_audio"),
+        )
+        return _ml
+    raise ModuleNotFoundError(f"Predictor not found in any of {_PREDICTOR_MODULES}")
 
 router = APIRouter(prefix="/ml", tags=["ml"])
 
@@ -47,15 +98,49 @@ def _resolve_ckpt_dir() -> Path:
 
 CKPT_DIR = _resolve_ckpt_dir()
 
+# ---- Micro-batching (concurrent requests share one CNN14 pass) ----
+# FROGNET_MAX_BATCH=1 disables batching.
+MAX_BATCH = int(os.getenv("FROGNET_MAX_BATCH", "8"))
+MAX_WAIT_MS = float(os.getenv("FROGNET_MAX_WAIT_MS", "5"))
+
+# ---- /predict-batch limits ----
+BATCH_MAX_FILES = int(os.getenv("FROGNET_BATCH_MAX_FILES", "200"))
+BATCH_MAX_MB = float(os.getenv("FROGNET_BATCH_MAX_MB", "512"))       # total decoded-from size
+BATCH_GROUP = int(os.getenv("FROGNET_BATCH_GROUP", "8"))              # clips per CNN14 call
+BATCH_INFLIGHT_GROUPS = int(os.getenv("FROGNET_BATCH_INFLIGHT_GROUPS", "3"))  # decoded/decoding clips, in groups
+BATCH_QUEUE_WAIT_SEC = float(os.getenv("FROGNET_BATCH_QUEUE_WAIT_SEC", "60"))  # per group, while the executor is full
+DECODE_WORKERS = int(os.getenv("FROGNET_DECODE_WORKERS", "0")) or min(8, os.cpu_count() or 1)
+AUDIO_EXTS = (".wav", ".flac", ".mp3", ".ogg", ".m4a", ".aac", ".mp4", ".3gp", ".caf", ".webm")
+
+# ---- /predict-embeddings limits ----
+# Row width is the served head's input (Pipeline.embed_dim): 2048 for CNN14.
+EMB_MAX_ROWS = int(os.getenv("FROGNET_EMB_MAX_ROWS", "4096"))
+EMB_DTYPES = {"float32": "<f4", "float16": "<f2"}   # little-endian on the wire
+
+# ---- /timeline limits ----
+TIMELINE_MAX_SEC = float(os.getenv("FROGNET_TIMELINE_MAX_SEC", "600"))
+
 # ---- Lazy singletons + lock (thread-safe) ----
 _model = None
 _preprocess = None
 _idx_to_class = None
+_registry = None
+_vector_index = None
 _model_lock = threading.Lock()
 
+# ---- Startup state (read by /readyz) ----
+# state: idle -> loading -> ready | failed; phases_ms breaks the load down
+_startup = {"state": "idle", "error": None, "phases_ms": {}}
+_startup_lock = threading.Lock()
+
+def _phase(name: str, t0: float) -> float:
+    now = time.perf_counter()
+    _startup["phases_ms"][name] = round((now - t0) * 1000.0, 1)
+    return now
+
 def get_model():
     """Load the model once and cache it (thread-safe)."""
-    global _model, _preprocess, _idx_to_class
+    global _model, _preprocess, _idx_to_class, _registry
     if _model is not None:
         return _model, _preprocess, _idx_to_class
 
@@ -66,21 +151,160 @@ def get_model():
                     f"Model folder not found at {CKPT_DIR}. "
                     "Set FROG_MODEL_DIR or place model files under backend/model."
                 )
-            _model, _preprocess, _idx_to_class = from_pretrained(str(CKPT_DIR))
+            t0 = time.perf_counter()
+            ml = _import_ml()
+            _phase("import_predictor", t0)
+            timings: dict = {}
+            model, preprocess, idx_to_class = ml.from_pretrained(str(CKPT_DIR), timings=timings)
+            _startup["phases_ms"].update(timings)
+            if MAX_BATCH > 1 and hasattr(model, "enable_batching"):
+                model.enable_batching(max_batch_size=MAX_BATCH, max_wait_ms=MAX_WAIT_MS)
+                model.scheduler.on_batch = metrics.observe_batch
+            cache = ml.EmbeddingCache.from_env() if ml.EmbeddingCache is not None else None
+            if cache is not None and hasattr(model, "enable_cache"):
+                model.enable_cache(cache)
+            metrics.register_sampled_gauges(get_executor().snapshot,
+                                            lambda: cache.snapshot() if cache is not None else None)
+            # Versioned heads on the shared extractor (FROGNET_REGISTRY_DIR)
+            if ml.ModelRegistry is not None and hasattr(model, "with_head"):
+                _registry = ml.ModelRegistry.from_env(model, idx_to_class)
+            _model, _preprocess, _idx_to_class = model, preprocess, idx_to_class
     return _model, _preprocess, _idx_to_class
 
+def get_registry():
+    """The model registry, or None if FROGNET_REGISTRY_DIR is unset (loads the model)."""
+    get_model()
+    return _registry
+
+def get_vector_index():
+    """
+    Embedding index for similar-recording search (FROGNET_INDEX_DIR, default
+    backend/vector_index), sized and keyed by the served extractor (loads the model).
+    """
+    global _vector_index
+    if _vector_index is None:
+        model, _, _ = get_model()
+        with _model_lock:
+            if _vector_index is None:
+                VectorIndex = _import_ml().VectorIndex
+                if VectorIndex is None:
+                    raise RuntimeError("vector_index module not found next to Predictor")
+                _vector_index = VectorIndex.from_env(str(Path(__file__).resolve().parents[2] / "vector_index"),
+                                                     dim=model.embed_dim, ident=model.cache_ident())
+    return _vector_index
+
+def get_serving_model(info: dict | None = None):
+    """
+    (model, preprocess, idx_to_class) for one request: the registry's canary
+    or active head when a registry is configured. Snapshot it once per request
+    so a hot swap can't change heads mid-way; info gets model_version.
+    """
+    model, preprocess, idx_to_class = get_model()
+    if _registry is not None:
+        hv = _registry.select()
+        model, idx_to_class = hv.model, hv.idx_to_class
+        if info is not None:
+            info["model_version"] = hv.version
+    return model, preprocess, idx_to_class
+
+def _replica_head(info: dict | None = None):
+    """
+    Registry head for one replica job, snapshotted like get_serving_model:
+    (version, dir, weights), or None for the checkpoint the replicas loaded.
+    A replica scores with exactly that head or fails the job, so info's
+    model_version is the version that answered.
+    """
+    if _registry is None:
+        return None
+    hv = _registry.select()
+    if info is not None:
+        info["model_version"] = hv.version
+    src = _registry.head_source(hv.version)
+    return None if src is None else (hv.version, *src)
+
+def _warmup(model):
+    """One pass on 2 s of silence: allocator, oneDNN kernels and ORT graph init."""
+    if not hasattr(model, "score_wave"):
+        return
+    import numpy as np
+    model.score_wave(np.zeros(int(2.0 * _import_ml().PANN_SR), dtype=np.float32))
+
+# ---- Multi-process replicas (FROGNET_REPLICAS=N; 0 keeps inference in-process) ----
+_replicas = None
+_replicas_started = False
+
+def get_replica_pool():
+    """Start the replica pool once if FROGNET_REPLICAS > 0, else return None."""
+    global _replicas, _replicas_started
+    if _replicas_started:
+        return _replicas
+    with _model_lock:
+        if not _replicas_started:
+            if int(os.getenv("FROGNET_REPLICAS", "0")) > 0:
+                ReplicaPool = _import_ml().ReplicaPool
+                if ReplicaPool is not None:
+                    _replicas = ReplicaPool.from_env(str(CKPT_DIR))
+            _replicas_started = True
+    return _replicas
+
+def _load_in_background():
+    t0 = time.perf_counter()
+    try:
+        pool = get_replica_pool()
+        if pool is not None:
+            pool.wait_ready()
+            _phase("replicas_ready", t0)
+            print(f"✅ ML replicas ready: {pool.replicas} x {pool.threads_per_replica} threads")
+            if os.getenv("FROGNET_REGISTRY_DIR"):
+                t1 = time.perf_counter()
+                get_registry()   # replicas serve its active / canary heads (see _replica_head)
+                _phase("registry", t1)
+        else:
+            model, _, _ = get_model()
+            t1 = time.perf_counter()
+            _warmup(model)
+            _phase("warmup", t1)
+            print("✅ ML model preloaded")
+        _phase("model_total", t0)
+        _startup["state"] = "ready"
+    except Exception as e:
+        _startup["state"] = "failed"
+        _startup["error"] = f"{type(e).__name__}: {e}"
+        print(f"⚠️ ML warmup failed: {e}")
+
+def start_background_load() -> None:
+    """Kick off model loading without blocking server startup (idempotent)."""
+    with _startup_lock:
+        if _startup["state"] != "idle":
+            return
+        _startup["state"] = "loading"
+    threading.Thread(target=_load_in_background, name="frognet-model-load", daemon=True).start()
+
+def readiness() -> dict:
+    """Snapshot of the model load state and per-phase timings."""
+    return {"state": _startup["state"], "error": _startup["error"], "phases_ms": dict(_startup["phases_ms"])}
+
 # ---- Plain function used by the HTTP layer (ml.py) ----
-def predict_file(path: str, topk: int = 3):
+def predict_file(path, topk: int = 3, info: dict | None = None):
     """
     Wrapper used by the /predict endpoint.
+    `path` may be a filesystem path, raw bytes or a file-like object.
+    `info`, if given, receives extras such as the serving model_version and
+    the per-stage breakdown (timings_ms, in-process only).
     Always returns (name: str, confidence: float, topk_list: list[tuple[str, float]]).
     """
-    model, preprocess, idx_to_class = get_model()
-    try:
-        result = predict_one(path, model, preprocess, idx_to_class, topk=topk)  # type: ignore[misc]
-    except TypeError:
-        # Older Predictor signature without topk
-        result = predict_one(path, model, preprocess, idx_to_class)
+    info = info if info is not None else {}
+    pool = get_replica_pool()
+    if pool is not None:
+        result = pool.predict(path, topk=topk, head=_replica_head(info))
+    else:
+        model, preprocess, idx_to_class = get_serving_model(info)
+        try:
+            result = _import_ml().predict_one(path, model, preprocess, idx_to_class, topk=topk,  # type: ignore[misc]
+                                              timings=info.setdefault("timings_ms", {}))
+        except TypeError:
+            # Older Predictor signature without topk
+            result = _import_ml().predict_one(path, model, preprocess, idx_to_class)
 
     # Normalize to a stable shape
     if isinstance(result, tuple) and len(result) == 3:
@@ -100,6 +324,63 @@ def predict_file(path: str, topk: int = 3):
     topk_list = [(str(s), float(c)) for s, c in list(topk_list)]
     return name, conf, topk_list
 
+@router.get("/cache")
+def cache_stats():
+    """Embedding cache hit/miss counters (FROGNET_EMB_CACHE_MB=0 disables the cache)."""
+    model, _, _ = get_model()
+    cache = getattr(model, "cache", None)
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.snapshot()}
+
+@router.get("/index")
+def index_stats():
+    """Similar-recording embedding index: size, IVF lists, probes per query."""
+    return get_vector_index().snapshot()
+
+@router.get("/queue")
+def queue_stats():
+    """Inference executor load: waiting/running requests and rejections."""
+    out = get_executor().snapshot()
+    pool = get_replica_pool()
+    if pool is not None:
+        out["replicas"] = pool.loads()
+    return out
+
+@router.get("/jobs")
+def job_stats():
+    """Background scoring queue: depth, lag, throughput and worker counters."""
+    from backend.app.scoring_jobs import get_job_queue, get_workers
+    workers = get_workers()
+    return {"queue": get_job_queue().stats(), "workers": workers.snapshot() if workers else None}
+
+def _overloaded(e: QueueFullError) -> JSONResponse:
+    return JSONResponse(
+        {"ok": False, "error": str(e), "queue_depth": e.depth},
+        status_code=503,
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+def _finish_stages(info: dict, **extra_ms):
+    """
+    Record the request's stage breakdown; move the activity gate's window
+    counts to info["gate"], the frog check to is_frog_likely / frog_score
+    and the cascade's clip counts to info["cascade"].
+    """
+    stages = info.setdefault("timings_ms", {})
+    stages.update(extra_ms)
+    metrics.observe_stages(stages)
+    if "gate_windows" in stages:
+        n, kept = int(stages.pop("gate_windows")), int(stages.pop("gate_kept", 0))
+        info["gate"] = {"windows": n, "kept": kept, "skipped_ratio": round(1.0 - kept / max(n, 1), 3)}
+    if "frog_likely" in stages:
+        info["is_frog_likely"] = bool(stages.pop("frog_likely"))
+        info["frog_score"] = round(stages.pop("frog_score", 0.0), 4)
+    if "cascade_clips" in stages:
+        info["cascade"] = {"clips": int(stages.pop("cascade_clips")),
+                           "escalated": int(stages.pop("cascade_escalated", 0))}
+    info["timings_ms"] = {k: round(v, 2) for k, v in stages.items()}
+
 # ---- Optional route (only used if you include router in main) ----
 @router.post("/predict")
 async def predict(
@@ -107,14 +388,20 @@ async def predict(
     lat: float | None = Form(None),
     lon: float | None = Form(None),
 ):
-    # Save uploaded audio to a temp file
-    suffix = Path(file.filename or "").suffix or ".wav"
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        shutil.copyfileobj(file.file, tmp)
-        tmp_path = Path(tmp.name)
+    t_req = time.perf_counter()
+    # Decode straight from memory; .name lets the decoder pick a temp-file
+    # suffix in the rare case a format can't be read from a pipe
+    buf = io.BytesIO(await file.read())
+    buf.name = file.filename or "audio.wav"
+    upload_ms = (time.perf_counter() - t_req) * 1000.0
 
+    status = "error"
+    info: dict = {}
     try:
-        name, conf, top3 = predict_file(str(tmp_path), topk=3)
+        # Off the event loop; concurrent uploads meet in the batcher
+        (name, conf, top3), timing = await get_executor().run(predict_file, buf, 3, info)
+        _finish_stages(info, upload_read=upload_ms, queue_wait=timing.get("queue_ms", 0.0))
+        status = "ok"
         return {
             "ok": True,
             "species": name,
@@ -122,11 +409,425 @@ async def predict(
             "top3": top3,
             "lat": lat,
             "lon": lon,
+            "queue": timing,
+            **info,
         }
+    except QueueFullError as e:
+        status = "overloaded"
+        return _overloaded(e)
     except Exception as e:
+        rejected = _import_ml().RejectedClip
+        if rejected is not None and isinstance(e, rejected):
+            # Activity gate / frog check: nothing for the head to classify
+            status = e.reason
+            _finish_stages(info, upload_read=upload_ms)
+            return JSONResponse({"ok": False, "error": str(e), "rejected": e.reason,
+                                 "lat": lat, "lon": lon, **info}, status_code=422)
         raise HTTPException(status_code=400, detail=f"Prediction failed: {e}") from e
     finally:
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - t_req, endpoint="predict")
+        metrics.REQUESTS.inc(endpoint="predict", status=status)
+
+
+# ---- Per-window call timeline for long recordings ----
+def timeline_file(path, topk: int = 3, win_sec: float | None = None, hop_sec: float | None = None,
+                  merge: bool = False, min_conf: float = 0.5, info: dict | None = None) -> dict:
+    """
+    Wrapper used by /timeline (see Predictor.predict_timeline). Always runs
+    in-process, also when replicas serve /predict; info gets model_version
+    and timings_ms.
+    """
+    info = info if info is not None else {}
+    model, _, idx_to_class = get_serving_model(info)
+    ml = _import_ml()
+    if ml.predict_timeline is None or not hasattr(model, "score_timeline"):
+        raise RuntimeError("This Predictor does not support timelines")
+    return ml.predict_timeline(path, model, idx_to_class, topk=topk, win_sec=win_sec, hop_sec=hop_sec,
+                               merge=merge, min_conf=min_conf, max_sec=TIMELINE_MAX_SEC,
+                               timings=info.setdefault("timings_ms", {}))
+
+@router.post("/timeline")
+async def timeline(
+    file: UploadFile = File(...),
+    topk: int = Form(3),
+    merge: bool = Form(False),
+    min_conf: float = Form(0.5),
+    win_sec: float | None = Form(None),
+    hop_sec: float | None = Form(None),
+):
+    """
+    Per-window timeline of a recording (up to FROGNET_TIMELINE_MAX_SEC):
+      {"ok", "duration_sec", "win_sec", "hop_sec",
+       "windows": [{"start", "end", "top": [[label, p], ...]}],
+       "species", "confidence", "topk",            # whole-clip aggregate
+       "segments": [{"start", "end", "species", "confidence",
+                     "mean_confidence", "windows"}]}   # with merge=true
+    win_sec / hop_sec default to the model's inference config. merge joins
+    adjacent windows with the same top class (p >= min_conf) into call segments.
+    """
+    t_req = time.perf_counter()
+    if win_sec is not None and not 0.5 <= win_sec <= 10.0:
+        raise HTTPException(status_code=400, detail="win_sec must be between 0.5 and 10")
+    if hop_sec is not None and not 0.1 <= hop_sec <= (win_sec or 10.0):
+        raise HTTPException(status_code=400, detail="hop_sec must be between 0.1 and win_sec")
+    buf = io.BytesIO(await file.read())
+    buf.name = file.filename or "audio.wav"
+    upload_ms = (time.perf_counter() - t_req) * 1000.0
+
+    status = "error"
+    info: dict = {}
+    try:
+        result, timing = await get_executor().run(timeline_file, buf, topk, win_sec, hop_sec, merge, min_conf, info)
+        _finish_stages(info, upload_read=upload_ms, queue_wait=timing.get("queue_ms", 0.0))
+        status = "ok"
+        return {"ok": True, **result, "queue": timing, **info}
+    except QueueFullError as e:
+        status = "overloaded"
+        return _overloaded(e)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Timeline failed: {e}") from e
+    finally:
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - t_req, endpoint="timeline")
+        metrics.REQUESTS.inc(endpoint="timeline", status=status)
+
+
+# ---- Head-only prediction from precomputed CNN14 embeddings ----
+def _parse_embeddings(raw: bytes, dtype: str, dim: int):
+    """Little-endian float32/float16 bytes -> float32 array [N, dim] (400/413 on bad input)."""
+    import numpy as np
+    if dtype not in EMB_DTYPES:
+        raise HTTPException(status_code=400, detail=f"dtype must be one of {sorted(EMB_DTYPES)}")
+    dt = np.dtype(EMB_DTYPES[dtype])
+    row_bytes = dim * dt.itemsize
+    if not raw or len(raw) % row_bytes:
+        raise HTTPException(status_code=400,
+                            detail=f"Body must be N x {dim} {dtype} values ({row_bytes} bytes per row), got {len(raw)} bytes")
+    n = len(raw) // row_bytes
+    if n > EMB_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {EMB_MAX_ROWS} embeddings per request")
+    emb = np.frombuffer(raw, dtype=dt).reshape(n, dim).astype(np.float32)
+    if not np.isfinite(emb).all():
+        raise HTTPException(status_code=400, detail="Embeddings contain NaN or Inf")
+    return emb
+
+def predict_embedding_rows(emb, topk: int = 3, windows: bool = False, info: dict | None = None,
+                           serving: tuple | None = None):
+    """
+    Head + softmax only on [N, embed_dim] embeddings; info gets model_version
+    and timings_ms. serving: a get_serving_model() snapshot to score with.
+    """
+    info = info if info is not None else {}
+    model, _, idx_to_class = serving or get_serving_model(info)
+    ml = _import_ml()
+    if ml.predict_embeddings is None or not hasattr(model, "logits_from_embeddings"):
+        raise RuntimeError("This Predictor does not support head-only scoring")
+    with ml.trace_stages(info.setdefault("timings_ms", {})):
+        return ml.predict_embeddings(emb, model, idx_to_class, topk=topk, windows=windows)
+
+@router.post("/predict-embeddings")
+async def predict_from_embeddings(
+    request: Request,
+    dtype: str = "float32",
+    topk: int = 3,
+    windows: bool = False,
+):
+    """
+    Species head only, for callers that run CNN14 themselves.
+
+    Body, either:
+      - application/octet-stream: N x D little-endian float32 or float16
+        values (?dtype=float16), row-major, D the served extractor's
+        embedding width (2048 for CNN14; "dim" in /ml/index);
+      - application/json: {"embeddings": "<base64 of the same bytes>",
+        "dtype": "float16", "topk": 3, "windows": false}.
+    Each row is one clip; ?windows=true treats the rows as windows of a single
+    clip and aggregates them as the windowed audio path does.
+    """
+    t_req = time.perf_counter()
+    status = "error"
+    try:
+        raw = await request.body()
+        if request.headers.get("content-type", "").split(";")[0].strip() == "application/json":
+            try:
+                body = json.loads(raw)
+                raw = base64.b64decode(body["embeddings"], validate=True)
+                dtype = body.get("dtype", dtype)
+                if not isinstance(dtype, str):
+                    raise TypeError(f"'dtype' must be a string, got {type(dtype).__name__}")
+                topk = body.get("topk", topk)
+                if isinstance(topk, bool) or not isinstance(topk, int):
+                    raise TypeError(f"'topk' must be an integer, got {topk!r}")
+                windows = body.get("windows", windows)
+                if not isinstance(windows, bool):
+                    raise TypeError(f"'windows' must be true or false, got {windows!r}")
+            except (ValueError, KeyError, TypeError, AttributeError, binascii.Error) as e:
+                raise HTTPException(status_code=400,
+                                    detail=f"Expected JSON with base64 'embeddings': {type(e).__name__}: {e}")
+        info: dict = {}
+        try:
+            serving = await run_in_threadpool(get_serving_model, info)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Prediction failed: {e}") from e
+        emb = _parse_embeddings(raw, dtype, serving[0].embed_dim)
+
+        try:
+            results = await run_in_threadpool(predict_embedding_rows, emb, topk, windows, info, serving)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Prediction failed: {e}") from e
+        metrics.observe_stages(info["timings_ms"])
+        info["timings_ms"] = {k: round(v, 3) for k, v in info["timings_ms"].items()}
+        status = "ok"
+        return {
+            "ok": True,
+            "count": len(results),
+            "results": [
+                {"species": name, "confidence": conf, "topk": [(s, c) for s, c in top]}
+                for name, conf, top in results
+            ],
+            **info,
+        }
+    finally:
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - t_req, endpoint="predict-embeddings")
+        metrics.REQUESTS.inc(endpoint="predict-embeddings", status=status)
+
+
+# ---- Batch prediction: many files or one zip, NDJSON out ----
+_decode_pool = None
+
+def _get_decode_pool() -> ThreadPoolExecutor:
+    global _decode_pool
+    if _decode_pool is None:
+        with _model_lock:
+            if _decode_pool is None:
+                _decode_pool = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="frognet-decode")
+    return _decode_pool
+
+async def _read_uploads(files: List[UploadFile], chunk: int = 1 << 20) -> List[tuple]:
+    """[(name, bytes)] read chunk by chunk; 413 as soon as the batch limits are crossed."""
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_FILES} files")
+    limit, total, out = BATCH_MAX_MB * (1 << 20), 0, []
+    for i, f in enumerate(files):
+        parts = []
+        while True:
+            data = await f.read(chunk)
+            if not data:
+                break
+            total += len(data)
+            if total > limit:
+                raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_MB:g} MB")
+            parts.append(data)
+        out.append((f.filename or f"file{i}", b"".join(parts)))
+    return out
+
+def _expand_uploads(items: List[tuple]) -> List[tuple]:
+    """[(name, bytes)] with any .zip replaced by its audio members; enforces the batch limits."""
+    out, total = [], 0
+    for name, data in items:
+        if name.lower().endswith(".zip") or zipfile.is_zipfile(io.BytesIO(data)):
+            try:
+                zf = zipfile.ZipFile(io.BytesIO(data))
+            except zipfile.BadZipFile as e:
+                raise HTTPException(status_code=400, detail=f"{name}: {e}")
+            for info in zf.infolist():
+                base = info.filename.rsplit("/", 1)[-1]
+                if info.is_dir() or base.startswith(".") or "__MACOSX/" in info.filename:
+                    continue
+                if not base.lower().endswith(AUDIO_EXTS):
+                    continue
+                total += info.file_size  # declared size: checked before inflating
+                if total > BATCH_MAX_MB * (1 << 20):
+                    raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_MB:g} MB")
+                out.append((info.filename, zf.read(info)))
+        else:
+            total += len(data)
+            out.append((name, data))
+        if total > BATCH_MAX_MB * (1 << 20):
+            raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_MB:g} MB")
+        if len(out) > BATCH_MAX_FILES:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_FILES} files")
+    if not out:
+        raise HTTPException(status_code=400, detail="No audio files in the upload.")
+    return out
+
+def _decode_one(name: str, data: bytes):
+    ml = _import_ml()
+    buf = io.BytesIO(data)
+    buf.name = name
+    y = ml.decode_audio(buf, ml.PANN_SR)
+    if y.size == 0:
+        raise ValueError("Decoded audio is empty.")
+    return y
+
+def _predict_group(model, idx_to_class, group, topk):
+    waves = [y for _, _, y, _ in group]
+    datas = [d for _, _, _, d in group]
+    return _import_ml().predict_waves(waves, model, idx_to_class, topk=topk, datas=datas)
+
+def _try_decode(item):
+    try:
+        return _decode_one(*item)
+    except Exception as e:
+        return e
+
+def predict_many(items: List[tuple], topk: int = 3, info: dict | None = None) -> list:
+    """
+    Synchronous batch scoring for background jobs: [(name, bytes)] ->
+    per item (name, confidence, topk_list), or the exception that item raised.
+    """
+    pool = get_replica_pool()
+    if pool is not None:
+        head = _replica_head(info)
+        futs = [pool.submit(data, topk, head) for _, data in items]
+        out = []
+        for f in futs:
+            try:
+                out.append(f.result())
+            except Exception as e:
+                out.append(e)
+        return out
+
+    model, _, idx_to_class = get_serving_model(info)
+    decoded = list(_get_decode_pool().map(_try_decode, items))
+    out: list = [y if isinstance(y, Exception) else None for y in decoded]
+    ok = [(i, name, y, data) for i, ((name, data), y) in enumerate(zip(items, decoded))
+          if not isinstance(y, Exception)]
+    for g in range(0, len(ok), BATCH_GROUP):
+        group = ok[g:g + BATCH_GROUP]
+        try:
+            results = _predict_group(model, idx_to_class, group, topk)
+        except Exception as e:
+            results = [e] * len(group)
+        for (i, _, _, _), res in zip(group, results):
+            out[i] = res
+    return out
+
+def embed_many(items: List[tuple]) -> list:
+    """
+    [(name, bytes)] -> per item a clip embedding (embed_dim,) float32, or the
+    exception that item raised. Windowed mode averages the window embeddings.
+    Runs in-process (replicas only return predictions); cache hits from an
+    earlier scoring of the same bytes skip CNN14.
+    """
+    import numpy as np
+    model, _, _ = get_model()
+    decoded = list(_get_decode_pool().map(_try_decode, items))
+    out: list = [y if isinstance(y, Exception) else None for y in decoded]
+    ok = [i for i, y in enumerate(decoded) if not isinstance(y, Exception)]
+    for g in range(0, len(ok), BATCH_GROUP):
+        group = ok[g:g + BATCH_GROUP]
+        try:
+            scored = model.score_many([decoded[i] for i in group], [items[i][1] for i in group])
+        except Exception as e:
+            scored = [e] * len(group)
+        for i, res in zip(group, scored):
+            out[i] = res if isinstance(res, Exception) else res[0].float().mean(dim=0).numpy().astype(np.float32)
+    return out
+
+def _line(obj) -> bytes:
+    return (json.dumps(obj) + "\n").encode("utf-8")
+
+def _ok_line(idx, name, result):
+    species, conf, topk_list = result
+    return _line({"index": idx, "file": name, "ok": True, "species": str(species),
+                  "confidence": float(conf), "topk": [(str(s), float(c)) for s, c in topk_list]})
+
+def _err_line(idx, name, e):
+    return _line({"index": idx, "file": name, "ok": False, "error": f"{type(e).__name__}: {e}"})
+
+async def _run_group(ex, model, idx_to_class, group, topk):
+    """Score one group, backing off while the executor is full (up to BATCH_QUEUE_WAIT_SEC)."""
+    deadline = time.perf_counter() + BATCH_QUEUE_WAIT_SEC
+    while True:
         try:
-            tmp_path.unlink(missing_ok=True)
-        except Exception:
-            pass
+            results, _ = await ex.run(_predict_group, model, idx_to_class, group, topk)
+            return results
+        except QueueFullError as e:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise
+            await asyncio.sleep(min(float(e.retry_after), remaining))
+
+async def _batch_results(items: List[tuple], topk: int):
+    """
+    Decode in parallel, score decoded clips in groups, yield NDJSON lines as
+    they finish. At most BATCH_INFLIGHT_GROUPS groups of clips are decoding or
+    decoded-but-unscored at a time, so decoded float32 audio can't pile up.
+    """
+    t0 = time.perf_counter()
+    counts = {"ok": 0, "failed": 0}
+    loop = asyncio.get_running_loop()
+    ex = get_executor()
+
+    def emit(line_fn, *args):
+        counts["ok" if line_fn is _ok_line else "failed"] += 1
+        return line_fn(*args)
+
+    pool = get_replica_pool()
+    if pool is not None:
+        # Replicas decode and score themselves; they are the parallelism
+        head = _replica_head()
+        async def _one(i, name, data):
+            try:
+                return i, name, await asyncio.wrap_future(pool.submit(data, topk, head)), None
+            except Exception as e:
+                return i, name, None, e
+        for coro in asyncio.as_completed([_one(i, name, data) for i, (name, data) in enumerate(items)]):
+            i, name, res, err = await coro
+            yield emit(_err_line, i, name, err) if err is not None else emit(_ok_line, i, name, res)
+    else:
+        info: dict = {}
+        model, _, idx_to_class = await loop.run_in_executor(None, get_serving_model, info)
+        decode = _get_decode_pool()
+        todo = iter(enumerate(items))
+        cap = max(1, BATCH_INFLIGHT_GROUPS) * BATCH_GROUP
+        pending: dict = {}
+        ready: list = []
+
+        def refill():
+            while len(pending) + len(ready) < cap:
+                nxt = next(todo, None)
+                if nxt is None:
+                    return
+                i, (name, data) = nxt
+                pending[loop.run_in_executor(decode, _decode_one, name, data)] = (i, name, data)
+
+        refill()
+        while pending or ready:
+            if pending:
+                done, _ = await asyncio.wait(list(pending), return_when=asyncio.FIRST_COMPLETED)
+                for fut in done:
+                    i, name, data = pending.pop(fut)
+                    if fut.exception() is not None:
+                        yield emit(_err_line, i, name, fut.exception())
+                    else:
+                        ready.append((i, name, fut.result(), data))
+                refill()
+            # Score a full group, or whatever is left once decoding is finished
+            while ready and (len(ready) >= BATCH_GROUP or not pending):
+                group, ready = ready[:BATCH_GROUP], ready[BATCH_GROUP:]
+                try:
+                    results = await _run_group(ex, model, idx_to_class, group, topk)
+                except Exception as e:  # incl. a QueueFullError that outlasted the wait: this group only
+                    results = [e] * len(group)
+                for (i, name, _, _), res in zip(group, results):
+                    yield emit(_err_line, i, name, res) if isinstance(res, Exception) else emit(_ok_line, i, name, res)
+            refill()
+
+    yield _line({"done": True, "files": len(items), **counts,
+                 "elapsed_ms": round((time.perf_counter() - t0) * 1000.0, 1)})
+
+@router.post("/predict-batch")
+async def predict_batch(
+    files: List[UploadFile] = File(...),
+    topk: int = Form(3),
+):
+    """
+    Many clips in one request: several `files` parts and/or .zip archives.
+    Streams application/x-ndjson, one line per clip as it finishes:
+      {"index", "file", "ok": true, "species", "confidence", "topk"} or
+      {"index", "file", "ok": false, "error"}
+    followed by {"done": true, "files", "ok", "failed", "elapsed_ms"}.
+    """
+    items = _expand_uploads(await _read_uploads(files))
+    return StreamingResponse(_batch_results(items, topk), media_type="application/x-ndjson")
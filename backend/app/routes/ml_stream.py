@@ -0,0 +1,85 @@
+# backend/app/routes/ml_stream.py
+# Live identification while the user is still recording.
+#
+#   ws://<host>/ml/stream?sr=16000&format=s16le&topk=3&exit_conf=0.9
+#
+# Client -> server: binary frames of raw mono PCM (s16le or f32le at `sr`),
+#                   then the text frame "end" when recording stops.
+# Server -> client: one JSON update per scored 2 s window
+#                   {"type": "partial", "windows", "audio_sec", "species", "confidence", "topk", "done"}
+#                   and a last {"type": "final", ..., "reason": "confident" | "max_duration" | "end" | "empty"}.
+# After a "confident" or "max_duration" final (FROGNET_STREAM_MAX_SEC, 600 s of
+# audio) the server closes the socket with that reason: the remaining audio is
+# never scored.
+from __future__ import annotations
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from backend.app.inference_executor import QueueFullError, get_executor
+from backend.app.routes.ml_runtime import get_serving_model
+
+router = APIRouter(prefix="/ml", tags=["ml"])
+
+MAX_SR = 192000
+
+
+def _streaming():
+    """backend/model/streaming.py, imported on first use (pulls in torch)."""
+    try:
+        from backend.model import streaming
+    except ModuleNotFoundError:
+        import streaming  # type: ignore
+    return streaming
+
+
+def _make_scorer(sr: int, topk: int, exit_conf: float | None, info: dict):
+    model, _, idx_to_class = get_serving_model(info)
+    return _streaming().StreamScorer(model, idx_to_class, in_sr=sr, topk=topk, exit_conf=exit_conf)
+
+
+def _push(scorer, data: bytes, fmt: str):
+    return scorer.push(_streaming().pcm_to_float(data, fmt))
+
+
+@router.websocket("/stream")
+async def stream(
+    ws: WebSocket,
+    sr: int = 16000,
+    format: str = "s16le",
+    topk: int = 3,
+    exit_conf: float | None = None,
+):
+    await ws.accept()
+    if not 8000 <= sr <= MAX_SR or format not in ("s16le", "f32le"):
+        await ws.send_json({"type": "error", "error": "sr must be 8000..192000 and format s16le or f32le"})
+        await ws.close(code=1003)
+        return
+
+    ex = get_executor()
+    info: dict = {}
+    try:
+        # Model load / registry lookup can block: keep it off the event loop too
+        scorer, _ = await ex.run(_make_scorer, sr, topk, exit_conf, info)
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                return
+            if msg.get("bytes"):
+                updates, _ = await ex.run(_push, scorer, msg["bytes"], format)
+                for u in updates:
+                    await ws.send_json({"type": "final" if u["done"] else "partial", **u, **info})
+                if scorer.done:
+                    break
+            elif (msg.get("text") or "").strip().lower() == "end":
+                final, _ = await ex.run(scorer.finish)
+                await ws.send_json({"type": "final", **final, **info})
+                break
+        await ws.close(reason=scorer.reason)
+    except WebSocketDisconnect:
+        return
+    except QueueFullError as e:
+        await ws.send_json({"type": "error", "error": str(e), "retry_after": e.retry_after})
+        await ws.close(code=1013)  # try again later
+    except Exception as e:
+        await ws.send_json({"type": "error", "error": f"{type(e).__name__}: {e}"})
+        await ws.close(code=1011)
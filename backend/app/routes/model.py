@@ -68,3 +68,88 @@ def seed_model_version(admin=Depends(get_current_user)):
         return {"message": f"Seeded latest model version to {DEFAULT_VERSION}"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error seeding model: {e}")
+
+
+# ---------- Local head registry (FROGNET_REGISTRY_DIR) ----------
+# Serving-side counterpart of /latest: which head version this instance runs.
+# Loading happens on the request's worker thread; predictions keep flowing on
+# the old head until the swap. With FROGNET_REPLICAS>0 each job carries the
+# selected version and the replica processes load that head on first use.
+
+def _require_admin(admin: dict):
+    if admin.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admins only")
+
+
+def _registry():
+    from backend.app.routes.ml_runtime import get_registry
+    reg = get_registry()
+    if reg is None:
+        raise HTTPException(status_code=404, detail="Model registry disabled (set FROGNET_REGISTRY_DIR)")
+    return reg
+
+
+def _registry_call(fn, *args):
+    try:
+        return fn(*args)
+    except (FileNotFoundError, ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+class VersionRequest(BaseModel):
+    version: str
+
+
+class CanaryRequest(BaseModel):
+    version: str
+    percent: float
+
+
+@router.get("/registry")
+def registry_state():
+    """Active/pinned/canary versions, rollback history and published versions."""
+    return _registry().snapshot()
+
+
+@router.post("/registry/activate")
+def registry_activate(payload: VersionRequest, admin=Depends(get_current_user)):
+    """Admin-only: load a version in the background and swap it in (pinned until DELETE /registry/pin)."""
+    _require_admin(admin)
+    reg = _registry()
+    _registry_call(reg.activate, payload.version)
+    return reg.snapshot()
+
+
+@router.post("/registry/rollback")
+def registry_rollback(admin=Depends(get_current_user)):
+    """Admin-only: go back to the previously active version (pinned until DELETE /registry/pin)."""
+    _require_admin(admin)
+    reg = _registry()
+    _registry_call(reg.rollback)
+    return reg.snapshot()
+
+
+@router.post("/registry/pin")
+def registry_pin(payload: VersionRequest, admin=Depends(get_current_user)):
+    """Admin-only: serve this version and stop following new publishes."""
+    _require_admin(admin)
+    return _registry_call(_registry().pin, payload.version)
+
+
+@router.delete("/registry/pin")
+def registry_unpin(admin=Depends(get_current_user)):
+    _require_admin(admin)
+    return _registry().unpin()
+
+
+@router.post("/registry/canary")
+def registry_canary(payload: CanaryRequest, admin=Depends(get_current_user)):
+    """Admin-only: route `percent` of predictions to a candidate version."""
+    _require_admin(admin)
+    return _registry_call(_registry().set_canary, payload.version, payload.percent)
+
+
+@router.delete("/registry/canary")
+def registry_clear_canary(admin=Depends(get_current_user)):
+    _require_admin(admin)
+    return _registry().clear_canary()
@@ -1,13 +1,17 @@
 # backend/app/routes/recordings.py
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, status, Query, Body
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 import uuid
 import logging
+import time
 
 from backend.utils.roles import get_user_role
 from backend import firebase
+from backend.app.scoring_jobs import (enqueue_indexing, enqueue_scoring, fetch_audio, review_source,
+                                      source_for_recording)
 from .auth import get_current_user
 
 # Setup logger
@@ -91,8 +95,13 @@ async def upload_audio(
 
         data = metadata.dict()
         data["createdBy"] = metadata.userId
+        data["analysisStatus"] = "queued"
         firebase.db.collection("recordings").document(recording_id).set(data)
 
+        # Scored in the background (backend/app/scoring_jobs.py); the upload returns now.
+        # Rejected clips (no activity / not a frog) skip the expert review queue.
+        enqueue_scoring(recording_id, review_source(blob=filename))
+
         logger.info(f"Audio uploaded: {recording_id}")
         return {"message": "Audio uploaded successfully", "recordingId": recording_id, "audioURL": audio_url}
 
@@ -213,6 +222,52 @@ async def get_recording(recording_id: str, user: CurrentUser = Depends(get_curre
     return normalize_timestamp(data)
 
 
+# ------------------ Similar approved recordings ------------------
+@router.get("/{recording_id}/similar")
+async def similar_recordings(
+    recording_id: str,
+    k: int = Query(10, ge=1, le=100),
+    user: CurrentUser = Depends(get_current_user),
+):
+    """
+    Closest approved recordings by CNN14 embedding (cosine distance, smaller
+    is closer). A recording not indexed yet is embedded on the inference
+    executor, so a full queue answers 503 + Retry-After like /ml/predict.
+    """
+    if get_user_role(user["uid"]) not in ["expert", "admin"]:
+        raise HTTPException(status_code=403, detail="Only experts or admins can search similar recordings")
+
+    from backend.app.inference_executor import QueueFullError, get_executor
+    from backend.app.routes.ml_runtime import embed_many, get_vector_index
+    index = await run_in_threadpool(get_vector_index)
+    vec = index.get(recording_id)
+    if vec is None:  # not indexed yet (e.g. pending): embed its audio now
+        doc = firebase.db.collection("recordings").document(recording_id).get()
+        if not doc.exists:
+            raise HTTPException(status_code=404, detail="Recording not found")
+        source = source_for_recording(doc.to_dict() or {}, firebase.storage.bucket().name)
+        if source is None:
+            raise HTTPException(status_code=422, detail="Recording has no audio to compare")
+        try:
+            item = await run_in_threadpool(fetch_audio, source)
+            (vec,), _ = await get_executor().run(embed_many, [item])
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        except Exception as e:
+            vec = e
+        if isinstance(vec, Exception):
+            raise HTTPException(status_code=422, detail=f"Could not embed recording audio: {vec}")
+
+    t0 = time.perf_counter()
+    hits = await run_in_threadpool(index.search, vec, k=k, exclude=[recording_id])
+    return {
+        "recordingId": recording_id,
+        "results": [{"recordingId": rid, "distance": dist} for rid, dist in hits],
+        "indexed": len(index),
+        "search_ms": round((time.perf_counter() - t0) * 1000.0, 2),
+    }
+
+
 # ------------------ Approve / Reject Recording ------------------
 @router.post("/{recording_id}/approve")
 async def approve_recording(recording_id: str, payload: ReviewPayload = Body(...), user: CurrentUser = Depends(get_current_user)):
@@ -220,7 +275,8 @@ async def approve_recording(recording_id: str, payload: ReviewPayload = Body(...
         raise HTTPException(status_code=403, detail="Only experts or admins can approve recordings")
 
     doc_ref = firebase.db.collection("recordings").document(recording_id)
-    if not doc_ref.get().exists:
+    doc = doc_ref.get()
+    if not doc.exists:
         raise HTTPException(status_code=404, detail="Recording not found")
 
     update_data = {
@@ -235,6 +291,7 @@ async def approve_recording(recording_id: str, payload: ReviewPayload = Body(...
     try:
         doc_ref.update(update_data)
         logger.info(f"Approved recording {recording_id} with: {update_data}")
+        enqueue_indexing(recording_id, doc.to_dict() or {})
         return {"message": f"Recording {recording_id} approved"}
     except Exception as e:
         logger.exception("Failed to approve recording")
@@ -0,0 +1,530 @@
+# backend/app/scoring_jobs.py
+# Durable background scoring of uploaded recordings.
+#
+# Uploads enqueue a job (recording id + where the audio lives) in a local
+# SQLite queue and return immediately. Worker threads lease jobs in batches,
+# fetch the audio, score the batch in one predictor call and write
+# predictedSpecies / confidenceScore / predictedTopK back to Firestore in one
+# batched write.
+#
+# Approved recordings are queued the same way as "index" jobs (key
+# "index:<recording id>"): workers embed the audio and add it to the
+# similar-recordings vector index instead of scoring it.
+#
+#   queued --lease--> leased --ok--> done
+#                       |  \--error--> queued (retry after backoff) ... --> failed
+#                       \--lease expired (worker died)--> redelivered
+#
+# A job only reaches done / failed once its Firestore fields are written: if
+# the write fails, even a last-attempt job goes back to the queue.
+#
+# Env:
+#   FROGNET_JOBS_DB            SQLite file (default backend/jobs.sqlite3)
+#   FROGNET_SCORING_WORKERS    worker threads (default 2; 0 = enqueue only)
+#   FROGNET_SCORING_BATCH      jobs leased and scored together (default 8)
+#   FROGNET_JOB_LEASE_SEC      visibility timeout before redelivery (default 300)
+#   FROGNET_JOB_MAX_ATTEMPTS   attempts before a job is parked as failed (default 5)
+
+from __future__ import annotations
+import json, logging, os, sqlite3, threading, time, urllib.request, uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB = Path(__file__).resolve().parents[1] / "jobs.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    recording_id  TEXT NOT NULL UNIQUE,
+    source        TEXT NOT NULL,            -- JSON: {"blob"|"path"|"url": ..., "status_after": ...}
+    state         TEXT NOT NULL DEFAULT 'queued',
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    available_at  REAL NOT NULL,
+    leased_until  REAL,
+    lease_owner   TEXT,
+    last_error    TEXT,
+    created_at    REAL NOT NULL,
+    finished_at   REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (state, available_at);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at);
+"""
+
+
+class JobQueue:
+    """SQLite-backed queue with leases (visibility timeouts) and retry backoff."""
+
+    def __init__(self, path: str, max_attempts: int = 5, backoff_sec: float = 10.0, max_backoff_sec: float = 900.0):
+        self.path = str(path)
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff_sec = float(backoff_sec)
+        self.max_backoff_sec = float(max_backoff_sec)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        return cls(os.getenv("FROGNET_JOBS_DB", str(DEFAULT_DB)),
+                   max_attempts=int(os.getenv("FROGNET_JOB_MAX_ATTEMPTS", "5")))
+
+    def enqueue(self, recording_id: str, source: Dict[str, Any]):
+        """Add a job; re-enqueueing a known recording resets it to a fresh queued job."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (recording_id, source, available_at, created_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(recording_id) DO UPDATE SET source=excluded.source, state='queued', attempts=0, "
+                "available_at=excluded.available_at, leased_until=NULL, lease_owner=NULL, last_error=NULL, "
+                "finished_at=NULL, created_at=excluded.created_at",
+                (recording_id, json.dumps(source), now, now),
+            )
+
+    def lease(self, owner: str, n: int, lease_sec: float) -> List[Tuple[int, str, Dict[str, Any], int]]:
+        """Claim up to n ready jobs (or jobs whose lease expired): [(id, recording_id, source, attempts)]."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # A job whose lease keeps expiring (e.g. it crashes the worker) is parked
+                self._db.execute(
+                    "UPDATE jobs SET state='failed', finished_at=?, last_error='lease expired after max attempts' "
+                    "WHERE state='leased' AND leased_until<? AND attempts>=?",
+                    (now, now, self.max_attempts),
+                )
+                rows = self._db.execute(
+                    "SELECT id, recording_id, source, attempts FROM jobs "
+                    "WHERE (state='queued' AND available_at<=?) OR (state='leased' AND leased_until<?) "
+                    "ORDER BY available_at LIMIT ?",
+                    (now, now, int(n)),
+                ).fetchall()
+                if rows:
+                    self._db.executemany(
+                        "UPDATE jobs SET state='leased', leased_until=?, lease_owner=?, attempts=attempts+1 WHERE id=?",
+                        [(now + lease_sec, owner, r[0]) for r in rows],
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return [(r[0], r[1], json.loads(r[2]), r[3] + 1) for r in rows]
+
+    def complete(self, job_ids: List[int], owner: str):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "UPDATE jobs SET state='done', finished_at=?, leased_until=NULL, last_error=NULL "
+                "WHERE id=? AND lease_owner=?",
+                [(now, j, owner) for j in job_ids],
+            )
+
+    def fail(self, job_id: int, owner: str, attempts: int, error: str) -> bool:
+        """Record a failure; returns True if the job is parked for good (max attempts)."""
+        now = time.time()
+        final = attempts >= self.max_attempts
+        delay = min(self.max_backoff_sec, self.backoff_sec * (2 ** (attempts - 1)))
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET state=?, available_at=?, leased_until=NULL, last_error=?, finished_at=? "
+                "WHERE id=? AND lease_owner=?",
+                ("failed" if final else "queued", now + delay, error[:2000], now if final else None, job_id, owner),
+            )
+        return final
+
+    def defer(self, job_id: int, owner: str, attempts: int, error: str):
+        """
+        Back to the queue (with the usual backoff) without using up an attempt:
+        the job's outcome could not be recorded, so it must not be parked yet.
+        """
+        now = time.time()
+        delay = min(self.max_backoff_sec, self.backoff_sec * (2 ** (attempts - 1)))
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET state='queued', attempts=MAX(attempts - 1, 0), available_at=?, leased_until=NULL, "
+                "last_error=? WHERE id=? AND lease_owner=?",
+                (now + delay, error[:2000], job_id, owner),
+            )
+
+    def retry_failed(self) -> int:
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE jobs SET state='queued', attempts=0, available_at=?, finished_at=NULL WHERE state='failed'",
+                (time.time(),),
+            )
+            return cur.rowcount
+
+    def stats(self, windows: Tuple[int, ...] = (60, 300, 3600)) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            counts = dict(self._db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+            oldest = self._db.execute(
+                "SELECT MIN(created_at) FROM jobs WHERE state IN ('queued', 'leased')").fetchone()[0]
+            expired = self._db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state='leased' AND leased_until<?", (now,)).fetchone()[0]
+            thr = {}
+            for w in windows:
+                n, lat = self._db.execute(
+                    "SELECT COUNT(*), AVG(finished_at - created_at) FROM jobs "
+                    "WHERE state='done' AND finished_at>=?", (now - w,)).fetchone()
+                thr[f"{w}s"] = {"done": n, "per_min": round(n * 60.0 / w, 2),
+                                "avg_lag_sec": round(lat, 2) if lat is not None else None}
+        return {
+            "queued": counts.get("queued", 0),
+            "leased": counts.get("leased", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "expired_leases": expired,
+            "oldest_pending_age_sec": round(now - oldest, 1) if oldest else 0.0,
+            "throughput": thr,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# ---------------- default fetch / score / write ----------------
+def fetch_audio(source: Dict[str, Any]) -> Tuple[str, bytes]:
+    """(name, encoded bytes) for a job source: Firebase Storage blob, local path or URL."""
+    if source.get("blob"):
+        from backend import firebase
+        name = source["blob"]
+        return name, firebase.storage.bucket().blob(name).download_as_bytes()
+    if source.get("path"):
+        p = Path(source["path"])
+        return p.name, p.read_bytes()
+    if source.get("url"):
+        with urllib.request.urlopen(source["url"], timeout=60) as r:
+            return source["url"].rsplit("/", 1)[-1] or "audio", r.read()
+    raise ValueError(f"Job source has no blob/path/url: {source}")
+
+
+def source_for_recording(data: Dict[str, Any], bucket: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Job source for a recordings doc: local filePath, Storage blob behind audioURL, or plain URL."""
+    path = data.get("filePath")
+    if path and Path(path).is_file():
+        return {"path": path}
+    url = data.get("audioURL") or ""
+    prefix = f"https://storage.googleapis.com/{bucket}/" if bucket else None
+    if prefix and url.startswith(prefix):
+        return {"blob": urllib.request.unquote(url[len(prefix):])}
+    if url.startswith(("http://", "https://")):
+        return {"url": url}
+    return None
+
+
+def result_fields(result: Tuple[str, float, List[Tuple[str, float]]], version: Optional[str]) -> Dict[str, Any]:
+    """Firestore fields for one prediction (same shape for live scoring and backfills)."""
+    species, conf, topk_list = result
+    fields = {
+        "predictedSpecies": str(species),
+        "confidenceScore": float(conf),
+        "predictedTopK": [{"label": str(s), "p": float(p)} for s, p in topk_list],
+        "analysisStatus": "scored",
+        "scoredAt": _server_time(),
+    }
+    if version:
+        fields["predictionModelVersion"] = version
+    return fields
+
+
+def rejected_fields(err: Exception, version: Optional[str]) -> Dict[str, Any]:
+    """Firestore fields for a clip the activity gate / frog check turned away (live scoring and backfills)."""
+    fields = {"analysisStatus": "rejected", "rejectedReason": err.reason,
+              "analysisError": str(err)[:500], "scoredAt": _server_time()}
+    if version:
+        fields["predictionModelVersion"] = version
+    return fields
+
+
+def score_clips(items: List[Tuple[str, bytes]], topk: int) -> Tuple[List[Any], Optional[str]]:
+    """One predictor call for the batch; per-item results or exceptions, plus the model version."""
+    from backend.app.routes.ml_runtime import predict_many
+    info: Dict[str, Any] = {}
+    results = predict_many(items, topk=topk, info=info)
+    return results, info.get("model_version")
+
+
+def index_clips(items: List[Tuple[str, bytes]], recording_ids: List[str]) -> List[Optional[Exception]]:
+    """Embed the batch and add it to the vector index; per item None or the exception it raised."""
+    import numpy as np
+    from backend.app.routes.ml_runtime import embed_many, get_vector_index
+    embs = embed_many(items)
+    ok = [(rid, e) for rid, e in zip(recording_ids, embs) if not isinstance(e, Exception)]
+    if ok:
+        get_vector_index().add_many([rid for rid, _ in ok], np.stack([e for _, e in ok]))
+    return [e if isinstance(e, Exception) else None for e in embs]
+
+
+def write_results(updates: List[Tuple[str, Dict[str, Any]]]):
+    """Apply {recording_id: fields} as one Firestore batch (max 500 writes per commit)."""
+    from backend import firebase
+    for i in range(0, len(updates), 500):
+        batch = firebase.db.batch()
+        for rec_id, fields in updates[i:i + 500]:
+            batch.update(firebase.db.collection("recordings").document(rec_id), fields)
+        batch.commit()
+
+
+def _server_time():
+    try:
+        from firebase_admin import firestore
+        return firestore.SERVER_TIMESTAMP
+    except Exception:
+        return time.time()
+
+
+# ---------------- workers ----------------
+class ScoringWorkers:
+    def __init__(self, queue: JobQueue, workers: int = 2, batch: int = 8, lease_sec: float = 300.0,
+                 topk: int = 3, idle_sleep: float = 1.0,
+                 fetch: Callable = fetch_audio, score: Callable = score_clips, write: Callable = write_results,
+                 index: Callable = index_clips):
+        self.queue = queue
+        self.workers = max(1, int(workers))
+        self.batch = max(1, int(batch))
+        self.lease_sec = float(lease_sec)
+        self.topk = int(topk)
+        self.idle_sleep = float(idle_sleep)
+        self._fetch, self._score, self._write, self._index = fetch, score, write, index
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self.stats = {"batches": 0, "scored": 0, "indexed": 0, "retried": 0, "failed": 0, "busy": 0}
+
+    @classmethod
+    def from_env(cls, queue: JobQueue) -> Optional["ScoringWorkers"]:
+        n = int(os.getenv("FROGNET_SCORING_WORKERS", "2"))
+        if n <= 0:
+            return None
+        return cls(queue, workers=n,
+                   batch=int(os.getenv("FROGNET_SCORING_BATCH", "8")),
+                   lease_sec=float(os.getenv("FROGNET_JOB_LEASE_SEC", "300")))
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"frognet-scoring-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    def run_once(self, owner: Optional[str] = None) -> int:
+        """Lease and process one batch; returns the number of jobs leased."""
+        owner = owner or f"{os.getpid()}-{threading.get_ident()}-{uuid.uuid4().hex[:6]}"
+        jobs = self.queue.lease(owner, self.batch, self.lease_sec)
+        if not jobs:
+            return 0
+        with self._lock:
+            self.stats["busy"] += 1
+        try:
+            self._process(jobs, owner)
+        finally:
+            with self._lock:
+                self.stats["busy"] -= 1
+                self.stats["batches"] += 1
+        return len(jobs)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "workers": self.workers, "batch": self.batch, "lease_sec": self.lease_sec}
+
+    # ---- internals ----
+    def _loop(self):
+        owner = f"{os.getpid()}-{threading.current_thread().name}"
+        while not self._stop.is_set():
+            try:
+                if self.run_once(owner) == 0:
+                    self._stop.wait(self.idle_sleep)
+            except Exception:
+                logger.exception("Scoring worker error")
+                self._stop.wait(self.idle_sleep)
+
+    def _failed(self, job, owner: str, err: Exception, finals: Optional[list] = None):
+        """
+        Retry the job, or park it at max attempts. With `finals` (scoring jobs),
+        a last attempt is only collected there: it is parked once its
+        analysisStatus "failed" is written (see _process_score).
+        """
+        job_id, rec_id, source, attempts = job
+        msg = f"{type(err).__name__}: {err}"
+        if finals is not None and attempts >= self.queue.max_attempts:
+            finals.append((job, msg))
+            return
+        final = self.queue.fail(job_id, owner, attempts, msg)
+        with self._lock:
+            self.stats["failed" if final else "retried"] += 1
+        if final:
+            logger.warning(f"Scoring gave up on {rec_id} after {attempts} attempts: {msg}")
+        else:
+            logger.info(f"Scoring {rec_id} failed (attempt {attempts}), will retry: {msg}")
+
+    def _unwritten(self, job, owner: str, err: Exception):
+        """The Firestore write for this job failed: retry it, never park it unrecorded."""
+        job_id, rec_id, _, attempts = job
+        msg = f"{type(err).__name__}: {err}"
+        if attempts >= self.queue.max_attempts:
+            self.queue.defer(job_id, owner, attempts, msg)
+        else:
+            self.queue.fail(job_id, owner, attempts, msg)
+        with self._lock:
+            self.stats["retried"] += 1
+
+    def _process(self, jobs, owner: str):
+        index_jobs = [j for j in jobs if j[2].get("action") == "index"]
+        if index_jobs:
+            self._process_index(index_jobs, owner)
+        jobs = [j for j in jobs if j[2].get("action") != "index"]
+        if jobs:
+            self._process_score(jobs, owner)
+
+    def _process_index(self, jobs, owner: str):
+        fetched = []
+        for job in jobs:
+            try:
+                fetched.append((job, self._fetch(job[2])))
+            except Exception as e:
+                self._failed(job, owner, e)
+        if not fetched:
+            return
+        try:
+            errors = self._index([item for _, item in fetched], [job[2]["recording_id"] for job, _ in fetched])
+        except Exception as e:  # model or index unavailable: the whole batch retries
+            errors = [e] * len(fetched)
+        done = []
+        for (job, _), err in zip(fetched, errors):
+            if err is None:
+                done.append(job[0])
+            else:
+                self._failed(job, owner, err)
+        if done:
+            self.queue.complete(done, owner)
+            with self._lock:
+                self.stats["indexed"] += len(done)
+
+    def _process_score(self, jobs, owner: str):
+        fetched, updates, finals = [], [], []
+        for job in jobs:
+            try:
+                fetched.append((job, self._fetch(job[2])))
+            except Exception as e:
+                self._failed(job, owner, e, finals)
+
+        done = []
+        if fetched:
+            try:
+                results, version = self._score([item for _, item in fetched], self.topk)
+            except Exception as e:  # model unavailable: the whole batch retries
+                results, version = [e] * len(fetched), None
+            for (job, _), res in zip(fetched, results):
+                if isinstance(res, Exception) and getattr(res, "reason", None):
+                    # Activity gate / frog check turned the clip away: final, no retry
+                    fields = rejected_fields(res, version)
+                    if job[2].get("status_after"):  # kept out of the expert review queue
+                        fields["status"] = "auto_rejected"
+                elif isinstance(res, Exception):
+                    self._failed(job, owner, res, finals)
+                    continue
+                else:
+                    fields = result_fields(res, version)
+                    if job[2].get("status_after"):
+                        fields["status"] = job[2]["status_after"]
+                updates.append((job[1], fields))
+                done.append(job[0])
+
+        updates += [(job[1], {"analysisStatus": "failed", "analysisError": msg[:500]}) for job, msg in finals]
+        if updates:
+            try:
+                self._write(updates)
+            except Exception as e:
+                # Firestore unavailable: nothing was written, so retry every scored job and
+                # keep last-attempt failures queued until their "failed" status is written
+                logger.warning(f"Writing {len(updates)} scoring results failed: {e}")
+                for job in jobs:
+                    if job[0] in done:
+                        self._unwritten(job, owner, e)
+                for job, _ in finals:
+                    self._unwritten(job, owner, e)
+                return
+        for (job_id, rec_id, _, attempts), msg in finals:
+            self.queue.fail(job_id, owner, attempts, msg)
+            logger.warning(f"Scoring gave up on {rec_id} after {attempts} attempts: {msg}")
+        if finals:
+            with self._lock:
+                self.stats["failed"] += len(finals)
+        if done:
+            self.queue.complete(done, owner)
+            with self._lock:
+                self.stats["scored"] += len(done)
+
+
+# ---------------- process-wide singletons ----------------
+_queue: Optional[JobQueue] = None
+_workers: Optional[ScoringWorkers] = None
+_singleton_lock = threading.RLock()
+
+
+def get_job_queue() -> JobQueue:
+    global _queue
+    if _queue is None:
+        with _singleton_lock:
+            if _queue is None:
+                _queue = JobQueue.from_env()
+    return _queue
+
+
+def start_workers() -> Optional[ScoringWorkers]:
+    """Start the scoring workers once (no-op if FROGNET_SCORING_WORKERS=0)."""
+    global _workers
+    with _singleton_lock:
+        if _workers is None:
+            _workers = ScoringWorkers.from_env(get_job_queue())
+            if _workers is not None:
+                _workers.start()
+    return _workers
+
+
+def get_workers() -> Optional[ScoringWorkers]:
+    return _workers
+
+
+def enqueue_indexing(recording_id: str, data: Dict[str, Any]) -> bool:
+    """Queue an approved recording (its Firestore doc) for the similar-recordings index."""
+    try:
+        from backend import firebase
+        source = source_for_recording(data, firebase.storage.bucket().name)
+        if source is None:
+            logger.info(f"Recording {recording_id} has no audio source; not indexed")
+            return False
+        get_job_queue().enqueue(f"index:{recording_id}", {**source, "action": "index", "recording_id": recording_id})
+        return True
+    except Exception:
+        logger.exception(f"Could not enqueue indexing for {recording_id}")
+        return False
+
+
+def review_source(**source: Any) -> Dict[str, Any]:
+    """
+    Job source for a new upload awaiting expert review: scored into "pending",
+    or "auto_rejected" when the activity gate / frog check turns it away.
+    """
+    return {**source, "status_after": "pending"}
+
+
+def enqueue_scoring(recording_id: str, source: Dict[str, Any]) -> bool:
+    """Called from upload routes; never lets a queue problem fail the upload."""
+    try:
+        get_job_queue().enqueue(recording_id, source)
+        return True
+    except Exception:
+        logger.exception(f"Could not enqueue scoring for {recording_id}")
+        return False
@@ -0,0 +1,247 @@
+# backend/benchmarks/predictor_bench.py
+# Micro-benchmarks for backend/model/Predictor.py, written as a flat JSON of
+# metrics that can be diffed across commits.
+#
+#   python -m backend.benchmarks.predictor_bench --out bench.json
+#   python -m backend.benchmarks.predictor_bench --backend random --out bench.json   # offline, no weights
+#   python -m backend.benchmarks.predictor_bench --backend pip --clips backend/uploaded_audios --out pip.json
+#   python -m backend.benchmarks.predictor_bench --compare base.json bench.json --threshold 0.10
+#
+# Metrics (names are stable; the suffix says which direction is better):
+#   embed.<N>s.{p50,p90,mean}_ms   _wav_to_embedding (decode + CNN14) on an N s clip
+#   head.b<B>.rows_per_s           head-only throughput at batch size B
+#   predict.<clip>.{p50,p90}_ms    end-to-end predict_one, plus predict.<clip>.stage.<name>_ms
+#   rss.{after_load,peak}_mb       resident set size
+#
+# --backend: eager (whatever Predictor picks from env), pip, torchscript
+# (needs CNN14_LOCAL_TS), hub, random (panns Cnn14 with random weights, so
+# timings are representative without the 330 MB checkpoint), or any
+# FROGNET_BACKEND artifact set (onnx, torchscript-int8, ...).
+
+from __future__ import annotations
+import argparse, json, os, platform, resource, subprocess, sys, time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import torch
+
+from backend.benchmarks.replica_scaling import AUDIO_EXTS, synthetic_clips
+from backend.model import Predictor as P
+
+EMBED_SECONDS = (1, 2, 5, 10, 30, 60)
+HEAD_BATCHES = (1, 8, 32, 128, 512)
+
+
+# ---- helpers ----
+def _rss_mb() -> float:
+    """Peak RSS of this process (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024.0
+
+
+def _current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except OSError:
+        return _rss_mb()
+
+
+def _time_ms(fn: Callable[[], object], repeats: int, warmup: int = 1) -> List[float]:
+    for _ in range(warmup):
+        fn()
+    out = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t0) * 1000.0)
+    return out
+
+
+def _stats(ms: List[float], keys=("p50", "p90", "mean")) -> Dict[str, float]:
+    a = np.asarray(ms)
+    vals = {"p50": np.percentile(a, 50), "p90": np.percentile(a, 90), "mean": a.mean()}
+    return {f"{k}_ms": round(float(vals[k]), 3) for k in keys}
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+# ---- model ----
+def _random_cnn14() -> torch.nn.Module:
+    try:
+        from panns_inference.models import Cnn14
+    except Exception as e:
+        raise RuntimeError("panns-inference not installed. Run: pip install panns-inference") from e
+    torch.manual_seed(0)
+    m = Cnn14(sample_rate=P.PANN_SR, window_size=1024, hop_size=320, mel_bins=64,
+              fmin=50, fmax=14000, classes_num=527).eval()
+    m.cache_id = "panns-random"
+    return m
+
+
+def load_pipeline(ckpt: str, backend: str) -> Tuple[P.Pipeline, Dict[int, str], Dict[str, float]]:
+    """(pipeline, idx_to_class, load timings) for the requested CNN14 backend."""
+    if backend == "random":
+        t0 = time.perf_counter()
+        head, idx_to_class, infer_cfg = P.load_head(ckpt)
+        timings = {"load_head": round((time.perf_counter() - t0) * 1000.0, 1)}
+        return P.Pipeline(_random_cnn14(), head, infer_cfg=infer_cfg), idx_to_class, timings
+
+    if backend == "pip":
+        os.environ["USE_PIP_PANNS"] = "1"
+    elif backend == "torchscript" and not os.getenv("CNN14_LOCAL_TS"):
+        raise SystemExit("--backend torchscript needs CNN14_LOCAL_TS=<cnn14.ts.pt>")
+    elif backend == "hub":
+        os.environ["USE_PIP_PANNS"] = "0"
+        os.environ.pop("CNN14_LOCAL_TS", None)
+    if backend in P.BACKEND_ARTIFACTS:
+        os.environ["FROGNET_BACKEND"] = backend
+    timings: Dict[str, float] = {}
+    model, _, idx_to_class = P.from_pretrained(ckpt, timings=timings)
+    return model, idx_to_class, timings
+
+
+# ---- benchmarks ----
+def bench_embedding(pipe: P.Pipeline, seconds, repeats: int) -> Dict[str, float]:
+    out = {}
+    for sec, wav in zip(seconds, (synthetic_clips(1, s)[0] for s in seconds)):
+        ms = _time_ms(lambda: P._wav_to_embedding(pipe.extractor, wav), repeats)
+        out.update({f"embed.{sec:g}s.{k}": v for k, v in _stats(ms).items()})
+        print(f"[embed]   {sec:>4g} s  p50 {out[f'embed.{sec:g}s.p50_ms']:9.2f} ms")
+    return out
+
+
+def bench_head(pipe: P.Pipeline, batches, repeats: int) -> Dict[str, float]:
+    out = {}
+    rng = np.random.default_rng(0)
+    for b in batches:
+        emb = torch.from_numpy(rng.standard_normal((b, 2048)).astype(np.float32))
+        ms = _time_ms(lambda: pipe.logits_from_embeddings(emb), max(repeats, 20), warmup=3)
+        out[f"head.b{b}.rows_per_s"] = round(b / (float(np.median(ms)) / 1000.0), 1)
+        print(f"[head]    b={b:<4d} {out[f'head.b{b}.rows_per_s']:12.1f} rows/s")
+    return out
+
+
+def bench_predict(pipe: P.Pipeline, idx_to_class, clips: Dict[str, bytes], repeats: int) -> Dict[str, float]:
+    out = {}
+    for name, data in clips.items():
+        stages: List[Dict[str, float]] = []
+        def run():
+            t: Dict[str, float] = {}
+            P.predict_one(data, pipe, None, idx_to_class, topk=3, timings=t)
+            stages.append(t)
+        ms = _time_ms(run, repeats)
+        out.update({f"predict.{name}.{k}": v for k, v in _stats(ms, ("p50", "p90")).items()})
+        for stage in sorted(set().union(*stages[1:])):
+            if stage != "audio_sec":
+                med = float(np.median([s.get(stage, 0.0) for s in stages[1:]]))
+                out[f"predict.{name}.stage.{stage}_ms"] = round(med, 3)
+        print(f"[predict] {name:<24s} p50 {out[f'predict.{name}.p50_ms']:9.2f} ms")
+    return out
+
+
+def run(args) -> dict:
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    pipe, idx_to_class, load_ms = load_pipeline(args.ckpt, args.backend)
+    metrics: Dict[str, float] = {f"load.{k}_ms": v for k, v in load_ms.items()}
+    metrics["rss.after_load_mb"] = round(_current_rss_mb(), 1)
+
+    seconds = [s for s in EMBED_SECONDS if s <= args.max_sec]
+    metrics.update(bench_embedding(pipe, seconds, args.repeats))
+    metrics.update(bench_head(pipe, HEAD_BATCHES, args.repeats))
+
+    clips = {"synthetic_10s": synthetic_clips(1, 10.0)[0]}
+    if args.clips:
+        files = sorted(p for p in Path(args.clips).rglob("*") if p.suffix.lower() in AUDIO_EXTS)
+        if not files:
+            raise SystemExit(f"No audio files under {args.clips}")
+        clips.update((p.stem[:40], p.read_bytes()) for p in files)
+    metrics.update(bench_predict(pipe, idx_to_class, clips, args.repeats))
+    metrics["rss.peak_mb"] = round(_rss_mb(), 1)
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "backend": args.backend,
+            "mode": pipe.infer_cfg["mode"],
+            "torch": torch.__version__,
+            "threads": torch.get_num_threads(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "repeats": args.repeats,
+        },
+        "metrics": metrics,
+    }
+
+
+# ---- compare ----
+def _lower_is_better(name: str) -> bool:
+    return not name.endswith("_per_s")
+
+
+def compare(base: dict, new: dict, threshold: float = 0.10) -> List[dict]:
+    """
+    Per-metric change between two result files. A row is a regression when the
+    metric got worse by more than `threshold` (fraction); metrics present in
+    only one file are skipped.
+    """
+    b, n = base["metrics"], new["metrics"]
+    rows = []
+    for name in sorted(set(b) & set(n)):
+        if not b[name]:
+            continue
+        change = (n[name] - b[name]) / abs(b[name])
+        worse = change if _lower_is_better(name) else -change
+        rows.append({"metric": name, "base": b[name], "new": n[name],
+                     "change": round(change, 4), "regression": worse > threshold})
+    return rows
+
+
+def _print_compare(rows: List[dict], threshold: float):
+    width = max([len(r["metric"]) for r in rows] + [6])
+    for r in rows:
+        flag = "  << SLOWER" if r["regression"] else ""
+        print(f"{r['metric']:<{width}}  {r['base']:>12g}  {r['new']:>12g}  {r['change']:+8.1%}{flag}")
+    n_bad = sum(r["regression"] for r in rows)
+    print(f"[compare] {len(rows)} metrics, {n_bad} worse than {threshold:.0%}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Predictor micro-benchmarks (JSON out, compare mode).")
+    ap.add_argument("--ckpt", default=str(Path(__file__).resolve().parents[1] / "model"),
+                    help="Checkpoint dir with config.json, class_to_idx.json and the head weights")
+    ap.add_argument("--backend", default="eager",
+                    help="eager | pip | torchscript | hub | random | " + " | ".join(P.BACKEND_ARTIFACTS))
+    ap.add_argument("--clips", default=None, help="Folder of real clips to add to the predict benchmark")
+    ap.add_argument("--max-sec", type=float, default=60.0, help="Longest clip for the embedding benchmark")
+    ap.add_argument("--repeats", type=int, default=5)
+    ap.add_argument("--threads", type=int, default=0, help="torch.set_num_threads (0 = torch default)")
+    ap.add_argument("--out", default=None, help="Write results JSON here")
+    ap.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="Compare two result files")
+    ap.add_argument("--threshold", type=float, default=0.10, help="Regression threshold for --compare (fraction)")
+    args = ap.parse_args()
+
+    if args.compare:
+        base, new = (json.loads(Path(p).read_text()) for p in args.compare)
+        rows = compare(base, new, args.threshold)
+        _print_compare(rows, args.threshold)
+        return 1 if any(r["regression"] for r in rows) else 0
+
+    result = run(args)
+    if args.out:
+        Path(args.out).write_text(json.dumps(result, indent=2, sort_keys=True))
+        print(f"[saved] {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# backend/benchmarks/replica_scaling.py
+# Throughput of ReplicaPool as the replica count grows (1 thread per replica,
+# so N replicas ~ N cores).
+#
+#   python -m backend.benchmarks.replica_scaling --max-replicas 4 --requests 64
+#   python -m backend.benchmarks.replica_scaling --clips uploaded_audios --out scaling.json
+
+from __future__ import annotations
+import argparse, io, json, os, time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import soundfile as sf
+
+from backend.model.replicas import ReplicaPool
+
+AUDIO_EXTS = (".wav", ".flac", ".mp3", ".ogg", ".m4a")
+
+
+def synthetic_clips(n: int, seconds: float, sr: int = 32000) -> List[bytes]:
+    """Noise WAVs encoded in memory (content varies so caches can't help)."""
+    rng = np.random.default_rng(0)
+    out = []
+    for _ in range(n):
+        buf = io.BytesIO()
+        sf.write(buf, (0.1 * rng.standard_normal(int(seconds * sr))).astype(np.float32), sr, format="WAV")
+        out.append(buf.getvalue())
+    return out
+
+
+def folder_clips(folder: str) -> List[bytes]:
+    files = sorted(p for p in Path(folder).rglob("*") if p.suffix.lower() in AUDIO_EXTS)
+    if not files:
+        raise SystemExit(f"No audio files under {folder}")
+    return [p.read_bytes() for p in files]
+
+
+def run_one(ckpt: str, replicas: int, threads: int, clips: List[bytes], requests: int) -> dict:
+    pool = ReplicaPool(ckpt, replicas=replicas, threads_per_replica=threads)
+    try:
+        t0 = time.perf_counter()
+        pool.wait_ready()
+        load_s = time.perf_counter() - t0
+        # warm every replica once (first pass allocates, JITs kernels, ...)
+        for f in [pool.submit(clips[i % len(clips)]) for i in range(replicas)]:
+            f.result()
+
+        t0 = time.perf_counter()
+        futs = [pool.submit(clips[i % len(clips)]) for i in range(requests)]
+        for f in futs:
+            f.result()
+        wall = time.perf_counter() - t0
+    finally:
+        pool.close()
+    return {
+        "replicas": replicas,
+        "threads_per_replica": threads,
+        "requests": requests,
+        "wall_s": round(wall, 3),
+        "clips_per_s": round(requests / wall, 3),
+        "load_s": round(load_s, 2),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="ReplicaPool throughput as the replica count grows.")
+    ap.add_argument("--ckpt", default=str(Path(__file__).resolve().parents[1] / "model"))
+    ap.add_argument("--max-replicas", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--threads-per-replica", type=int, default=1)
+    ap.add_argument("--requests", type=int, default=64)
+    ap.add_argument("--clips", default=None, help="Folder of audio files (default: synthetic noise)")
+    ap.add_argument("--clip-sec", type=float, default=10.0)
+    ap.add_argument("--out", default=None, help="Write results JSON here")
+    args = ap.parse_args()
+
+    clips = folder_clips(args.clips) if args.clips else synthetic_clips(16, args.clip_sec)
+    counts = sorted({1, *[n for n in (2, 4, 8, 16, 32) if n < args.max_replicas], args.max_replicas})
+
+    rows = []
+    for n in counts:
+        row = run_one(args.ckpt, n, args.threads_per_replica, clips, args.requests)
+        row["speedup"] = round(row["clips_per_s"] / rows[0]["clips_per_s"], 2) if rows else 1.0
+        rows.append(row)
+        print(f"replicas={n:>2} x {row['threads_per_replica']} thr  "
+              f"{row['clips_per_s']:8.2f} clips/s  speedup {row['speedup']:.2f}x  (load {row['load_s']} s)")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps({"cpu_count": os.cpu_count(), "results": rows}, indent=2))
+        print(f"[saved] {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+# backend/model/BatchPredict.py
+# Score every audio file under one or more folders with a single model load:
+#   - files are decoded and resampled to 32 kHz in a pool of --procs worker
+#     processes (a bounded number in flight, so memory does not grow with the tree)
+#   - decoded clips are scored --batch at a time in one CNN14 + head pass
+#     (predict_waves, with the activity gate / frog check if configured)
+#   - results are appended to a CSV table after every batch
+#   - a JSONL manifest records every finished file (size, mtime, model);
+#     rerunning the same command skips files already scored by the same model
+#     and unchanged on disk, so an interrupted run picks up where it stopped
+#   - the table keeps one row per file: a rerun first drops the rows of the
+#     files it is about to score again (retried failures, changed files, a new
+#     model); --force starts both the table and the manifest over
+#
+#   python backend/model/BatchPredict.py --ckpt backend/model recordings/ --out results.csv
+#   python backend/model/BatchPredict.py recordings/ --out results.csv --procs 8 --batch 32
+#
+# Columns: file, status (ok | rejected | failed), species, confidence,
+# topk ("label:p;..."), audio_sec, error, model (the manifest's model key).
+# Failed files are retried on the next run.
+
+from __future__ import annotations
+import argparse, csv, hashlib, itertools, json, os, sys, time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import multiprocessing as mp
+
+import numpy as np
+import torch
+
+try:
+    from backend.model import Predictor as P
+    from backend.model.StreamDetect import _inputs, _rss_mb
+except ModuleNotFoundError:  # run as a script from backend/model
+    import Predictor as P  # type: ignore
+    from StreamDetect import _inputs, _rss_mb  # type: ignore
+
+COLUMNS = ("file", "status", "species", "confidence", "topk", "audio_sec", "error", "model")
+
+
+# ---- decoding (worker processes) ----
+def _decode(path: str) -> Tuple[str, Optional[np.ndarray], Optional[str]]:
+    """(path, 32k mono clip | None, error | None); errors stay per file."""
+    try:
+        y = P.decode_audio(path, P.PANN_SR)
+        if y.size == 0:
+            raise ValueError("Decoded audio is empty.")
+        return path, y, None
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def _decoded(paths: List[Path], procs: int) -> Iterator[Tuple[str, Optional[np.ndarray], Optional[str]]]:
+    """Decode results in completion order, with at most 2 * procs files in flight."""
+    if procs <= 0:
+        yield from (_decode(str(p)) for p in paths)
+        return
+    it = iter(paths)
+    with ProcessPoolExecutor(max_workers=procs, mp_context=mp.get_context("spawn")) as pool:
+        running = {pool.submit(_decode, str(p)) for p in itertools.islice(it, 2 * procs)}
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                nxt = next(it, None)
+                if nxt is not None:
+                    running.add(pool.submit(_decode, str(nxt)))
+                yield fut.result()
+
+
+# ---- manifest ----
+def model_key(ckpt: str, weights: Optional[str], pipe: P.Pipeline) -> str:
+    """Changes whenever the head weights, config.json, the CNN14 front end or the cascade change."""
+    ckpt_dir = Path(ckpt)
+    files = [ckpt_dir / (weights or os.getenv("FROGNET_WEIGHTS", P.DEFAULT_HEAD)), ckpt_dir / "config.json"]
+    if pipe.cascade is not None:
+        files.append(ckpt_dir / "student.pt")
+    h = hashlib.sha1()
+    for f in files:
+        h.update(f.read_bytes() if f.is_file() else b"")
+    key = f"{h.hexdigest()[:12]}|{pipe.infer_cfg['mode']}|{pipe.cache_ident()}"
+    if pipe.cascade is not None:
+        key += f"|cascade={pipe.cascade.min_conf},{pipe.cascade.min_margin}"
+    return key
+
+
+def _file_id(path: Path) -> Dict[str, int]:
+    st = path.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+class Manifest:
+    """Append-only JSONL of finished files; the last line per file wins."""
+    def __init__(self, path: str, model: str):
+        self.path, self.model = Path(path), model
+        self.done: Dict[str, Dict[str, Any]] = {}
+        if self.path.is_file():
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from an interrupted run
+                    self.done[rec["file"]] = rec
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.path, "a")
+
+    def is_done(self, path: Path) -> bool:
+        rec = self.done.get(str(path))
+        return (rec is not None and rec["model"] == self.model and rec["status"] != "failed"
+                and {k: rec.get(k) for k in ("size", "mtime_ns")} == _file_id(path))
+
+    def record(self, entries: List[Tuple[Path, str]]):
+        for path, status in entries:
+            rec = {"file": str(path), **_file_id(path), "model": self.model, "status": status}
+            self.done[rec["file"]] = rec
+            self._f.write(json.dumps(rec) + "\n")
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+# ---- results ----
+class ResultWriter:
+    """
+    Appends rows to a CSV table (header only when the file is new), flushed per
+    batch. drop() removes the rows of files about to be scored again, so the
+    table keeps one row per file; truncate=True starts a new table.
+    """
+    def __init__(self, path: str, truncate: bool = False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if truncate and self.path.is_file():
+            self.path.unlink()
+        self._open()
+        self.rows = 0
+
+    def _open(self):
+        new = not self.path.is_file() or self.path.stat().st_size == 0
+        self._f = open(self.path, "a", newline="")
+        self._csv = csv.writer(self._f)
+        if new:
+            self._csv.writerow(COLUMNS)
+
+    def drop(self, files: List[Path]):
+        """Rewrite the table without the rows of `files` (atomic replace; also upgrades old headers)."""
+        names = {str(p) for p in files}
+        if not names or self.path.stat().st_size == 0:
+            return
+        self._f.close()
+        with open(self.path, newline="") as f:
+            rows = [r for r in csv.DictReader(f) if r.get("file") not in names]
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", newline="") as f:
+            w = csv.DictWriter(f, COLUMNS, extrasaction="ignore")
+            w.writeheader()
+            w.writerows(rows)
+        os.replace(tmp, self.path)
+        self._open()
+
+    def write(self, rows: List[Dict[str, Any]]):
+        self._csv.writerows([r.get(c, "") if r.get(c) is not None else "" for c in COLUMNS] for r in rows)
+        self._f.flush()
+        self.rows += len(rows)
+
+    def close(self):
+        self._f.close()
+
+
+def _row(path: str, y: Optional[np.ndarray], res: Any, topk: int) -> Dict[str, Any]:
+    row: Dict[str, Any] = {"file": path, "audio_sec": None if y is None else round(y.shape[0] / P.PANN_SR, 3)}
+    if isinstance(res, P.RejectedClip):
+        return {**row, "status": "rejected", "error": f"{res.reason}: {res}"}
+    if isinstance(res, str):
+        return {**row, "status": "failed", "error": res}
+    name, conf, top = res
+    return {**row, "status": "ok", "species": name, "confidence": round(conf, 6),
+            "topk": ";".join(f"{l}:{c:.4f}" for l, c in top[:topk])}
+
+
+def _score_batch(pipe: P.Pipeline, idx_to_class: Dict[int, str], ys: List[np.ndarray], topk: int) -> List[Any]:
+    """predict_waves over the batch; if the batch fails, score clips one by one to isolate the bad file."""
+    try:
+        return P.predict_waves(ys, pipe, idx_to_class, topk=topk)
+    except Exception:
+        out = []
+        for y in ys:
+            try:
+                out += P.predict_waves([y], pipe, idx_to_class, topk=topk)
+            except Exception as e:
+                out.append(f"{type(e).__name__}: {e}")
+        return out
+
+
+# ---- batch run ----
+def run_batch(pipe: P.Pipeline, idx_to_class: Dict[int, str], files: List[Path], writer: ResultWriter,
+              manifest: Manifest, batch: int = 16, topk: int = 3, procs: int = 0,
+              stages: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """Score files not already in the manifest; returns {skipped, ok, rejected, failed, audio_sec}."""
+    todo = [p for p in files if not manifest.is_done(p)]
+    writer.drop(todo)                                          # rescored files: their new row replaces the old
+    stats = {"skipped": len(files) - len(todo), "ok": 0, "rejected": 0, "failed": 0, "audio_sec": 0.0}
+    pending: List[Tuple[str, np.ndarray]] = []
+
+    def flush(items: List[Tuple[str, Optional[np.ndarray], Any]]):
+        rows = [{**_row(path, y, res, topk), "model": manifest.model} for path, y, res in items]
+        writer.write(rows)                                     # results first: a crash in between rescores,
+        manifest.record([(Path(r["file"]), r["status"]) for r in rows])   # never drops, these files
+        for r in rows:
+            stats[r["status"]] += 1
+            stats["audio_sec"] += r["audio_sec"] or 0.0
+
+    def score_pending():
+        with P.trace_stages(stages):
+            results = _score_batch(pipe, idx_to_class, [y for _, y in pending], topk)
+        flush([(path, y, res) for (path, y), res in zip(pending, results)])
+        pending.clear()
+
+    for path, y, err in _decoded(todo, procs):
+        if err is not None:
+            flush([(path, None, err)])
+            continue
+        pending.append((path, y))
+        if len(pending) >= batch:
+            score_pending()
+    if pending:
+        score_pending()
+    return stats
+
+
+# ---- CLI ----
+def main():
+    ap = argparse.ArgumentParser(description="Parallel, resumable batch prediction over folders of audio.")
+    ap.add_argument("inputs", nargs="+", help="Audio files or folders (searched recursively)")
+    ap.add_argument("--ckpt", default=str(Path(__file__).resolve().parent),
+                    help="Checkpoint dir with config.json, class_to_idx.json and the head weights")
+    ap.add_argument("--weights", default=None, help="Head weights filename inside --ckpt")
+    ap.add_argument("--out", required=True, help="Results table (.csv, appended to on reruns)")
+    ap.add_argument("--manifest", default=None, help="Manifest of finished files (default <out>.manifest.jsonl)")
+    ap.add_argument("--procs", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                    help="Decoder processes (0 = decode in this process)")
+    ap.add_argument("--batch", type=int, default=16, help="Clips per CNN14 pass")
+    ap.add_argument("--topk", type=int, default=3)
+    ap.add_argument("--threads", type=int, default=0, help="torch.set_num_threads (0 = torch default)")
+    ap.add_argument("--force", action="store_true",
+                    help="Start the results table and the manifest over and score every file again")
+    args = ap.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    files = [p.resolve() for p in _inputs(args.inputs)]
+    if not files:
+        raise SystemExit("No audio files found.")
+    pipe, _, idx_to_class = P.from_pretrained(args.ckpt, filename=args.weights)
+    manifest_path = args.manifest or f"{args.out}.manifest.jsonl"
+    if args.force and Path(manifest_path).is_file():
+        Path(manifest_path).unlink()
+    manifest = Manifest(manifest_path, model_key(args.ckpt, args.weights, pipe))
+    writer = ResultWriter(args.out, truncate=args.force)
+    print(f"[info] {len(files)} file(s) -> {args.out} | manifest {manifest_path} | "
+          f"{args.procs} decoder proc(s), batch {args.batch}, mode {pipe.infer_cfg['mode']}")
+
+    t0, stages = time.perf_counter(), {}
+    try:
+        st = run_batch(pipe, idx_to_class, files, writer, manifest, batch=max(1, args.batch),
+                       topk=args.topk, procs=args.procs, stages=stages)
+    finally:
+        writer.close()
+        manifest.close()
+
+    total = time.perf_counter() - t0
+    n = st["ok"] + st["rejected"] + st["failed"]
+    timing = ", ".join(f"{k} {v / 1000:.1f}s" for k, v in sorted(stages.items())
+                       if k not in ("audio_sec", "gate_windows", "gate_kept", "frog_score", "frog_likely",
+                                    "cascade_clips", "cascade_escalated"))
+    print(f"[done] {n} scored in {total:.1f}s ({n / max(1e-9, total):.1f} files/s, "
+          f"{st['audio_sec'] / 3600:.2f} h of audio): {st['ok']} ok, {st['rejected']} rejected, "
+          f"{st['failed']} failed, {st['skipped']} skipped | rss {_rss_mb():.0f} MB | {timing}")
+    return 1 if st["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
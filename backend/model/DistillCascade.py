@@ -0,0 +1,236 @@
+# backend/model/DistillCascade.py
+# Distil the CNN14 + head teacher into the FrogNet-sized student used by the
+# serving cascade (cascade.py), then report escalation rate against accuracy
+# loss on held-out clips and store the chosen thresholds next to the head.
+#
+#   python backend/model/DistillCascade.py --train data/train --heldout data/test --ckpt backend/model
+#   python backend/model/DistillCascade.py --train unlabeled/ --heldout data/test --max-loss 0.005
+#
+# Training clips need no labels: the targets are the teacher's clip
+# probabilities, softened by --temperature. Clips in a folder named after a
+# class (<root>/<species>/*.wav, the FrognetFinal.py layout) also get a hard
+# label, mixed in with --alpha. Held-out accuracy is against those folder
+# labels; clips without one are scored against the teacher's top-1.
+#
+# Report rows (one per min_conf x min_margin): escalation (share of clips sent
+# to CNN14), accuracy and accuracy_loss vs the teacher alone, agreement with
+# the teacher, and est_speedup = teacher ms / (student ms + escalation * teacher ms).
+# Serve with FROGNET_CASCADE=1.
+
+from __future__ import annotations
+import argparse, json, os, sys, time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+try:
+    from backend.model import Predictor as P
+    from backend.model.BatchPredict import _decoded
+    from backend.model.StreamDetect import _inputs
+    from backend.model.cascade import Cascade, accept_mask, save_student, student_input
+    from backend.model.frognet import FrogNet
+except ModuleNotFoundError:  # run as a script from backend/model
+    import Predictor as P  # type: ignore
+    from BatchPredict import _decoded  # type: ignore
+    from StreamDetect import _inputs  # type: ignore
+    from cascade import Cascade, accept_mask, save_student, student_input  # type: ignore
+    from frognet import FrogNet  # type: ignore
+
+CONF_GRID = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98, 0.99, 0.995, 0.999)
+MARGIN_GRID = (0.0, 0.1, 0.2, 0.3, 0.5)
+
+
+# ---- data ----
+def load_clips(root: str, class_to_idx: Dict[str, int], procs: int = 0) -> Tuple[List[np.ndarray], np.ndarray]:
+    """32k mono clips under root and their folder label (-1 when the folder is not a class)."""
+    files = _inputs([root])
+    label = {str(p): class_to_idx.get(p.parent.name, -1) for p in files}
+    ys, labels = [], []
+    for path, y, err in _decoded(files, procs):
+        if err is not None:
+            print(f"[warn] {path}: {err}")
+            continue
+        ys.append(y)
+        labels.append(label[path])
+    return ys, np.asarray(labels, dtype=np.int64)
+
+
+def teacher_probs(pipe: P.Pipeline, ys: List[np.ndarray], batch: int = 16) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    Teacher clip probabilities for the clips it scores ([m,C]), the mask of
+    those clips over ys (the activity gate / frog check may reject some) and
+    the teacher's mean ms per clip.
+    """
+    probs, keep = [], np.zeros(len(ys), dtype=bool)
+    t0 = time.perf_counter()
+    with torch.no_grad():
+        for i in range(0, len(ys), batch):
+            for j, res in enumerate(pipe.score_many(ys[i:i + batch]), start=i):
+                if not isinstance(res, P.RejectedClip):
+                    probs.append(pipe.clip_probs(res[1]))
+                    keep[j] = True
+    ms = (time.perf_counter() - t0) * 1000.0 / max(1, len(ys))
+    return (np.stack(probs) if probs else np.zeros((0, 0), np.float32)), keep, ms
+
+
+# ---- training ----
+def distill(x: torch.Tensor, soft: np.ndarray, labels: np.ndarray, num_classes: int, epochs: int = 30,
+            lr: float = 1e-3, temperature: float = 2.0, alpha: float = 0.0, batch: int = 32,
+            seed: int = 0) -> FrogNet:
+    """
+    Student trained on images x [n,1,64,64] to match the teacher's clip
+    probabilities `soft` [n,C] (KL at `temperature`, scaled by T^2), plus
+    `alpha` x cross-entropy on rows with a folder label (>= 0).
+    """
+    torch.manual_seed(seed)
+    student = FrogNet(num_classes)
+    opt = torch.optim.Adam(student.parameters(), lr=lr)
+    T = float(temperature)
+    target = torch.softmax(torch.log(torch.from_numpy(soft).float().clamp_min(1e-8)) / T, dim=-1)
+    hard = torch.from_numpy(labels)
+    teacher_top = target.argmax(dim=1)
+    for epoch in range(epochs):
+        student.train()
+        perm, total = torch.randperm(x.shape[0]), 0.0
+        for i in range(0, x.shape[0], batch):
+            idx = perm[i:i + batch]
+            out = student(x[idx])
+            loss = F.kl_div(F.log_softmax(out / T, dim=-1), target[idx], reduction="batchmean") * T * T
+            has_label = hard[idx] >= 0
+            if alpha > 0 and has_label.any():
+                ce = F.cross_entropy(out[has_label], hard[idx][has_label])
+                loss = (1.0 - alpha) * loss + alpha * ce
+            opt.zero_grad()
+            loss.backward()
+            opt.step()
+            total += loss.item() * idx.numel()
+        student.eval()
+        with torch.no_grad():
+            agree = (student(x).argmax(dim=1) == teacher_top).float().mean().item()
+        print(f"[distill] epoch {epoch + 1:02d}/{epochs} | loss {total / x.shape[0]:.4f} | teacher agreement {agree:.3f}")
+    return student.eval()
+
+
+# ---- report ----
+def sweep(student_p: np.ndarray, teacher_p: np.ndarray, truth: np.ndarray,
+          confs: Sequence[float] = CONF_GRID, margins: Sequence[float] = MARGIN_GRID,
+          student_ms: Optional[float] = None, teacher_ms: Optional[float] = None) -> List[dict]:
+    """
+    Cascade outcome per (min_conf, min_margin): accepted clips take the
+    student's top-1, escalated ones the teacher's. truth < 0 falls back to the
+    teacher's top-1.
+    """
+    t_top, s_top = teacher_p.argmax(axis=1), student_p.argmax(axis=1)
+    ref = np.where(truth >= 0, truth, t_top)
+    teacher_acc = float(np.mean(t_top == ref))
+    rows = []
+    for c in confs:
+        for m in margins:
+            accepted = accept_mask(student_p, c, m)
+            pred = np.where(accepted, s_top, t_top)
+            esc = float(1.0 - accepted.mean())
+            acc = float(np.mean(pred == ref))
+            row = {"min_conf": c, "min_margin": m, "escalation": round(esc, 4), "accuracy": round(acc, 4),
+                   "accuracy_loss": round(teacher_acc - acc, 4), "agreement": round(float(np.mean(pred == t_top)), 4)}
+            if student_ms is not None and teacher_ms:
+                row["est_speedup"] = round(teacher_ms / (student_ms + esc * teacher_ms), 2)
+            rows.append(row)
+    return rows
+
+
+def pick(rows: List[dict], max_loss: float) -> dict:
+    """Lowest escalation within max_loss accuracy loss (ties: higher accuracy); else the smallest loss."""
+    ok = [r for r in rows if r["accuracy_loss"] <= max_loss]
+    if not ok:
+        print(f"[warn] no threshold keeps accuracy loss within {max_loss}; using the most conservative one")
+        return min(rows, key=lambda r: (r["accuracy_loss"], r["escalation"]))
+    return min(ok, key=lambda r: (r["escalation"], -r["accuracy"]))
+
+
+def _print_rows(rows: List[dict], best: dict):
+    print(f"{'conf':>6} {'margin':>6} {'escal.':>7} {'acc':>7} {'loss':>7} {'agree':>7} {'speedup':>8}")
+    for r in rows:
+        if r["min_margin"] == 0.0 or r is best:
+            mark = "  <- chosen" if r is best else ""
+            print(f"{r['min_conf']:>6g} {r['min_margin']:>6g} {r['escalation']:>7.1%} {r['accuracy']:>7.3f} "
+                  f"{r['accuracy_loss']:>+7.3f} {r['agreement']:>7.3f} {r.get('est_speedup', float('nan')):>7.2f}x{mark}")
+
+
+# ---- CLI ----
+def main():
+    ap = argparse.ArgumentParser(description="Distil CNN14 + head into the cascade student and pick its thresholds.")
+    ap.add_argument("--train", required=True, help="Training audio folder (labels optional: <root>/<species>/...)")
+    ap.add_argument("--heldout", required=True, help="Held-out audio folder for the escalation / accuracy report")
+    ap.add_argument("--ckpt", default=str(Path(__file__).resolve().parent),
+                    help="Checkpoint dir with config.json, class_to_idx.json and the head weights")
+    ap.add_argument("--weights", default=None, help="Head weights filename inside --ckpt (the teacher)")
+    ap.add_argument("--out", default=None, help="Where student.pt / student.json go (default --ckpt)")
+    ap.add_argument("--epochs", type=int, default=30)
+    ap.add_argument("--lr", type=float, default=1e-3)
+    ap.add_argument("--batch", type=int, default=32, help="Student training batch")
+    ap.add_argument("--temperature", type=float, default=2.0, help="Distillation temperature")
+    ap.add_argument("--alpha", type=float, default=0.0, help="Weight of the hard-label loss on labelled clips")
+    ap.add_argument("--max-loss", type=float, default=0.01, help="Accuracy loss allowed when picking thresholds")
+    ap.add_argument("--procs", type=int, default=0, help="Decoder processes (0 = decode in this process)")
+    ap.add_argument("--report", default=None, help="Report JSON (default <out>/student_report.json)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    pipe, _, idx_to_class = P.from_pretrained(args.ckpt, filename=args.weights)
+    pipe.enable_cascade(None)
+    class_to_idx = {v: k for k, v in idx_to_class.items()}
+    head_file = args.weights or os.getenv("FROGNET_WEIGHTS", P.DEFAULT_HEAD)
+    out_dir = Path(args.out or args.ckpt)
+
+    ys, labels = load_clips(args.train, class_to_idx, args.procs)
+    if not ys:
+        raise SystemExit(f"No audio under {args.train}")
+    soft, keep, _ = teacher_probs(pipe, ys)
+    if not keep.any():
+        raise SystemExit("The teacher rejected every training clip (activity gate / frog check).")
+    print(f"[info] {len(ys)} training clips ({int((labels >= 0).sum())} labelled), "
+          f"{int((~keep).sum())} rejected by the teacher's gate / frog check")
+    x = student_input([y for y, k in zip(ys, keep) if k], P.PANN_SR)
+    student = distill(x, soft, labels[keep], len(idx_to_class), epochs=args.epochs, lr=args.lr,
+                      temperature=args.temperature, alpha=args.alpha, batch=args.batch, seed=args.seed)
+
+    hy, htruth = load_clips(args.heldout, class_to_idx, args.procs)
+    if not hy:
+        raise SystemExit(f"No audio under {args.heldout}")
+    t_probs, hkeep, teacher_ms = teacher_probs(pipe, hy)
+    hy = [y for y, k in zip(hy, hkeep) if k]
+    t0 = time.perf_counter()
+    s_probs = Cascade(student).probs(hy, P.PANN_SR)
+    student_ms = (time.perf_counter() - t0) * 1000.0 / max(1, len(hy))
+    rows = sweep(s_probs, t_probs, htruth[hkeep], student_ms=student_ms, teacher_ms=teacher_ms)
+    best = pick(rows, args.max_loss)
+    teacher_acc = round(best["accuracy"] + best["accuracy_loss"], 4)
+    print(f"[report] {len(hy)} held-out clips ({int((htruth[hkeep] >= 0).sum())} labelled) | teacher acc "
+          f"{teacher_acc:.3f} | student {student_ms:.1f} ms/clip, teacher {teacher_ms:.1f} ms/clip")
+    _print_rows(rows, best)
+
+    save_student(str(out_dir), student, {
+        "num_classes": len(idx_to_class), "teacher": head_file,
+        "min_conf": best["min_conf"], "min_margin": best["min_margin"],
+        "temperature": args.temperature, "epochs": args.epochs, "train_clips": int(keep.sum()),
+        "heldout": {k: best[k] for k in ("escalation", "accuracy", "accuracy_loss")},
+    })
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "teacher": head_file, "mode": pipe.infer_cfg["mode"], "max_loss": args.max_loss,
+        "heldout_clips": len(hy), "heldout_rejected": int((~hkeep).sum()),
+        "teacher_accuracy": teacher_acc, "student_ms": round(student_ms, 3), "teacher_ms": round(teacher_ms, 3),
+        "chosen": best, "rows": rows,
+    }
+    report_path = Path(args.report or out_dir / "student_report.json")
+    report_path.write_text(json.dumps(report, indent=2))
+    print(f"[saved] {out_dir / 'student.pt'} (escalate below conf {best['min_conf']} / margin "
+          f"{best['min_margin']}), report {report_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+# backend/model/ExportModel.py
+# Export CNN14 + the MLP head to optimized CPU artifacts that Predictor.py can
+# serve with FROGNET_BACKEND=<name>, and report how far each one drifts from
+# eager fp32 on a reference clip set.
+#
+#   torchscript       frozen TorchScript (trace + torch.jit.freeze)
+#   torchscript-int8  dynamic int8 quantization of Linear layers, then TorchScript
+#                     (PyTorch has no dynamic quantization for Conv layers)
+#   onnx              ONNX (opset 17), run by onnxruntime
+#   onnx-int8         onnxruntime dynamic int8 quantization (Conv + MatMul)
+#
+# Usage:
+#   USE_PIP_PANNS=1 python backend/model/ExportModel.py --ckpt backend/model \
+#       --ref-clips uploaded_audios --formats torchscript,torchscript-int8,onnx,onnx-int8
+# Writes <out>/<artifacts> and <out>/export_report.json. The eager extractor
+# must expose the raw Cnn14 (PyPI or torch.hub backend).
+
+from __future__ import annotations
+import argparse, copy, importlib, json, os, sys, time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+try:
+    from backend.model import Predictor as P
+    from backend.model.audio_io import decode_audio
+except ModuleNotFoundError:  # run as a script from backend/model
+    import Predictor as P  # type: ignore
+    from audio_io import decode_audio  # type: ignore
+
+AUDIO_EXTS = (".wav", ".flac", ".mp3", ".ogg", ".m4a")
+ALL_FORMATS = list(P.BACKEND_ARTIFACTS)
+
+
+class _ExportCNN14(nn.Module):
+    """Raw Cnn14 with a tuple output: waveform [B,T] -> (clipwise_output, embedding)."""
+    def __init__(self, cnn14: nn.Module):
+        super().__init__()
+        self.cnn14 = cnn14
+    def forward(self, waveform: torch.Tensor):
+        out = self.cnn14(waveform, None)
+        return out["clipwise_output"], out["embedding"]
+
+
+def _example_wave(batch: int = 2, seconds: float = 4.0) -> torch.Tensor:
+    return torch.randn(batch, int(seconds * P.PANN_SR)) * 0.1
+
+
+def _to_torchscript(module: nn.Module, example: torch.Tensor, path: Path, freeze: bool = True):
+    module = module.eval()
+    with torch.no_grad():
+        ts = torch.jit.trace(module, example, check_trace=False)
+    if freeze:
+        try:
+            ts = torch.jit.freeze(ts)
+        except Exception as e:  # quantized graphs may refuse to freeze on some builds
+            print(f"[warn] could not freeze {path.name}: {e}")
+    torch.jit.save(ts, str(path))
+
+
+def _to_onnx(module: nn.Module, example: torch.Tensor, path: Path, in_name: str, out_names: List[str]):
+    dyn = {in_name: {0: "batch"} if in_name == "embedding" else {0: "batch", 1: "samples"}}
+    dyn.update({n: {0: "batch"} for n in out_names})
+    with torch.no_grad():
+        torch.onnx.export(module.eval(), (example,), str(path), input_names=[in_name],
+                          output_names=out_names, dynamic_axes=dyn, opset_version=17, dynamo=False)
+
+
+def _quantize_onnx(src: Path, dst: Path):
+    try:
+        q = importlib.import_module("onnxruntime.quantization")
+    except Exception as e:
+        raise RuntimeError("onnxruntime not installed. Run: pip install onnx onnxruntime") from e
+    q.quantize_dynamic(str(src), str(dst), weight_type=q.QuantType.QInt8)
+
+
+def export_artifacts(cnn14: nn.Module, head: nn.Module, out_dir: Path, formats: List[str]) -> Dict[str, List[str]]:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    ext = _ExportCNN14(cnn14).eval()
+    head = head.eval()
+    wave, emb = _example_wave(), torch.randn(2, 2048)
+    written: Dict[str, List[str]] = {}
+
+    for fmt in formats:
+        ext_name, head_name = P.BACKEND_ARTIFACTS[fmt]
+        t0 = time.perf_counter()
+        if fmt == "torchscript":
+            _to_torchscript(ext, wave, out_dir / ext_name)
+            _to_torchscript(head, emb, out_dir / head_name)
+        elif fmt == "torchscript-int8":
+            qd = torch.ao.quantization.quantize_dynamic
+            _to_torchscript(qd(copy.deepcopy(ext), {nn.Linear}, dtype=torch.qint8), wave, out_dir / ext_name)
+            _to_torchscript(qd(copy.deepcopy(head), {nn.Linear}, dtype=torch.qint8), emb, out_dir / head_name)
+        elif fmt == "onnx":
+            _to_onnx(ext, wave, out_dir / ext_name, "waveform", ["clipwise_output", "embedding"])
+            _to_onnx(head, emb, out_dir / head_name, "embedding", ["logits"])
+        elif fmt == "onnx-int8":
+            fp32_ext, fp32_head = P.BACKEND_ARTIFACTS["onnx"]
+            if not (out_dir / fp32_ext).is_file():
+                _to_onnx(ext, wave, out_dir / fp32_ext, "waveform", ["clipwise_output", "embedding"])
+                _to_onnx(head, emb, out_dir / fp32_head, "embedding", ["logits"])
+            _quantize_onnx(out_dir / fp32_ext, out_dir / ext_name)
+            _quantize_onnx(out_dir / fp32_head, out_dir / head_name)
+        else:
+            raise ValueError(f"Unknown format {fmt!r}; expected one of {ALL_FORMATS}")
+        written[fmt] = [ext_name, head_name]
+        print(f"[export] {fmt:<17} {time.perf_counter() - t0:6.1f} s -> {ext_name}, {head_name}")
+    return written
+
+
+# ---------------- accuracy / latency report ----------------
+def load_reference_clips(folder: str | None, n_synthetic: int, seconds: float) -> List[Tuple[str, np.ndarray]]:
+    if folder:
+        files = sorted(p for p in Path(folder).rglob("*") if p.suffix.lower() in AUDIO_EXTS)
+        if not files:
+            raise SystemExit(f"No audio files under {folder}")
+        return [(str(p), decode_audio(str(p), P.PANN_SR)) for p in files]
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * P.PANN_SR)) / P.PANN_SR
+    clips = []
+    for i in range(n_synthetic):  # chirpy tones in noise: not frogs, but exercises every layer
+        f0 = rng.uniform(200, 4000)
+        y = 0.3 * np.sin(2 * np.pi * f0 * t * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(0.5, 8) * t)))
+        clips.append((f"synthetic_{i}", (y + 0.05 * rng.standard_normal(t.size)).astype(np.float32)))
+    return clips
+
+
+def _run(pipeline: "P.Pipeline", clips) -> Tuple[List[np.ndarray], List[torch.Tensor], float]:
+    probs, embs = [], []
+    pipeline.score_wave(clips[0][1])  # warm-up (allocations, ORT graph init)
+    t0 = time.perf_counter()
+    for _, y in clips:
+        emb, logits = pipeline.score_wave(y)
+        probs.append(pipeline.clip_probs(logits))
+        embs.append(emb)
+    return probs, embs, (time.perf_counter() - t0) * 1000.0 / len(clips)
+
+
+def compare_backends(ref: "P.Pipeline", out_dir: Path, formats: List[str], clips) -> Dict[str, Dict]:
+    ref_probs, ref_embs, ref_ms = _run(ref, clips)
+    report = {"eager-fp32": {"ms_per_clip": round(ref_ms, 2), "top1_agreement": 1.0}}
+    for fmt in formats:
+        extractor, head = P._load_backend(fmt, out_dir)
+        pipe = P.Pipeline(extractor, head if head is not None else ref.head, infer_cfg=ref.infer_cfg)
+        probs, embs, ms = _run(pipe, clips)
+        agree = np.mean([int(np.argmax(a) == np.argmax(b)) for a, b in zip(probs, ref_probs)])
+        dprob = np.concatenate([np.abs(a - b) for a, b in zip(probs, ref_probs)])
+        cos = [float(nn.functional.cosine_similarity(a, b, dim=-1).min()) for a, b in zip(embs, ref_embs)]
+        size = sum((out_dir / n).stat().st_size for n in P.BACKEND_ARTIFACTS[fmt]) / 1e6
+        report[fmt] = {
+            "ms_per_clip": round(ms, 2),
+            "speedup": round(ref_ms / ms, 2) if ms > 0 else None,
+            "top1_agreement": round(float(agree), 4),
+            "max_abs_prob_delta": round(float(dprob.max()), 5),
+            "mean_abs_prob_delta": round(float(dprob.mean()), 6),
+            "min_embedding_cosine": round(min(cos), 5),
+            "size_mb": round(size, 1),
+        }
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Export CNN14 + head to TorchScript / ONNX / int8 artifacts.")
+    ap.add_argument("--ckpt", required=True, help="Checkpoint dir with config.json, class_to_idx.json and head weights")
+    ap.add_argument("--weights", default=None, help="Head weights filename inside --ckpt (default: FROGNET_WEIGHTS)")
+    ap.add_argument("--out", default=None, help="Artifact dir (default: <ckpt>/artifacts)")
+    ap.add_argument("--formats", default=",".join(ALL_FORMATS))
+    ap.add_argument("--ref-clips", default=None, help="Folder of reference audio (default: synthetic clips)")
+    ap.add_argument("--n-synthetic", type=int, default=8)
+    ap.add_argument("--clip-sec", type=float, default=10.0)
+    ap.add_argument("--min-agreement", type=float, default=None,
+                    help="Exit non-zero if any backend's top-1 agreement is below this")
+    args = ap.parse_args()
+
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    out_dir = Path(args.out) if args.out else Path(args.ckpt) / "artifacts"
+
+    os.environ["FROGNET_BACKEND"] = "eager"   # the reference is always eager fp32
+    ref, _, _ = P.from_pretrained(args.ckpt, filename=args.weights)
+    cnn14 = P._cnn14_module(ref.extractor)
+    if cnn14 is None:
+        raise SystemExit("Eager extractor does not expose the raw Cnn14; use USE_PIP_PANNS=1 or torch.hub.")
+
+    export_artifacts(cnn14, ref.head, out_dir, formats)
+    clips = load_reference_clips(args.ref_clips, args.n_synthetic, args.clip_sec)
+    report = compare_backends(ref, out_dir, formats, clips)
+
+    print(f"\n{'backend':<17} {'ms/clip':>9} {'speedup':>8} {'top1':>6} {'max|dp|':>9} {'MB':>7}")
+    for name, r in report.items():
+        print(f"{name:<17} {r['ms_per_clip']:>9.1f} {r.get('speedup') or 1.0:>8.2f} "
+              f"{r['top1_agreement']:>6.3f} {r.get('max_abs_prob_delta', 0.0):>9.5f} {r.get('size_mb', 0.0):>7.1f}")
+    (out_dir / "export_report.json").write_text(json.dumps(
+        {"clips": len(clips), "ref_clips": args.ref_clips or "synthetic", "backends": report}, indent=2))
+    print(f"\n[saved] {out_dir / 'export_report.json'}")
+
+    if args.min_agreement is not None:
+        bad = [n for n, r in report.items() if r["top1_agreement"] < args.min_agreement]
+        if bad:
+            print(f"[fail] top-1 agreement below {args.min_agreement}: {bad}")
+            sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
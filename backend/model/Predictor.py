@@ -2,23 +2,84 @@
 # Head-only pipeline:
 #   wav (resampled to 32k mono) -> CNN14 embedding [1,2048] -> MLP head -> logits [1,C]
 # - Strictly loads ONLY the specified head file (no filename fallback)
-# - CNN14 via: PyPI (panns-inference) -> local TorchScript -> torch.hub
+# - CNN14 via: PyPI (panns-inference) -> local TorchScript -> torch.hub, or an
+#   exported artifact (FROGNET_BACKEND=torchscript|torchscript-int8|onnx|onnx-int8,
+#   produced by ExportModel.py), or a reduced CNN14 (first conv blocks, maybe
+#   channel-pruned) when config.json has an "extractor" block (TruncateCNN14.py)
 # - Robust shape handling to avoid "too many indices" errors
+# - Optional micro-batching: concurrent callers share one CNN14 + head pass
+# - Optional windowed mode: 2 s / 1 s-hop windows + confidence-weighted
+#   aggregation, configured by the "inference" block of config.json
+# - Windowed mode on an eager Cnn14 computes the log-mel once per clip and
+#   slices windows in the frame domain for the conv trunk
+#   (FROGNET_SHARED_FRONTEND=0 re-runs the STFT per window)
+# - Optional activity gate (inference "gate" / FROGNET_GATE=1): drops windows
+#   with no frog-band activity before CNN14, rejects clips where none pass
+# - Open-set frog check on CNN14's own AudioSet output (same forward pass):
+#   frog_score / frog_likely per request, optionally skipping the head
+# - Optional content-addressed embedding cache (see embedding_cache.py)
+# - Optional cascade (FROGNET_CASCADE=1): a distilled FrogNet-sized student
+#   answers confident clips; only uncertain ones reach CNN14 (see cascade.py)
+# - Accepts a path, raw bytes or a file-like object (see audio_io.py)
+# - Head-only scoring of precomputed embeddings (predict_embeddings)
+# - Per-stage timings (decode, resample, cnn14, head, topk, batcher_wait) via
+#   trace_stages(); shape debug lines are sampled (FROGNET_DEBUG_SAMPLE) and
+#   logged at DEBUG on the "backend.model.Predictor" logger
 
 from __future__ import annotations
-import os, json, importlib
+import os, csv, json, importlib, logging, queue, random, threading, time
+from concurrent.futures import Future
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, List, Optional, Tuple, Union
 
 import numpy as np
 import torch
 import torch.nn as nn
-import librosa
+import torch.nn.functional as F
+
+try:
+    from backend.model.audio_io import AudioSource, decode_audio, is_path, source_bytes
+    from backend.model.cascade import Cascade, load_cascade
+    from backend.model.embedding_cache import EmbeddingCache, audio_key
+except ModuleNotFoundError:  # backend/model itself is on sys.path
+    from audio_io import AudioSource, decode_audio, is_path, source_bytes  # type: ignore
+    from cascade import Cascade, load_cascade  # type: ignore
+    from embedding_cache import EmbeddingCache, audio_key  # type: ignore
+
+logger = logging.getLogger(__name__)
 
 # --------------------- Config ---------------------
 PANN_SR = 32000         # CNN14 expects 32k mono
 HIDDEN  = 256           # your head is 2048->256->C
 
+# Defaults match model/FrognetSem2Tester.py; config.json["inference"] overrides
+INFERENCE_DEFAULTS: Dict[str, Any] = {
+    "mode": "clip",                    # "clip" (whole clip, one pass) | "windowed"
+    "win_sec": 2.0,
+    "hop_sec": 1.0,
+    "window_batch": 16,                # windows per CNN14 pass (unbatched path)
+    "agg_method": "entropy",           # avg | maxprob | entropy | geomean
+    "agg_alpha": 2.0,
+    "agg_topk": None,                  # fixed top-k windows; overrides prop
+    "agg_topk_prop": 0.35,
+    "min_topk": 3,
+    "disable_small_clip_topk_threshold": 4,
+    # Activity gate ahead of CNN14 (FROGNET_GATE=1/0 overrides "gate")
+    "gate": False,
+    "gate_band_hz": [200.0, 5000.0],   # frog-call band
+    "gate_min_dbfs": -60.0,            # window RMS below this is silence
+    "gate_min_band_ratio": 0.05,       # share of window energy inside the band
+    "gate_margin_db": 6.0,             # loudest band frame above the clip's noise floor ...
+    "gate_flux_db": 1.5,               # ... or mean spectral flux in the band (dB/frame)
+    # Open-set check on CNN14's own AudioSet output (FROGNET_FROG_GATE=0|1|reject)
+    "frog_gate": True,                 # report is_frog_likely / frog_score
+    "frog_gate_reject": False,         # not likely -> skip the head, NotFrogError
+    "frog_gate_labels": ["Frog", "Croak"],
+    "frog_gate_min_prob": 0.05,        # likely if any window's frog-label prob reaches this ...
+    "frog_gate_top_n": 10,             # ... or a frog label ranks in its top N AudioSet classes
+}
+
 # --------------------- Heads ----------------------
 class HeadMLP_TypeA(nn.Module):
     """Sequential: net.0 Linear(2048->256), net.1 ReLU, net.2 Linear(256->C)"""
@@ -50,6 +111,24 @@ def _load_json(path: Path):
     with open(path, "r") as f:
         return json.load(f)
 
+def _mmap_load(path: Path) -> Any:
+    """
+    Memory-mapped weight loading: pages are faulted in on first use instead of
+    being unpickled into fresh buffers, which shortens cold starts.
+    - <name>.safetensors (file itself or a sibling) via safetensors, if installed
+    - otherwise torch.load(mmap=True, weights_only=True) (zipfile checkpoints)
+    Raises on failure so callers can fall back to a classic load.
+    """
+    st_path = path if path.suffix == ".safetensors" else path.with_suffix(".safetensors")
+    if st_path.is_file():
+        try:
+            from safetensors.torch import load_file  # optional dependency
+            return load_file(str(st_path), device="cpu")
+        except ImportError:
+            if path.suffix == ".safetensors":
+                raise RuntimeError("safetensors not installed. Run: pip install safetensors")
+    return torch.load(str(path), map_location="cpu", weights_only=True, mmap=True)
+
 def _safe_load_state_dict(model_path: Path) -> Dict[str, Any]:
     """Safe unpickling with allowlist; fallback to classic loader (trusted file)."""
     from torch.serialization import add_safe_globals
@@ -62,12 +141,15 @@ def _safe_load_state_dict(model_path: Path) -> Dict[str, Any]:
     state = None
     first_err = None
     try:
-        state = torch.load(str(model_path), map_location="cpu", weights_only=True)
+        state = _mmap_load(model_path)
     except Exception as e:
         first_err = e
     if state is None:
         try:
-            state = torch.load(str(model_path), map_location="cpu")  # trusted checkpoint
+            try:
+                state = torch.load(str(model_path), map_location="cpu", mmap=True)  # trusted checkpoint
+            except RuntimeError:  # legacy (non-zipfile) format can't be mmapped
+                state = torch.load(str(model_path), map_location="cpu")
         except Exception as e2:
             raise RuntimeError(
                 "Failed to load weights safely and classically.\n"
@@ -87,6 +169,198 @@ def _safe_load_state_dict(model_path: Path) -> Dict[str, Any]:
         state = {k[len("module."):] : v for k, v in state.items()}
     return state
 
+def _inference_cfg(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge config.json["inference"] over defaults; FROGNET_MODE overrides mode."""
+    out = dict(INFERENCE_DEFAULTS)
+    out.update(cfg.get("inference") or {})
+    out["mode"] = os.getenv("FROGNET_MODE", out["mode"])
+    out["gate"] = os.getenv("FROGNET_GATE", "1" if out["gate"] else "0") == "1"
+    frog = os.getenv("FROGNET_FROG_GATE")
+    if frog is not None:
+        out["frog_gate"], out["frog_gate_reject"] = frog in ("1", "reject"), frog == "reject"
+    if out["mode"] not in ("clip", "windowed"):
+        raise ValueError(f"Unknown inference mode: {out['mode']!r} (expected 'clip' or 'windowed')")
+    return out
+
+# ------------- Window aggregation (mirrors FrognetSem2Tester.py) -------------
+def _entropy(p, eps=1e-12):
+    p = np.clip(p, eps, 1.0)
+    return -np.sum(p * np.log(p), axis=-1)
+
+def aggregate_probs(P, method="entropy", alpha=2.0, topk=None, eps=1e-12):
+    """
+    P: [n_windows, C] window probabilities (or a list of (C,) arrays)
+    method: "avg" | "maxprob" | "entropy" | "geomean"
+    alpha: confidence sharpness (used by maxprob/entropy)
+    topk: if set, only use the top-k most confident windows (by weight score)
+    """
+    P = np.asarray(np.stack(P, axis=0) if isinstance(P, (list, tuple)) else P, dtype=np.float64)
+    n, C = P.shape
+
+    if method == "geomean":
+        P = np.clip(P, eps, 1.0)
+        logP = np.log(P)
+        if topk is not None and topk < n:
+            conf = P.max(axis=1)
+            idx = np.argsort(-conf)[:topk]
+            logP = logP[idx]
+        agg = np.exp(np.mean(logP, axis=0))
+        return agg / np.sum(agg)
+
+    if method == "avg":
+        w = np.ones((n,), dtype=np.float64)
+    elif method == "maxprob":
+        w = (P.max(axis=1) + eps) ** alpha
+    elif method == "entropy":
+        conf = 1.0 - _entropy(P, eps) / np.log(C)   # high when distribution is peaky
+        w = np.clip(conf, 0.0, 1.0) ** alpha
+    else:
+        raise ValueError(f"Unknown method: {method}")
+
+    if topk is not None and topk < n:
+        idx = np.argsort(-w)[:topk]
+        P = P[idx]
+        w = w[idx]
+
+    agg = np.sum(P * w[:, None], axis=0) / (np.sum(w) + eps)
+    agg = np.maximum(agg, 0.0)
+    s = agg.sum()
+    return agg / s if s > 0 else agg
+
+def choose_topk_for_clip(n_windows, fixed_k=None, prop=0.35, min_k=3, disable_for_small_at=4):
+    """Dynamic top-k rule tuned for ~9 overlapping windows per clip."""
+    if n_windows <= disable_for_small_at:
+        return None  # don't use top-k at all for tiny clips
+    if fixed_k is not None:
+        return max(1, min(fixed_k, n_windows))
+    k = int(np.ceil(prop * n_windows))
+    return max(min_k, min(k, n_windows))
+
+def _aggregate_windows(probs: np.ndarray, icfg: Dict[str, Any]) -> np.ndarray:
+    """[n_windows, C] -> (C,) using the checkpoint's aggregation settings."""
+    k = choose_topk_for_clip(
+        n_windows=probs.shape[0],
+        fixed_k=icfg["agg_topk"],
+        prop=icfg["agg_topk_prop"],
+        min_k=icfg["min_topk"],
+        disable_for_small_at=icfg["disable_small_clip_topk_threshold"],
+    )
+    return aggregate_probs(probs, method=icfg["agg_method"], alpha=icfg["agg_alpha"], topk=k)
+
+def _frame_windows(y: np.ndarray, win: int, hop: int) -> np.ndarray:
+    """
+    Zero-copy [n_windows, win] strided view over y (same starts as the tester:
+    0, hop, 2*hop, ... while a full window fits). Clips shorter than one window
+    are zero-padded to a single window (the only case that copies).
+    """
+    if y.shape[0] < win:
+        y = np.pad(y, (0, win - y.shape[0]))
+    return np.lib.stride_tricks.sliding_window_view(y, win)[::hop]
+
+# ------------- Activity gate (before CNN14) -------------
+GATE_FRAME, GATE_HOP = 1024, 640    # 32 ms frames every 20 ms @ 32k
+GATE_SUBBANDS = 8
+
+class RejectedClip(ValueError):
+    """Clip turned away before classification; `reason` names the gate."""
+    reason = "rejected"
+
+class NoActivityError(RejectedClip):
+    """No window of the clip passed the activity gate."""
+    reason = "no_activity"
+
+class NotFrogError(RejectedClip):
+    """CNN14's AudioSet output says the clip is not a frog (frog_gate_reject)."""
+    reason = "not_frog"
+
+REJECTIONS = {cls.reason: cls for cls in (RejectedClip, NoActivityError, NotFrogError)}
+
+def _window_reduce(v: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Mean of v over each frame range [starts[i], ends[i])."""
+    c = np.concatenate([[0.0], np.cumsum(v, dtype=np.float64)])
+    return (c[ends] - c[starts]) / np.maximum(ends - starts, 1)
+
+def activity_gate(y: np.ndarray, win: int, hop: int, cfg: Dict[str, Any]) -> np.ndarray:
+    """
+    Keep-mask [n_windows] over the windows _frame_windows(y, win, hop) would
+    produce. One rfft over 20 ms frames of the whole clip; per window:
+      rms_db   >= gate_min_dbfs                (not silence)
+      band share of the energy >= gate_min_band_ratio
+      and either its band energy is gate_margin_db above the clip's noise
+      floor (10th percentile of band energy over all frames), or the
+      mean positive change of sub-band energies is >= gate_flux_db (onsets,
+      pulsed calls).
+    Steady wind, hum and silence fail both of the last two.
+    """
+    eps = 1e-10
+    if y.shape[0] < win:
+        y = np.pad(y, (0, win - y.shape[0]))
+    n = 1 + (y.shape[0] - win) // hop
+    if y.shape[0] < GATE_FRAME:
+        y = np.pad(y, (0, GATE_FRAME - y.shape[0]))
+    frames = np.lib.stride_tricks.sliding_window_view(y, GATE_FRAME)[::GATE_HOP]
+    spec = np.abs(np.fft.rfft(frames * np.hanning(GATE_FRAME).astype(np.float32), axis=1)) ** 2
+    freqs = np.fft.rfftfreq(GATE_FRAME, 1.0 / PANN_SR)
+    lo, hi = cfg["gate_band_hz"]
+    band = spec[:, (freqs >= lo) & (freqs < hi)]
+
+    power = np.mean(frames.astype(np.float64) ** 2, axis=1)
+    band_e, total_e = band.sum(axis=1), spec.sum(axis=1) + eps
+    band_db = 10.0 * np.log10(band_e + eps)
+    sub_db = 10.0 * np.log10(np.stack([b.sum(axis=1) for b in np.array_split(band, GATE_SUBBANDS, axis=1)], 1) + eps)
+    flux = np.zeros(frames.shape[0])
+    flux[1:] = np.maximum(np.diff(sub_db, axis=0), 0.0).mean(axis=1)
+
+    per = max(1, (win - GATE_FRAME) // GATE_HOP + 1)       # frames inside one window
+    starts = np.minimum(np.arange(n) * hop // GATE_HOP, frames.shape[0] - 1)
+    ends = np.minimum(starts + per, frames.shape[0])
+    win_band = _window_reduce(band_e, starts, ends)
+    rms_db = 10.0 * np.log10(_window_reduce(power, starts, ends) + eps)
+    ratio = win_band / _window_reduce(total_e, starts, ends)
+    above_db = 10.0 * np.log10(win_band + eps) - np.percentile(band_db, 10)
+    active = (above_db >= cfg["gate_margin_db"]) | (_window_reduce(flux, starts, ends) >= cfg["gate_flux_db"])
+    return (rms_db >= cfg["gate_min_dbfs"]) & (ratio >= cfg["gate_min_band_ratio"]) & active
+
+# ------------- Open-set frog check (AudioSet output) -------------
+# Indices in the 527-class AudioSet ontology CNN14 was trained on; the panns
+# labels CSV, when present, takes precedence for any other label name.
+AUDIOSET_INDEX = {"Frog": 132, "Croak": 133}
+AUDIOSET_LABELS_CSV = Path.home() / "panns_data" / "class_labels_indices.csv"
+AUDIOSET_KEY = "-audioset"   # embedding-cache side entry: key + AUDIOSET_KEY -> [n,527]
+_audioset_csv: Optional[Dict[str, int]] = None
+
+def _audioset_index(label) -> int:
+    global _audioset_csv
+    if isinstance(label, int):
+        return label
+    if _audioset_csv is None:
+        _audioset_csv = {}
+        try:
+            with open(AUDIOSET_LABELS_CSV, newline="") as f:
+                for row in csv.DictReader(f):
+                    _audioset_csv[row["display_name"]] = int(row["index"])
+        except (OSError, KeyError, ValueError):
+            pass
+    if label in _audioset_csv:
+        return _audioset_csv[label]
+    if label in AUDIOSET_INDEX:
+        return AUDIOSET_INDEX[label]
+    raise ValueError(f"Unknown AudioSet label {label!r} (see {AUDIOSET_LABELS_CSV})")
+
+def frog_likelihood(clipwise, cfg: Dict[str, Any]) -> Tuple[float, bool]:
+    """
+    AudioSet probabilities [n,527] of a clip's windows -> (frog_score, likely):
+    frog_score is the highest frog-label probability over the windows; the
+    clip is likely a frog when it reaches frog_gate_min_prob or a frog label
+    ranks within frog_gate_top_n classes of some window.
+    """
+    p = torch.as_tensor(clipwise, dtype=torch.float32).reshape(-1, clipwise.shape[-1])
+    idx = torch.tensor([_audioset_index(l) for l in cfg["frog_gate_labels"]])
+    frog = p[:, idx]                                          # [n, L]
+    rank = (p[:, None, :] > frog[:, :, None]).sum(dim=-1)     # classes above each frog label
+    score = float(frog.max())
+    return score, score >= cfg["frog_gate_min_prob"] or int(rank.min()) < int(cfg["frog_gate_top_n"])
+
 # ----------------- CNN14 backends -----------------
 def _cnn14_via_pip() -> nn.Module:
     """
@@ -98,13 +372,33 @@ def _cnn14_via_pip() -> nn.Module:
     except Exception as e:
         raise RuntimeError("panns-inference not installed. Run: pip install panns-inference") from e
 
+    class _MmapAudioTagging:
+        """AudioTagging.inference() without its eager torch.load of ~330 MB."""
+        def __init__(self, ckpt_path: Path):
+            models = importlib.import_module("panns_inference.models")
+            self.model = models.Cnn14(sample_rate=PANN_SR, window_size=1024, hop_size=320,
+                                      mel_bins=64, fmin=50, fmax=14000, classes_num=527)
+            state = _safe_load_state_dict(ckpt_path)
+            self.model.load_state_dict(state, assign=True)
+            self.model.eval()
+        def inference(self, audio: np.ndarray):
+            with torch.no_grad():
+                out = self.model(torch.from_numpy(audio), None)
+            return out["clipwise_output"].numpy(), out["embedding"].numpy()
+
+    ckpt_path = Path(os.getenv("CNN14_CHECKPOINT", str(Path.home() / "panns_data" / "Cnn14_mAP=0.431.pth")))
+
     class _WrapPipAT(nn.Module):
         def __init__(self):
             super().__init__()
-            self.at = panns.AudioTagging(checkpoint_path=None, device="cpu")
+            if ckpt_path.is_file() or ckpt_path.with_suffix(".safetensors").is_file():
+                self.at = _MmapAudioTagging(ckpt_path)
+            else:  # first run: let panns download the checkpoint
+                self.at = panns.AudioTagging(checkpoint_path=None, device="cpu")
+            self.cnn14 = self.at.model   # raw Cnn14, used by ExportModel.py
         def forward(self, x: torch.Tensor):
-            # x: [1, T] @ 32k
-            y = x.squeeze(0).detach().cpu().numpy().astype(np.float32)
+            # x: [B, T] @ 32k (B may be 1)
+            y = x.detach().cpu().numpy().astype(np.float32)
             if y.ndim == 1:
                 y_in = y[None, :]        # (1, T) — add batch dim
             else:
@@ -112,15 +406,173 @@ def _cnn14_via_pip() -> nn.Module:
             outputs = self.at.inference(y_in)
             if isinstance(outputs, dict) and "embedding" in outputs:
                 emb = outputs["embedding"]             # (1,2048) or (2048,)
+                clip = outputs.get("clipwise_output")
             elif isinstance(outputs, (list, tuple)) and len(outputs) >= 2:
-                emb = outputs[1]                       # (1,2048) or (2048,)
+                clip, emb = outputs[0], outputs[1]     # (1,527), (1,2048) or unbatched
             else:
                 raise RuntimeError("panns-inference .inference() did not return an embedding.")
             emb = np.asarray(emb)
             if emb.ndim == 1:
                 emb = emb[None, :]
-            return {"embedding": torch.from_numpy(emb).float()}  # [1,2048]
-    return _WrapPipAT()
+            out = {"embedding": torch.from_numpy(emb).float()}  # [B,2048]
+            if clip is not None:
+                out["clipwise_output"] = torch.from_numpy(np.asarray(clip)).float().reshape(emb.shape[0], -1)
+            return out
+    ext = _WrapPipAT()
+    ext.cache_id = "panns-pip:Cnn14_mAP=0.431"
+    return ext
+
+class _WrapTS(nn.Module):
+    """TorchScript CNN14 returning a dict or (clipwise_output, embedding)."""
+    def __init__(self, ts_mod): super().__init__(); self.ts = ts_mod
+    def forward(self, x):
+        out = self.ts(x)
+        if isinstance(out, dict) and "embedding" in out:
+            return out
+        if isinstance(out, (list, tuple)) and len(out) >= 2:
+            return {"clipwise_output": out[0], "embedding": out[1]}
+        raise RuntimeError("TorchScript CNN14 did not produce an 'embedding'.")
+
+def _artifact_id(kind: str, path: Path) -> str:
+    st = path.stat()
+    return f"{kind}:{path.name}:{st.st_size}:{int(st.st_mtime)}"
+
+def _load_ts_extractor(path: Path) -> nn.Module:
+    ts = torch.jit.load(str(path), map_location="cpu")
+    ts.eval()
+    ext = _WrapTS(ts)
+    ext.cache_id = _artifact_id("torchscript", path)
+    return ext
+
+def _ort_session(path: Path):
+    try:
+        ort = importlib.import_module("onnxruntime")
+    except Exception as e:
+        raise RuntimeError("onnxruntime not installed. Run: pip install onnxruntime") from e
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    threads = int(os.getenv("FROGNET_ORT_THREADS", "0"))
+    if threads > 0:
+        opts.intra_op_num_threads = threads
+    return ort.InferenceSession(str(path), sess_options=opts, providers=["CPUExecutionProvider"])
+
+class _WrapOnnxCNN14(nn.Module):
+    """ONNX Runtime CNN14: waveform [B,T] -> {clipwise_output, embedding}."""
+    def __init__(self, path: Path):
+        super().__init__()
+        self.sess = _ort_session(path)
+        self.cache_id = _artifact_id("onnx", path)
+    def forward(self, x: torch.Tensor):
+        clip, emb = self.sess.run(["clipwise_output", "embedding"],
+                                  {"waveform": x.detach().cpu().numpy().astype(np.float32)})
+        return {"clipwise_output": torch.from_numpy(clip), "embedding": torch.from_numpy(emb)}
+
+class _WrapOnnxHead(nn.Module):
+    def __init__(self, path: Path):
+        super().__init__()
+        self.sess = _ort_session(path)
+    def forward(self, emb: torch.Tensor) -> torch.Tensor:
+        (logits,) = self.sess.run(["logits"], {"embedding": emb.detach().cpu().numpy().astype(np.float32)})
+        return torch.from_numpy(logits)
+
+# backend name -> (extractor artifact, head artifact) inside the artifact dir
+BACKEND_ARTIFACTS: Dict[str, Tuple[str, str]] = {
+    "torchscript":      ("cnn14.ts.pt",      "head.ts.pt"),
+    "torchscript-int8": ("cnn14.int8.ts.pt", "head.int8.ts.pt"),
+    "onnx":             ("cnn14.onnx",       "head.onnx"),
+    "onnx-int8":        ("cnn14.int8.onnx",  "head.int8.onnx"),
+}
+
+def _load_backend(backend: str, artifact_dir: Path) -> Tuple[nn.Module, Optional[nn.Module]]:
+    """Load (extractor, head) artifacts written by ExportModel.py; head is None if absent."""
+    if backend not in BACKEND_ARTIFACTS:
+        raise ValueError(f"Unknown FROGNET_BACKEND {backend!r}; expected eager or one of {sorted(BACKEND_ARTIFACTS)}")
+    ext_name, head_name = BACKEND_ARTIFACTS[backend]
+    ext_path, head_path = artifact_dir / ext_name, artifact_dir / head_name
+    if not ext_path.is_file():
+        raise FileNotFoundError(
+            f"CNN14 artifact for backend '{backend}' not found: {ext_path}\n"
+            f"Run: python backend/model/ExportModel.py --ckpt <ckpt_dir>"
+        )
+    if backend.startswith("onnx"):
+        extractor = _WrapOnnxCNN14(ext_path)
+        head = _WrapOnnxHead(head_path) if head_path.is_file() else None
+    else:
+        extractor = _load_ts_extractor(ext_path)
+        head = torch.jit.load(str(head_path), map_location="cpu").eval() if head_path.is_file() else None
+    return extractor, head
+
+def _cnn14_module(extractor: nn.Module) -> Optional[nn.Module]:
+    """The raw panns Cnn14 behind an eager extractor (None for TS/ONNX backends)."""
+    if hasattr(extractor, "spectrogram_extractor"):   # torch.hub Cnn14 itself
+        return extractor
+    return getattr(extractor, "cnn14", None)
+
+# ------------- Reduced CNN14 (TruncateCNN14.py) -------------
+EXTRACTOR_FILE = "extractor.pt"
+
+class ReducedCnn14(nn.Module):
+    """
+    CNN14's log-mel front end and its first len(channels) conv blocks (channel
+    counts below CNN14's when pruned), pooled like CNN14 itself (mean over mel
+    bins, max + mean over time) into embeddings [B, channels[-1]]. There is no
+    fc1 / AudioSet layer, so the frog check has no clipwise output to use.
+    """
+    def __init__(self, channels: List[int]):
+        super().__init__()
+        try:
+            from panns_inference.models import ConvBlock
+            from torchlibrosa.stft import LogmelFilterBank, Spectrogram
+        except Exception as e:
+            raise RuntimeError("panns-inference not installed. Run: pip install panns-inference") from e
+        # Same front end arguments as panns Cnn14(sample_rate=32000, window_size=1024, hop_size=320, mel_bins=64)
+        self.spectrogram_extractor = Spectrogram(n_fft=1024, hop_length=320, win_length=1024, window="hann",
+                                                 center=True, pad_mode="reflect", freeze_parameters=True)
+        self.logmel_extractor = LogmelFilterBank(sr=PANN_SR, n_fft=1024, n_mels=64, fmin=50, fmax=14000,
+                                                 ref=1.0, amin=1e-10, top_db=None, freeze_parameters=True)
+        self.bn0 = nn.BatchNorm2d(64)
+        self.channels = [int(c) for c in channels]
+        self.blocks = nn.ModuleList(ConvBlock(i, o) for i, o in zip([1] + self.channels[:-1], self.channels))
+        self.eval()
+
+    def embed_logmel(self, mel: torch.Tensor) -> Tuple[torch.Tensor, None]:
+        """Log-mel windows [B, frames, mel_bins] (after bn0) -> (embeddings [B, channels[-1]], None)."""
+        with torch.no_grad():
+            x = mel[:, None]
+            for i, block in enumerate(self.blocks):
+                x = block(x, pool_size=(2, 2) if i < 5 else (1, 1), pool_type="avg")
+            x = torch.mean(x, dim=3)
+            return torch.max(x, dim=2)[0] + torch.mean(x, dim=2), None
+
+    def forward(self, x: torch.Tensor):
+        with torch.no_grad():
+            mel = self.logmel_extractor(self.spectrogram_extractor(x))   # [B, 1, frames, mel_bins]
+            mel = self.bn0(mel.transpose(1, 3)).transpose(1, 3)
+        return {"embedding": self.embed_logmel(mel[:, 0])[0]}
+
+def extractor_ident(spec: Optional[Dict[str, Any]]) -> str:
+    """
+    What a head was trained on, from config.json["extractor"] (None: the full
+    CNN14): the reduced architecture and, when recorded, its weights' hash.
+    """
+    if not spec:
+        return "cnn14"
+    ident = f"{spec.get('type', 'cnn14-reduced')}:{'-'.join(str(c) for c in spec['channels'])}"
+    return ident + (f":{spec['sha256'][:12]}" if spec.get("sha256") else "")
+
+def _load_reduced_cnn14(ckpt: Path, spec: Dict[str, Any]) -> nn.Module:
+    """Reduced extractor described by config.json["extractor"], weights from the checkpoint dir."""
+    path = ckpt / spec.get("weights", EXTRACTOR_FILE)
+    if not path.is_file():
+        raise FileNotFoundError(
+            f"Reduced CNN14 weights not found: {path}\n"
+            f"Run: python backend/model/TruncateCNN14.py --data <frog data> --out <dir>"
+        )
+    ext = ReducedCnn14(spec["channels"])
+    ext.load_state_dict(_safe_load_state_dict(path), strict=True)
+    ext.eval()
+    ext.cache_id = _artifact_id(f"cnn14-reduced-d{len(ext.channels)}", path)
+    return ext
 
 def _load_panns_cnn14() -> nn.Module:
     """
@@ -141,18 +593,7 @@ def _load_panns_cnn14() -> nn.Module:
     local_ts = os.getenv("CNN14_LOCAL_TS")
     if local_ts and Path(local_ts).is_file():
         try:
-            ts = torch.jit.load(local_ts, map_location="cpu")
-            ts.eval()
-            class _WrapTS(nn.Module):
-                def __init__(self, ts_mod): super().__init__(); self.ts = ts_mod
-                def forward(self, x):
-                    out = self.ts(x)
-                    if isinstance(out, dict) and "embedding" in out:
-                        return out
-                    if isinstance(out, (list, tuple)) and len(out) >= 2:
-                        return {"embedding": out[1]}
-                    raise RuntimeError("TorchScript CNN14 did not produce an 'embedding'.")
-            return _WrapTS(ts)
+            return _load_ts_extractor(Path(local_ts))
         except Exception as e:
             print(f"[warn] Failed to load CNN14 TorchScript from {local_ts}: {e}")
 
@@ -162,12 +603,14 @@ def _load_panns_cnn14() -> nn.Module:
         repo = "qiuqiangkong/panns-inference:main"
         model = torch.hub.load(repo, "Cnn14", pretrained=True, trust_repo=trust)
         model.eval()
+        model.cache_id = f"hub:{repo}"
         return model
     except Exception as e_main:
         try:
             repo = "qiuqiangkong/panns-inference"
             model = torch.hub.load(repo, "Cnn14", pretrained=True, trust_repo=trust)
             model.eval()
+            model.cache_id = f"hub:{repo}"
             return model
         except Exception as e_plain:
             raise RuntimeError(
@@ -179,22 +622,69 @@ def _load_panns_cnn14() -> nn.Module:
                 f"Hub errors:\n  main: {type(e_main).__name__}: {e_main}\n  plain: {type(e_plain).__name__}: {e_plain}"
             )
 
+# --------------- Stage timing / debug ---------------
+_trace = threading.local()
+DEBUG_SAMPLE = float(os.getenv("FROGNET_DEBUG_SAMPLE", "0"))  # fraction of calls that log shapes
+
+@contextmanager
+def trace_stages(timings: Optional[Dict[str, float]]):
+    """
+    Collect per-stage ms for the calls made inside this block (this thread)
+    into `timings`: decode, resample, gate, logmel, cnn14, head, topk,
+    batcher_wait, student, plus audio_sec (decoded duration), gate_windows /
+    gate_kept (activity gate window counts), frog_score / frog_likely
+    (AudioSet frog check) and cascade_clips / cascade_escalated (clips the
+    student screened / sent on to CNN14). None disables collection.
+    """
+    prev = getattr(_trace, "stages", None)
+    _trace.stages = timings
+    try:
+        yield timings
+    finally:
+        _trace.stages = prev
+
+def _stages() -> Optional[Dict[str, float]]:
+    return getattr(_trace, "stages", None)
+
+def _add_stages(vals: Dict[str, float]):
+    tr = _stages()
+    if tr is not None:
+        for k, v in vals.items():
+            tr[k] = tr.get(k, 0.0) + v
+
+def _note(**vals: float):
+    """Set (not accumulate) per-request values in the trace, e.g. frog_score."""
+    tr = _stages()
+    if tr is not None:
+        tr.update(vals)
+
+@contextmanager
+def _stage(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add_stages({name: (time.perf_counter() - t0) * 1000.0})
+
+def _debug(msg: str):
+    if DEBUG_SAMPLE > 0 and random.random() < DEBUG_SAMPLE:
+        logger.debug(msg)
+
 # ------------- wav -> embedding (backend-agnostic) -------------
-def _wav_to_embedding(cnn14: nn.Module, wav_path: str) -> torch.Tensor:
-    """Load audio, resample to 32k mono, return [1,2048] embedding."""
-    y, _ = librosa.load(wav_path, sr=PANN_SR, mono=True)
-    x = torch.from_numpy(y).float().unsqueeze(0)  # [1, T]
-    with torch.no_grad():
-        out = cnn14(x)
-        if isinstance(out, dict) and "embedding" in out:
-            emb = out["embedding"]
-        elif isinstance(out, (list, tuple)) and len(out) >= 2:
-            emb = out[1]
-        else:
-            raise RuntimeError("CNN14 backend did not produce an 'embedding'.")
-    # Normalize to tensor [1,2048]
+def _load_wave(src: AudioSource) -> np.ndarray:
+    """Decode a path / bytes / file-like to float32 mono @ 32k, shape (T,)."""
+    y = decode_audio(src, PANN_SR, timings=_stages())
+    if y.shape[0] == 0:
+        raise ValueError("Decoded audio is empty.")
+    _add_stages({"audio_sec": y.shape[0] / PANN_SR})
+    return y
+
+def _normalize_embedding(emb) -> torch.Tensor:
+    """Coerce any backend output to a float tensor [B,2048]."""
     if isinstance(emb, np.ndarray):
         emb = torch.from_numpy(emb).float()
+    elif not torch.is_tensor(emb):
+        raise RuntimeError(f"Unexpected embedding type: {type(emb)}")
     if emb.dim() == 0:
         emb = emb.view(1, 1)
     elif emb.dim() == 1:
@@ -203,13 +693,640 @@ def _wav_to_embedding(cnn14: nn.Module, wav_path: str) -> torch.Tensor:
         emb = emb.reshape(emb.size(0), -1)
     return emb
 
+def _cnn14_forward(cnn14: nn.Module, x: torch.Tensor) -> Tuple[torch.Tensor, Optional[torch.Tensor]]:
+    """
+    Run CNN14 on a batch of waveforms [B,T] @ 32k -> (embeddings [B,2048],
+    AudioSet probabilities [B,527] or None if the backend only gives embeddings).
+    """
+    with torch.no_grad():
+        out = cnn14(x)
+        if isinstance(out, dict) and "embedding" in out:
+            emb, clip = out["embedding"], out.get("clipwise_output")
+        elif isinstance(out, (list, tuple)) and len(out) >= 2:
+            clip, emb = out[0], out[1]
+        else:
+            raise RuntimeError("CNN14 backend did not produce an 'embedding'.")
+    emb = _normalize_embedding(emb)
+    if clip is not None:
+        clip = _normalize_embedding(clip)
+        if clip.shape[0] != emb.shape[0]:
+            clip = None
+    return emb, clip
+
+def _embed_waves(cnn14: nn.Module, x: torch.Tensor) -> torch.Tensor:
+    """Run CNN14 on a batch of waveforms [B,T] @ 32k, return [B,2048]."""
+    return _cnn14_forward(cnn14, x)[0]
+
+def _wav_to_embedding(cnn14: nn.Module, wav_path: AudioSource) -> torch.Tensor:
+    """Load audio, resample to 32k mono, return [1,2048] embedding."""
+    y = _load_wave(wav_path)
+    x = torch.from_numpy(y).float().unsqueeze(0)  # [1, T]
+    return _embed_waves(cnn14, x)
+
+# ------- Shared log-mel front end (windowed mode) -------
+SHARED_FRONTEND = os.getenv("FROGNET_SHARED_FRONTEND", "1") == "1"
+
+def _frontend_hop(cnn14: Optional[nn.Module]) -> Optional[int]:
+    """STFT hop in samples if cnn14 exposes the panns Cnn14 (or ReducedCnn14) stages, else None."""
+    if cnn14 is None or not all(hasattr(cnn14, a) for a in ("spectrogram_extractor", "logmel_extractor", "bn0")):
+        return None
+    if not (hasattr(cnn14, "embed_logmel") or all(hasattr(cnn14, a) for a in ("conv_block6", "fc1", "fc_audioset"))):
+        return None
+    stft = getattr(cnn14.spectrogram_extractor, "stft", None)
+    return int(getattr(stft, "hop_length", 0)) or None
+
+def _clip_logmel(cnn14: nn.Module, y: np.ndarray) -> torch.Tensor:
+    """Whole-clip log-mel after bn0, [frames, mel_bins] (eval mode)."""
+    with torch.no_grad():
+        x = cnn14.spectrogram_extractor(torch.from_numpy(np.ascontiguousarray(y)).float()[None, :])
+        x = cnn14.logmel_extractor(x)                     # [1, 1, frames, mel_bins]
+        x = cnn14.bn0(x.transpose(1, 3)).transpose(1, 3)
+    return x[0, 0]
+
+def _embed_logmel(cnn14: nn.Module, mel: torch.Tensor) -> Tuple[torch.Tensor, Optional[torch.Tensor]]:
+    """
+    Cnn14 conv trunk + fc1 on log-mel windows [B, frames, mel_bins] ->
+    (embeddings [B, 2048], AudioSet probabilities [B, 527]) (eval mode).
+    A ReducedCnn14 runs its own blocks and has no AudioSet output (None).
+    """
+    if hasattr(cnn14, "embed_logmel"):
+        return cnn14.embed_logmel(mel)
+    with torch.no_grad():
+        x = mel[:, None]
+        for i, block in enumerate((cnn14.conv_block1, cnn14.conv_block2, cnn14.conv_block3,
+                                   cnn14.conv_block4, cnn14.conv_block5, cnn14.conv_block6)):
+            x = block(x, pool_size=(2, 2) if i < 5 else (1, 1), pool_type="avg")
+        x = torch.mean(x, dim=3)
+        x = torch.max(x, dim=2)[0] + torch.mean(x, dim=2)
+        emb = F.relu_(cnn14.fc1(x))
+        return emb, torch.sigmoid(cnn14.fc_audioset(emb))
+
+# ------------------ Micro-batching ------------------
+class BatchScheduler:
+    """
+    Collects waveforms from concurrent callers for up to `max_wait_ms`, groups
+    them by exact sample length and runs one CNN14 pass per length plus a
+    single head pass for the whole batch. Each caller gets back its own
+    (embeddings [n, 2048], logits [n, C]). Lengths are never mixed: CNN14 has
+    no mask and pools over time, so zero padding would change a clip's
+    embedding. Windowed mode frames every clip to the same window length, so
+    its windows always share a pass.
+
+    Submitted items are float32 arrays of shape (T,) or (n, T), or log-mel
+    windows (n, frames, mel_bins) from the shared front end, which skip the
+    STFT and go straight to the conv trunk; rows of one item always stay
+    together. `max_batch_size` caps the rows per CNN14 pass.
+    An item may carry its own head (`score`), e.g. a canary version; items
+    are then grouped per head for the head pass.
+
+    Each returned Future has a `stages` dict (batcher_wait, cnn14, head ms of
+    the batch it rode in) and `audioset` (the item's AudioSet probabilities
+    [n, 527], or None); `on_batch(rows, items)` is called once per batch.
+    An item's `gate(audioset)` may return an exception to fail it before the
+    head pass (the open-set frog check).
+    """
+    def __init__(self, pipeline: "Pipeline", max_batch_size: int = 8, max_wait_ms: float = 5.0):
+        self.pipeline = pipeline
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue: "queue.Queue[Optional[Tuple[np.ndarray, Future, Any, float, Any]]]" = queue.Queue()
+        self.on_batch: Optional[Callable[[int, int], None]] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name="frognet-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, wave: np.ndarray, score=None, gate=None) -> Future:
+        """
+        score: embeddings -> logits (default: the owning pipeline's head).
+        gate: AudioSet probabilities -> exception or None (optional).
+        """
+        if self._closed:
+            raise RuntimeError("BatchScheduler is closed.")
+        x = np.asarray(wave, dtype=np.float32)
+        if x.ndim == 1:
+            x = x[None, :]
+        if x.ndim not in (2, 3) or x.shape[1] == 0:
+            raise ValueError(f"Expected waveform (T,) or (n, T) or log-mel (n, frames, mels), got shape {x.shape}")
+        fut: Future = Future()
+        self._queue.put((x, fut, score or self.pipeline.logits_from_embeddings, time.perf_counter(), gate))
+        return fut
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=5.0)
+
+    # -- worker side --
+    def _collect(self) -> List[Tuple[np.ndarray, Future, Any, float, Any]]:
+        first = self._queue.get()
+        if first is None:
+            return []
+        items = [first]
+        rows = first[0].shape[0]
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # re-post so the loop exits after this batch
+                break
+            items.append(item)
+            rows += item[0].shape[0]
+        return items
+
+    def _embed_bucket(self, xs: List[np.ndarray]) -> Tuple[torch.Tensor, Optional[torch.Tensor]]:
+        if xs[0].ndim == 3:  # log-mel windows: same frame count within a group
+            mel = torch.from_numpy(np.concatenate(xs, axis=0))
+            cnn14 = _cnn14_module(self.pipeline.extractor)
+            outs = [_embed_logmel(cnn14, mel[i:i + self.max_batch_size])
+                    for i in range(0, mel.size(0), self.max_batch_size)]
+        else:
+            xb = torch.from_numpy(np.concatenate(xs, axis=0))   # same sample count within a group
+            outs = [
+                _cnn14_forward(self.pipeline.extractor, xb[i:i + self.max_batch_size])
+                for i in range(0, xb.size(0), self.max_batch_size)
+            ]
+        clips = [c for _, c in outs]
+        clip = None if any(c is None for c in clips) else torch.cat(clips, dim=0)
+        return torch.cat([e for e, _ in outs], dim=0), clip
+
+    def _run(self, items: List[Tuple[np.ndarray, Future, Any, float, Any]]):
+        t_start = time.perf_counter()
+        for x, fut, _, t_sub, _ in items:
+            fut.stages = {"batcher_wait": (t_start - t_sub) * 1000.0}
+            fut.audioset = None
+        if self.on_batch is not None:
+            try:
+                self.on_batch(sum(it[0].shape[0] for it in items), len(items))
+            except Exception:
+                pass
+        buckets: Dict[Any, List[int]] = {}
+        for i, it in enumerate(items):
+            x = it[0]
+            key = ("mel" if x.ndim == 3 else "wave", x.shape[1])
+            buckets.setdefault(key, []).append(i)
+
+        embs: Dict[int, torch.Tensor] = {}
+        for idxs in buckets.values():
+            t0 = time.perf_counter()
+            try:
+                e, clip = self._embed_bucket([items[i][0] for i in idxs])
+            except Exception as ex:
+                for i in idxs:
+                    items[i][1].set_exception(ex)
+                continue
+            ms = (time.perf_counter() - t0) * 1000.0
+            r = 0
+            for i in idxs:
+                n = items[i][0].shape[0]
+                fut, gate = items[i][1], items[i][4]
+                fut.stages["cnn14"] = ms
+                if clip is not None:
+                    fut.audioset = clip[r:r + n]
+                rejected = gate(fut.audioset) if gate is not None else None
+                if rejected is not None:  # short-circuit: no head pass for this item
+                    fut.set_exception(rejected)
+                else:
+                    embs[i] = e[r:r + n]
+                r += n
+
+        # One head pass per distinct head (normally just one)
+        heads: Dict[int, List[int]] = {}
+        for i in sorted(embs):
+            heads.setdefault(id(items[i][2]), []).append(i)
+        for order in heads.values():
+            t0 = time.perf_counter()
+            try:
+                logits = items[order[0]][2](torch.cat([embs[i] for i in order], dim=0))
+            except Exception as ex:
+                for i in order:
+                    items[i][1].set_exception(ex)
+                continue
+            ms = (time.perf_counter() - t0) * 1000.0
+            r = 0
+            for i in order:
+                n = embs[i].size(0)
+                items[i][1].stages["head"] = ms
+                items[i][1].set_result((embs[i], logits[r:r + n]))
+                r += n
+
+    def _loop(self):
+        while True:
+            items = self._collect()
+            if not items:
+                return
+            items = [it for it in items if it[1].set_running_or_notify_cancel()]
+            if items:
+                self._run(items)
+
+# ----------------- Pipeline wrapper -----------------
+class Pipeline(nn.Module):
+    """
+    CNN14 extractor + MLP head. forward(wav_path) -> logits [1, C].
+    In windowed mode the returned "logits" are log(aggregated window probs),
+    so softmax() in predict_one recovers the aggregated distribution exactly.
+    """
+    def __init__(self, extractor: nn.Module, head: nn.Module, infer_cfg: Optional[Dict[str, Any]] = None):
+        super().__init__()
+        self.extractor = extractor
+        self.head = head
+        self.infer_cfg = _inference_cfg({"inference": infer_cfg or {}})
+        self.scheduler: Optional[BatchScheduler] = None
+        self.cache: Optional[EmbeddingCache] = None
+        self.cascade: Optional[Cascade] = None
+
+    def enable_batching(self, max_batch_size: int = 8, max_wait_ms: float = 5.0) -> BatchScheduler:
+        """Route forward() through a shared micro-batching scheduler."""
+        if self.scheduler is not None:
+            self.scheduler.close()
+        self.scheduler = BatchScheduler(self, max_batch_size, max_wait_ms)
+        return self.scheduler
+
+    def enable_cache(self, cache: Optional[EmbeddingCache] = None) -> EmbeddingCache:
+        """Memoize embeddings by audio content; a hit costs only the head pass."""
+        self.cache = cache or EmbeddingCache()
+        return self.cache
+
+    def enable_cascade(self, cascade: Optional[Cascade]) -> Optional[Cascade]:
+        """
+        Screen clips with a distilled student first (forward / predict_waves),
+        after the activity gate and never when the frog check rejects; None
+        turns it off. Not carried over by with_head(): a student only
+        stands in for the head it was distilled from.
+        """
+        self.cascade = cascade
+        return cascade
+
+    def _screen(self, ys: List[np.ndarray]
+                ) -> Tuple[List[Optional[np.ndarray]], Dict[int, NoActivityError], Dict[int, np.ndarray]]:
+        """
+        Cascade front: the activity gate first, then the student on the clips
+        that pass it. Returns (gate keep-mask per clip, for CNN14 to reuse;
+        {i: NoActivityError} for gated clips; {i: student probs [C]} for the
+        clips the student answers). With a rejecting frog check nothing is
+        answered: only CNN14's AudioSet output can tell a frog from junk.
+        """
+        keeps: List[Optional[np.ndarray]] = [None] * len(ys)
+        rejected: Dict[int, NoActivityError] = {}
+        for i, y in enumerate(ys):
+            try:
+                keeps[i] = self._activity_keep(y)
+            except NoActivityError as e:
+                rejected[i] = e
+        live = [i for i in range(len(ys)) if i not in rejected]
+        answered: Dict[int, np.ndarray] = {}
+        icfg = self.infer_cfg
+        if live and not (icfg["frog_gate"] and icfg["frog_gate_reject"]):
+            with _stage("student"):
+                probs, accepted = self.cascade.screen([ys[i] for i in live], PANN_SR)
+            answered = {i: probs[j] for j, i in enumerate(live) if accepted[j]}
+        _add_stages({"cascade_clips": len(live), "cascade_escalated": len(live) - len(answered)})
+        return keeps, rejected, answered
+
+    def with_head(self, head: nn.Module, infer_cfg: Optional[Dict[str, Any]] = None) -> "Pipeline":
+        """
+        A pipeline serving another head on the same extractor, batcher and
+        embedding cache (used by the model registry for hot swaps / canaries).
+        """
+        view = Pipeline(self.extractor, head, infer_cfg=infer_cfg or self.infer_cfg)
+        view.scheduler = self.scheduler
+        view.cache = self.cache
+        return view
+
+    def cache_ident(self) -> str:
+        """Extractor identity + everything that changes the cached embedding."""
+        ident = getattr(self.extractor, "cache_id", type(self.extractor).__name__)
+        icfg = self.infer_cfg
+        if icfg["mode"] == "windowed":
+            ident += f"|win={icfg['win_sec']}|hop={icfg['hop_sec']}"
+            if self._frontend() is not None:
+                ident += "|mel=shared"
+        if icfg["gate"]:
+            ident += "|gate=" + ",".join(f"{icfg[k]}" for k in sorted(icfg) if k.startswith("gate_"))
+        return f"{ident}|sr={PANN_SR}"
+
+    def _activity_keep(self, y: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Activity gate keep-mask over the clip's CNN14 windows (None when the
+        gate is off). Raises NoActivityError when no window passes.
+        """
+        icfg = self.infer_cfg
+        if not icfg["gate"]:
+            return None
+        win, hop = self._win_hop() if icfg["mode"] == "windowed" else (y.shape[0], y.shape[0])
+        with _stage("gate"):
+            keep = activity_gate(y, win, hop, icfg)
+        _add_stages({"gate_windows": keep.size, "gate_kept": int(keep.sum())})
+        if not keep.any():
+            raise NoActivityError(f"No activity in {keep.size} window(s) above the noise floor.")
+        return keep
+
+    def _gated_windows(self, y: np.ndarray, keep: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        CNN14 input for one clip (see _windows; the whole clip in clip mode),
+        minus the windows the activity gate drops. Raises NoActivityError,
+        before any STFT or CNN14 work, when no window passes. keep: the gate's
+        mask when it already ran (the cascade gates before its student).
+        """
+        windowed = self.infer_cfg["mode"] == "windowed"
+        if keep is None:
+            keep = self._activity_keep(y)
+        x = self._windows(y) if windowed else y[None, :]
+        return x if keep is None or keep.all() else x[keep]
+
+    def _win_hop(self) -> Tuple[int, int]:
+        """Windowed-mode window and hop in samples @ 32k."""
+        return int(self.infer_cfg["win_sec"] * PANN_SR), int(self.infer_cfg["hop_sec"] * PANN_SR)
+
+    def _frontend(self, win: Optional[int] = None, hop: Optional[int] = None) -> Optional[nn.Module]:
+        """
+        The raw Cnn14 when windows of win/hop samples (default: windowed
+        mode's, None in clip mode) can share one log-mel per clip, else None.
+        """
+        if win is None:
+            if self.infer_cfg["mode"] != "windowed":
+                return None
+            win, hop = self._win_hop()
+        if not SHARED_FRONTEND:
+            return None
+        cnn14 = _cnn14_module(self.extractor)
+        hop_len = _frontend_hop(cnn14)
+        if hop_len is None or win % hop_len or hop % hop_len:
+            return None
+        return cnn14
+
+    def _windows(self, y: np.ndarray, win: Optional[int] = None, hop: Optional[int] = None) -> np.ndarray:
+        """
+        Windowed input for one clip (win/hop default to windowed mode's):
+        log-mel windows [n, frames, mels] sliced from a single whole-clip STFT
+        when the front end can be shared, otherwise the raw waveform windows [n, win].
+        """
+        if win is None:
+            win, hop = self._win_hop()
+        cnn14 = self._frontend(win, hop)
+        if cnn14 is None:
+            return _frame_windows(y, win, hop)
+        hop_len = _frontend_hop(cnn14)
+        if y.shape[0] < win:
+            y = np.pad(y, (0, win - y.shape[0]))
+        n = 1 + (y.shape[0] - win) // hop
+        with _stage("logmel"):
+            mel = _clip_logmel(cnn14, y)
+        # A window of `win` samples spans win/hop_len + 1 centred STFT frames
+        win_f, hop_f = win // hop_len + 1, hop // hop_len
+        return mel.unfold(0, win_f, hop_f)[:n].permute(0, 2, 1).contiguous().numpy()
+
+    @property
+    def embed_dim(self) -> int:
+        """Embedding width the head takes: 2048 for CNN14, less for a reduced extractor."""
+        lin = next((m for m in self.head.modules() if isinstance(m, nn.Linear)), None)
+        return lin.in_features if lin is not None else 2048
+
+    def logits_from_embeddings(self, emb) -> torch.Tensor:
+        """Head pass for embeddings [B,2048] -> logits [B,C]."""
+        emb = _normalize_embedding(emb)
+        if emb.shape[-1] != self.embed_dim:
+            _debug(f"embedding shape {tuple(emb.shape)} (expected last dim {self.embed_dim})")
+        with torch.no_grad():
+            out = self.head(emb)
+        if isinstance(out, np.ndarray):
+            out = torch.from_numpy(out)
+        if out.dim() == 0:
+            out = out.view(1, 1)
+        elif out.dim() == 1:
+            out = out.unsqueeze(0)
+        return out
+
+    def score_wave(self, y: np.ndarray) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        32k mono waveform -> (embeddings [n,2048], logits [n,C]), where n is the
+        number of windows in windowed mode (those passing the activity gate,
+        when on) and 1 in clip mode. Runs the frog check on the clip.
+        """
+        emb, logits, _ = self._score_windows(self._gated_windows(y))
+        return emb, logits
+
+    def score_windows(self, x: np.ndarray) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Already-framed 32k windows [n,T] (or shared-front-end log-mel windows
+        [n,frames,mels]) -> (embeddings [n,2048], logits [n,C]). No frog check:
+        the rows need not be one clip (e.g. streaming).
+        """
+        emb, logits, _ = self._score_windows(x, gate=False)
+        return emb, logits
+
+    def score_timeline(self, y: np.ndarray, win: int, hop: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Per-window class probabilities over a whole recording in one batched
+        pass, in any inference mode: (start sample of each window [m],
+        probabilities [m,C]) for the windows the activity gate keeps (all of
+        them when it is off). Never raises for an empty gate: m may be 0.
+        """
+        n = 1 + (max(y.shape[0], win) - win) // hop
+        keep = np.ones(n, dtype=bool)
+        if self.infer_cfg["gate"]:
+            with _stage("gate"):
+                keep = activity_gate(y, win, hop, self.infer_cfg)
+            _add_stages({"gate_windows": n, "gate_kept": int(keep.sum())})
+        starts = np.flatnonzero(keep) * hop
+        if not keep.any():
+            return starts, np.zeros((0, 0), dtype=np.float32)
+        x = self._windows(y, win, hop)
+        _, logits = self.score_windows(x if keep.all() else x[keep])
+        return starts, torch.softmax(logits, dim=-1).cpu().numpy()
+
+    def frog_check(self, audioset: Optional[torch.Tensor]) -> Optional[NotFrogError]:
+        """
+        Open-set check on CNN14's AudioSet output for one clip's rows. Notes
+        frog_score / frog_likely in the trace (when known) and returns the
+        NotFrogError to raise when the clip should skip the head.
+        """
+        icfg = self.infer_cfg
+        if audioset is None or not icfg["frog_gate"]:
+            return None
+        score, likely = frog_likelihood(audioset, icfg)
+        _note(frog_score=score, frog_likely=float(likely))
+        if likely or not icfg["frog_gate_reject"]:
+            return None
+        return NotFrogError(f"AudioSet frog labels peak at {score:.3f}; not likely a frog.")
+
+    def _frog_gate_fn(self, rejecting: bool):
+        """Scheduler-side gate: decide only (the trace lives in the caller's thread)."""
+        if not rejecting:
+            return None
+        icfg = self.infer_cfg
+        def gate(audioset):
+            if audioset is None or frog_likelihood(audioset, icfg)[1]:
+                return None
+            return NotFrogError("not likely a frog")
+        return gate
+
+    def _score_windows(self, x: np.ndarray, gate: bool = True
+                       ) -> Tuple[torch.Tensor, torch.Tensor, Optional[torch.Tensor]]:
+        """
+        score_windows plus the AudioSet probabilities [n,527] (None if the
+        backend has no clipwise output). gate=True runs the frog check on the
+        rows as one clip and, when rejecting, raises NotFrogError before the head.
+        """
+        icfg = self.infer_cfg
+        rejecting = gate and icfg["frog_gate"] and icfg["frog_gate_reject"]
+        if self.scheduler is not None:
+            fut = self.scheduler.submit(x, self.logits_from_embeddings, gate=self._frog_gate_fn(rejecting))
+            try:
+                out = fut.result()
+            except NotFrogError:
+                out = None  # re-raised below with the score
+            _add_stages(getattr(fut, "stages", {}))
+            audioset = getattr(fut, "audioset", None)
+            rejected = self.frog_check(audioset) if gate else None
+            if rejected is not None or out is None:
+                raise rejected or NotFrogError("Not likely a frog.")
+            return out[0], out[1], audioset
+        bs = max(1, int(icfg["window_batch"]))
+        if x.ndim == 3:
+            cnn14 = _cnn14_module(self.extractor)
+            embed = lambda xb: _embed_logmel(cnn14, xb)
+        else:
+            embed = lambda xb: _cnn14_forward(self.extractor, xb)
+        with _stage("cnn14"):
+            outs = [
+                embed(torch.from_numpy(np.ascontiguousarray(x[i:i + bs])))
+                for i in range(0, x.shape[0], bs)
+            ]
+            emb = torch.cat([e for e, _ in outs], dim=0)
+            audioset = None if any(c is None for _, c in outs) else torch.cat([c for _, c in outs], dim=0)
+        if gate:
+            rejected = self.frog_check(audioset)
+            if rejected is not None:
+                raise rejected
+        with _stage("head"):
+            logits = self.logits_from_embeddings(emb)
+        return emb, logits, audioset
+
+    def _embed_and_score(self, src: AudioSource, y: Optional[np.ndarray] = None,
+                         keep: Optional[np.ndarray] = None) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        y: src already decoded (e.g. by the cascade), so it is not decoded
+        twice; keep: its activity gate mask, so the gate does not run twice.
+        """
+        if self.cache is None:
+            emb, logits, _ = self._score_windows(self._gated_windows(_load_wave(src) if y is None else y, keep))
+            return emb, logits
+
+        # Read the encoded bytes once: they are both the cache key and the decode input
+        data = source_bytes(src)
+        if not is_path(src):
+            src = data
+        scored: Dict[str, torch.Tensor] = {}
+        key = audio_key(data, self.cache_ident())
+        def compute() -> torch.Tensor:
+            wave = _load_wave(src) if y is None else y
+            emb, scored["logits"], audioset = self._score_windows(self._gated_windows(wave, keep))
+            if audioset is not None:
+                self.cache.put(key + AUDIOSET_KEY, audioset)
+            return emb
+
+        emb = self.cache.get_or_compute(key, compute)
+        logits = scored.get("logits")
+        if logits is None:  # cache hit (or coalesced): head-only
+            rejected = self.frog_check(self.cache.get(key + AUDIOSET_KEY, count=False))
+            if rejected is not None:
+                raise rejected
+            with _stage("head"):
+                logits = self.logits_from_embeddings(emb)
+        return emb, logits
+
+    def score_many(self, ys: List[np.ndarray], datas: Optional[List[bytes]] = None,
+                   keeps: Optional[List[Optional[np.ndarray]]] = None
+                   ) -> List[Union[Tuple[torch.Tensor, torch.Tensor], RejectedClip]]:
+        """
+        Several decoded clips at once -> [(emb [n,2048], logits [n,C])] per clip.
+        In windowed mode every window has the same length, so the windows of all
+        clips are scored as one stack; clip mode scores clip by clip. With a
+        cache, `datas` (the encoded bytes) key the lookups and hits skip CNN14.
+        Clips turned away by the activity gate or the frog check get their
+        NoActivityError / NotFrogError instead; `keeps` are gate masks computed
+        earlier (the cascade), reused rather than recomputed.
+        """
+        out: List[Any] = [None] * len(ys)
+        keys: List[Optional[str]] = [None] * len(ys)
+        todo = list(range(len(ys)))
+        if self.cache is not None and datas is not None:
+            ident = self.cache_ident()
+            todo = []
+            for i, data in enumerate(datas):
+                keys[i] = audio_key(data, ident)
+                emb = self.cache.get(keys[i])
+                if emb is None:
+                    todo.append(i)
+                else:
+                    rejected = self.frog_check(self.cache.get(keys[i] + AUDIOSET_KEY, count=False))
+                    out[i] = rejected or (emb, self.logits_from_embeddings(emb))
+
+        frames: Dict[int, np.ndarray] = {}
+        for i in todo:
+            try:
+                frames[i] = self._gated_windows(ys[i], None if keeps is None else keeps[i])
+            except NoActivityError as e:
+                out[i] = e
+        todo = list(frames)
+        scored: Dict[int, Tuple[torch.Tensor, torch.Tensor, Optional[torch.Tensor]]] = {}
+        if self.infer_cfg["mode"] == "windowed" and todo:
+            emb, logits, audioset = self._score_windows(np.concatenate([frames[i] for i in todo], axis=0), gate=False)
+            r = 0
+            for i in todo:
+                n = frames[i].shape[0]
+                scored[i] = (emb[r:r + n], logits[r:r + n], None if audioset is None else audioset[r:r + n])
+                r += n
+        else:
+            for i in todo:
+                scored[i] = self._score_windows(frames[i], gate=False)
+        for i, (emb, logits, audioset) in scored.items():
+            out[i] = self.frog_check(audioset) or (emb, logits)
+            if self.cache is not None and datas is not None:
+                self.cache.put(keys[i], emb)
+                if audioset is not None:
+                    self.cache.put(keys[i] + AUDIOSET_KEY, audioset)
+        return out
+
+    def clip_probs(self, logits: torch.Tensor) -> np.ndarray:
+        """Logits [n,C] from score_wave() -> clip probabilities (C,)."""
+        probs = torch.softmax(logits, dim=-1).cpu().numpy()
+        if self.infer_cfg["mode"] == "windowed":
+            return _aggregate_windows(probs, self.infer_cfg)
+        return probs[0]
+
+    def forward(self, wav_path: AudioSource) -> torch.Tensor:
+        y = keep = None
+        if self.cascade is not None:
+            y = _load_wave(wav_path)
+            keeps, rejected, answered = self._screen([y])
+            if 0 in rejected:
+                raise rejected[0]
+            if 0 in answered:
+                return torch.from_numpy(np.log(np.clip(answered[0], 1e-12, 1.0))).float().unsqueeze(0)
+            keep = keeps[0]
+        _, out = self._embed_and_score(wav_path, y, keep)
+        if self.infer_cfg["mode"] == "windowed":
+            agg = self.clip_probs(out)
+            out = torch.from_numpy(np.log(np.clip(agg, 1e-12, 1.0))).float().unsqueeze(0)
+        _debug(f"head out shape {tuple(out.shape)}")
+        return out
+
 # -------------------- Public API -------------------
-def from_pretrained(ckpt_dir: str, filename: str | None = None):
+DEFAULT_HEAD = "frognet_head_maxprob_a3_k3.pth"
+CASCADE = os.getenv("FROGNET_CASCADE", "0") == "1"
+
+def load_head(ckpt_dir: str, filename: str | None = None):
     """
-    Load ONLY the specified head weights file (no fallback).
-    - filename: exact head file (e.g., 'frognet_head_maxprob_a3_k3.pth')
-    - if None: uses env FROGNET_WEIGHTS or 'frognet_head_maxprob_a3_k3.pth'
-    Returns: (pipeline_model, preprocess_fn, idx_to_class)
+    Load only the MLP head from a checkpoint dir (config.json, class_to_idx.json
+    and the head weights file; filename resolution as in from_pretrained).
+    Returns: (head, idx_to_class, infer_cfg)
     """
     ckpt = Path(ckpt_dir)
     cfg = _load_json(ckpt / "config.json")
@@ -217,7 +1334,7 @@ def from_pretrained(ckpt_dir: str, filename: str | None = None):
     idx_to_class = {int(v): k for k, v in class_to_idx.items()}
     num_classes  = len(class_to_idx)
 
-    model_file = filename or os.getenv("FROGNET_WEIGHTS", "frognet_head_maxprob_a3_k3.pth")
+    model_file = filename or os.getenv("FROGNET_WEIGHTS", DEFAULT_HEAD)
     model_path = ckpt / model_file
     if not model_path.is_file():
         raise FileNotFoundError(
@@ -225,12 +1342,12 @@ def from_pretrained(ckpt_dir: str, filename: str | None = None):
             f"Set FROGNET_WEIGHTS or pass filename to from_pretrained()."
         )
 
-    # Load head weights
     state = _safe_load_state_dict(model_path)
     keys  = list(state.keys())
     uses_gap = ("net.3.weight" in state) and ("net.2.weight" not in state)
+    in_dim = int(state["net.0.weight"].shape[1]) if "net.0.weight" in state else 2048  # < 2048: reduced CNN14
 
-    head = HeadMLP_TypeB(num_classes) if uses_gap else HeadMLP_TypeA(num_classes)
+    head = (HeadMLP_TypeB if uses_gap else HeadMLP_TypeA)(num_classes, in_dim=in_dim)
     missing, unexpected = head.load_state_dict(state, strict=True)
     if missing or unexpected:
         raise RuntimeError(
@@ -239,87 +1356,273 @@ def from_pretrained(ckpt_dir: str, filename: str | None = None):
             f"First keys: {keys[:10]}"
         )
     head.eval()
+    return head, idx_to_class, _inference_cfg(cfg)
 
-    # Load CNN14 extractor (via PyPI / TS / hub)
-    cnn14 = _load_panns_cnn14()
 
-    # Simple pipeline wrapper (robust shapes)
-    class Pipeline(nn.Module):
-        def __init__(self, extractor: nn.Module, head: nn.Module):
-            super().__init__()
-            self.extractor = extractor
-            self.head = head
-        def forward(self, wav_path: str) -> torch.Tensor:
-            emb = _wav_to_embedding(self.extractor, wav_path)  # could be np or torch; 1D or 2D
-
-            # --- Normalize to torch.FloatTensor [1, 2048] ---
-            if isinstance(emb, np.ndarray):
-                emb = torch.from_numpy(emb).float()
-            elif not torch.is_tensor(emb):
-                raise RuntimeError(f"Unexpected embedding type: {type(emb)}")
-
-            if emb.dim() == 0:
-                emb = emb.view(1, 1)
-            elif emb.dim() == 1:
-                emb = emb.unsqueeze(0)
-            elif emb.dim() > 2:
-                emb = emb.reshape(emb.size(0), -1)
-
-            if emb.shape[-1] != 2048:
-                print(f"[debug] embedding shape {tuple(emb.shape)} (expected last dim 2048)")
-
-            out = self.head(emb)  # should be [1, C]
-            if isinstance(out, np.ndarray):
-                out = torch.from_numpy(out)
-            if out.dim() == 0:
-                out = out.view(1, 1)
-            elif out.dim() == 1:
-                out = out.unsqueeze(0)
-
-            print(f"[debug] head out shape {tuple(out.shape)}")
-            return out
+def check_head_fits(pipe: "Pipeline", head: nn.Module, ckpt_dir: str) -> None:
+    """
+    Raise ValueError unless a head loaded from ckpt_dir can go on pipe's
+    extractor (Pipeline.with_head): same extractor ident, same embedding dim.
+    """
+    want = extractor_ident(_load_json(Path(ckpt_dir) / "config.json").get("extractor"))
+    have = getattr(pipe.extractor, "extractor_ident", None)
+    if have is not None and want != have:
+        raise ValueError(f"Head in {ckpt_dir} was trained on extractor {want}, but this server runs {have}.")
+    dim = pipe.with_head(head).embed_dim
+    if dim != pipe.embed_dim:
+        raise ValueError(f"Head in {ckpt_dir} takes {dim}-d embeddings, but the served extractor "
+                         f"produces {pipe.embed_dim}-d ones.")
+
+
+def from_pretrained(ckpt_dir: str, filename: str | None = None,
+                    timings: Optional[Dict[str, float]] = None):
+    """
+    Load ONLY the specified head weights file (no fallback).
+    - filename: exact head file (e.g., 'frognet_head_maxprob_a3_k3.pth')
+    - if None: uses env FROGNET_WEIGHTS or 'frognet_head_maxprob_a3_k3.pth'
+    - config.json["inference"] selects clip vs windowed mode and the window
+      aggregation the head was evaluated with (env FROGNET_MODE overrides)
+    - FROGNET_BACKEND picks eager (default) or an exported artifact set from
+      FROGNET_ARTIFACT_DIR (default <ckpt_dir>/artifacts); eager builds the
+      reduced CNN14 when config.json has an "extractor" block
+    - FROGNET_CASCADE=1 puts the distilled student next to the head weights
+      (student.pt / student.json, see cascade.py) in front of CNN14
+    - timings: optional dict filled with per-phase load times in ms
+    Returns: (pipeline_model, preprocess_fn, idx_to_class)
+    """
+    ckpt = Path(ckpt_dir)
+    timings = timings if timings is not None else {}
+    t0 = time.perf_counter()
+
+    # Load head weights
+    head, idx_to_class, infer_cfg = load_head(str(ckpt), filename)
+    timings["load_head"] = round((time.perf_counter() - t0) * 1000.0, 1)
+    t0 = time.perf_counter()
+
+    # Load CNN14 extractor: eager (PyPI / TS / hub, or reduced) or an exported artifact
+    backend = os.getenv("FROGNET_BACKEND", "eager")
+    reduced = _load_json(ckpt / "config.json").get("extractor")
+    if backend == "eager":
+        cnn14 = _load_reduced_cnn14(ckpt, reduced) if reduced else _load_panns_cnn14()
+    else:
+        artifact_dir = Path(os.getenv("FROGNET_ARTIFACT_DIR", str(ckpt / "artifacts")))
+        cnn14, art_head = _load_backend(backend, artifact_dir)
+        if art_head is not None:
+            head = art_head
+        print(f"[info] CNN14 backend '{backend}' from {artifact_dir}")
+    cnn14.extractor_ident = extractor_ident(reduced)   # checked by check_head_fits on head swaps
+    timings["load_cnn14"] = round((time.perf_counter() - t0) * 1000.0, 1)
 
-    pipeline = Pipeline(cnn14, head)
+    pipeline = Pipeline(cnn14, head, infer_cfg=infer_cfg)
+    if CASCADE:
+        t0 = time.perf_counter()
+        pipeline.enable_cascade(load_cascade(str(ckpt), filename or os.getenv("FROGNET_WEIGHTS", DEFAULT_HEAD)))
+        timings["load_student"] = round((time.perf_counter() - t0) * 1000.0, 1)
 
     def _noop_preprocess(_): return _  # API compatibility
     return pipeline, _noop_preprocess, idx_to_class
 
 
+def _topk_from_probs(probs: np.ndarray, idx_to_class: Dict[int, str], topk: int):
+    probs = np.atleast_1d(probs)
+    pred_idx  = int(np.argmax(probs))
+    order     = np.argsort(probs)[::-1][:int(topk)]
+    topk_out  = [(idx_to_class[int(i)], float(probs[int(i)])) for i in order]
+    return idx_to_class[pred_idx], float(probs[pred_idx]), topk_out
+
+
+def predict_waves(
+    waves: List[np.ndarray],
+    model: Pipeline,
+    idx_to_class: Dict[int, str],
+    topk: int = 3,
+    datas: Optional[List[bytes]] = None,
+):
+    """
+    Batch counterpart of predict_one for already-decoded 32k mono clips:
+    one CNN14 pass over all of them (see Pipeline.score_many).
+    With a cascade, clips that pass the activity gate and that the student
+    is sure about skip CNN14 (see Pipeline._screen).
+    Returns [(name, conf, topk_list)] in input order; clips turned away by
+    the activity gate or the frog check get their RejectedClip instead.
+    """
+    out: List[Any] = [None] * len(waves)
+    todo = list(range(len(waves)))
+    keeps: Optional[List[Optional[np.ndarray]]] = None
+    with torch.no_grad():
+        if model.cascade is not None and waves:
+            keeps, rejected, answered = model._screen(waves)
+            out = [rejected.get(i) for i in range(len(waves))]
+            for i, probs in answered.items():
+                out[i] = _topk_from_probs(probs, idx_to_class, topk)
+            todo = [i for i in range(len(waves)) if out[i] is None]
+        scored = model.score_many([waves[i] for i in todo],
+                                  None if datas is None else [datas[i] for i in todo],
+                                  None if keeps is None else [keeps[i] for i in todo]) if todo else []
+    for i, res in zip(todo, scored):
+        out[i] = res if isinstance(res, RejectedClip) else _topk_from_probs(model.clip_probs(res[1]), idx_to_class, topk)
+    return out
+
+
+def predict_embeddings(
+    embs,
+    model: Pipeline,
+    idx_to_class: Dict[int, str],
+    topk: int = 3,
+    windows: bool = False,
+):
+    """
+    Head-only scoring of precomputed CNN14 embeddings [N,2048] (e.g. from a
+    CNN14 run elsewhere): one head pass for all rows, no audio, no CNN14.
+    Each row is a clip; with windows=True the rows are windows of one clip
+    and are aggregated as in windowed mode.
+    Returns [(name, conf, topk_list)] in row order (one entry if windows).
+    """
+    emb = _normalize_embedding(embs)
+    if emb.shape[-1] != model.embed_dim:
+        raise ValueError(f"Expected {model.embed_dim}-d CNN14 embeddings, got shape {tuple(emb.shape)}")
+    with _stage("head"):
+        logits = model.logits_from_embeddings(emb)
+    with _stage("topk"):
+        probs = torch.softmax(logits, dim=-1).cpu().numpy()
+        if windows:
+            return [_topk_from_probs(_aggregate_windows(probs, model.infer_cfg), idx_to_class, topk)]
+        return [_topk_from_probs(p, idx_to_class, topk) for p in probs]
+
+
 def predict_one(
-    wav_path: str,
+    wav_path: AudioSource,
     model: nn.Module,
     _preprocess_unused,
     idx_to_class: Dict[int, str],
-    topk: int = 3
+    topk: int = 3,
+    timings: Optional[Dict[str, float]] = None,
 ):
-    """wav_path → embedding → logits → softmax. Robust to any 0D/1D/2D mix."""
-    with torch.no_grad():
+    """
+    wav_path → embedding → logits → softmax. Robust to any 0D/1D/2D mix.
+    wav_path may also be raw bytes or a file-like object (decoded in memory).
+    Pass a dict as `timings` to collect the per-stage breakdown (see trace_stages).
+    """
+    with trace_stages(timings), torch.no_grad():
         logits = model(wav_path)  # expect [1, C]
 
-        if isinstance(logits, np.ndarray):
-            logits = torch.from_numpy(logits)
+        with _stage("topk"):
+            if isinstance(logits, np.ndarray):
+                logits = torch.from_numpy(logits)
 
-        if not torch.is_tensor(logits):
-            raise RuntimeError(f"Unexpected logits type: {type(logits)}")
+            if not torch.is_tensor(logits):
+                raise RuntimeError(f"Unexpected logits type: {type(logits)}")
 
-        # Normalize logits to 2D [1, C]
-        if logits.dim() == 0:
-            logits = logits.view(1, 1)
-        elif logits.dim() == 1:
-            logits = logits.unsqueeze(0)
-        elif logits.dim() > 2:
-            logits = logits.view(logits.size(0), -1)
+            # Normalize logits to 2D [1, C]
+            if logits.dim() == 0:
+                logits = logits.view(1, 1)
+            elif logits.dim() == 1:
+                logits = logits.unsqueeze(0)
+            elif logits.dim() > 2:
+                logits = logits.view(logits.size(0), -1)
 
-        # Softmax over the last dimension (works for any C)
-        probs_t = torch.softmax(logits, dim=-1)
-        probs = probs_t.squeeze(0).cpu().numpy()  # -> (C,)
+            # Softmax over the last dimension (works for any C)
+            probs_t = torch.softmax(logits, dim=-1)
+            probs = probs_t.squeeze(0).cpu().numpy()  # -> (C,)
+            out = _topk_from_probs(probs, idx_to_class, topk)
 
-    print(f"[debug] logits shape {tuple(logits.shape)} -> probs {probs.shape}")
+    _debug(f"logits shape {tuple(logits.shape)} -> probs {probs.shape}")
 
-    probs = np.atleast_1d(probs)
-    pred_idx  = int(np.argmax(probs))
-    pred_name = idx_to_class[pred_idx]
-    conf      = float(probs[pred_idx])
-    order     = np.argsort(probs)[::-1][:int(topk)]
-    topk_out  = [(idx_to_class[int(i)], float(probs[int(i)])) for i in order]
-    return pred_name, conf, topk_out
+    return out
+
+
+def merge_segments(
+    starts_sec: np.ndarray,
+    probs: np.ndarray,
+    idx_to_class: Dict[int, str],
+    win_sec: float,
+    hop_sec: float,
+    min_conf: float = 0.5,
+) -> List[Dict[str, Any]]:
+    """
+    Join runs of adjacent windows (one hop apart) whose top class is the same
+    and at least `min_conf` into call segments:
+    [{start, end, species, confidence (max), mean_confidence, windows}].
+    """
+    segs: List[Dict[str, Any]] = []
+    if not len(probs):
+        return segs
+    top, conf = probs.argmax(axis=1), probs.max(axis=1)
+
+    def close(a: int, b: int):
+        p = conf[a:b + 1]
+        segs.append({"start": round(float(starts_sec[a]), 3), "end": round(float(starts_sec[b] + win_sec), 3),
+                     "species": idx_to_class[int(top[a])], "confidence": round(float(p.max()), 4),
+                     "mean_confidence": round(float(p.mean()), 4), "windows": b - a + 1})
+
+    run: Optional[List[int]] = None   # [first, last] window of the open segment
+    for i in range(len(top)):
+        if conf[i] < min_conf:
+            if run:
+                close(*run)
+            run = None
+        elif run and top[i] == top[run[1]] and starts_sec[i] - starts_sec[run[1]] <= hop_sec + 1e-6:
+            run[1] = i
+        else:
+            if run:
+                close(*run)
+            run = [i, i]
+    if run:
+        close(*run)
+    return segs
+
+
+def predict_timeline(
+    wav_path: AudioSource,
+    model: Pipeline,
+    idx_to_class: Dict[int, str],
+    topk: int = 3,
+    win_sec: Optional[float] = None,
+    hop_sec: Optional[float] = None,
+    merge: bool = False,
+    min_conf: float = 0.5,
+    max_sec: Optional[float] = None,
+    timings: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
+    """
+    Per-window call timeline for a (long) recording: every win_sec window,
+    hop_sec apart (defaults: the inference config's), scored in one batched
+    pass (Pipeline.score_timeline). Returns
+      {duration_sec, win_sec, hop_sec,
+       windows: [{start, end, top: [(label, p), ...]}],
+       species, confidence, topk            # clip aggregate, None if no window
+       segments: [...]}                     # only with merge=True (merge_segments)
+    Windows dropped by the activity gate are absent from `windows`.
+    """
+    icfg = model.infer_cfg
+    win_sec = float(win_sec or icfg["win_sec"])
+    hop_sec = float(hop_sec or icfg["hop_sec"])
+    with trace_stages(timings), torch.no_grad():
+        y = _load_wave(wav_path)
+        duration = y.shape[0] / PANN_SR
+        if max_sec and duration > max_sec:
+            raise ValueError(f"Recording is {duration:.0f} s; the timeline accepts at most {max_sec:g} s.")
+        starts, probs = model.score_timeline(y, int(win_sec * PANN_SR), int(hop_sec * PANN_SR))
+        with _stage("topk"):
+            starts_sec = starts / PANN_SR
+            k = min(int(topk), probs.shape[1]) if len(probs) else 0
+            order = np.argsort(-probs, axis=1)[:, :k]
+            out: Dict[str, Any] = {
+                "duration_sec": round(duration, 3),
+                "win_sec": win_sec,
+                "hop_sec": hop_sec,
+                "windows": [
+                    {"start": round(float(t), 3), "end": round(float(min(t + win_sec, duration)), 3),
+                     "top": [(idx_to_class[int(c)], round(float(p[c]), 4)) for c in o]}
+                    for t, p, o in zip(starts_sec, probs, order)
+                ],
+                "species": None, "confidence": None, "topk": [],
+            }
+            if len(probs):
+                name, conf, top = _topk_from_probs(_aggregate_windows(probs, icfg), idx_to_class, topk)
+                out.update(species=name, confidence=conf, topk=top)
+            if merge:
+                out["segments"] = merge_segments(starts_sec, probs, idx_to_class, win_sec, hop_sec, min_conf)
+                for seg in out["segments"]:
+                    seg["end"] = round(min(seg["end"], duration), 3)
+    return out
@@ -1,21 +1,26 @@
 import sys, json, argparse
-from Predictor import from_pretrained, predict_one
+from pathlib import Path
+
+try:
+    from backend.model.Predictor import from_pretrained, predict_one
+except ModuleNotFoundError:  # run as a script from backend/model
+    from Predictor import from_pretrained, predict_one  # type: ignore
+
+# One file per launch; for folders use BatchPredict.py (one model load, resumable).
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("wav", help="Path to .wav file")
-    ap.add_argument("--ckpt", required=True,
+    ap.add_argument("--ckpt", default=str(Path(__file__).resolve().parent),
                     help="Checkpoint directory containing config.json, class_to_idx.json, and weights")
     ap.add_argument("--weights", default="frognet_head_maxprob_a3_k3.pth",
                     help="Weights filename inside --ckpt (default: frognet_head_maxprob_a3_k3.pth). No fallback.")
     ap.add_argument("--topk", type=int, default=3)
-    ap.add_argument("--device", default="cpu", choices=["cpu", "cuda"])
     args = ap.parse_args()
 
     try:
-        model, preprocess, idx_to_class, used_weights = from_pretrained(
-            args.ckpt, weights_file=args.weights, map_location=args.device
-        )
+        model, preprocess, idx_to_class = from_pretrained(args.ckpt, filename=args.weights)
+        used_weights = args.weights
         name, conf, topk = predict_one(args.wav, model, preprocess, idx_to_class, topk=args.topk)
         out = {
             "status": "ok",
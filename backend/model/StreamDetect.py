@@ -0,0 +1,294 @@
+# backend/model/StreamDetect.py
+# Streaming detector for multi-hour passive-recorder files (6-12 h WAV/FLAC).
+# Memory stays constant whatever the file length:
+#   - blocks are read through soundfile (never the whole file)
+#   - each block is downmixed and resampled to 32 kHz with a soxr stream
+#     (continuous across block boundaries)
+#   - every --batch windows (win_sec, stepped by hop_sec) go through CNN14 +
+#     head in one pass, sharing the log-mel front end and the activity gate
+#     like the offline windowed path
+#   - detections are appended to CSV / Parquet after every batch
+#
+#   python backend/model/StreamDetect.py --ckpt backend/model site3/*.flac --out detections.csv
+#   python backend/model/StreamDetect.py --ckpt backend/model recorders/ --out det.parquet --merge
+#
+# Rows (one per window whose top class reaches --min-conf, or per merged call
+# segment with --merge):
+#   file, start_sec, end_sec, species, confidence, topk ("label:p;..."), frog_score
+# frog_score is CNN14's AudioSet frog probability (empty if the backend has none).
+# Throughput is reported in hours of audio per minute of wall time.
+
+from __future__ import annotations
+import argparse, csv, os, resource, sys, time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+try:
+    from backend.model import Predictor as P
+    from backend.model.streaming import _Resampler
+except ModuleNotFoundError:  # run as a script from backend/model
+    import Predictor as P  # type: ignore
+    from streaming import _Resampler  # type: ignore
+
+AUDIO_EXTS = (".wav", ".flac", ".ogg", ".mp3")
+COLUMNS = ("file", "start_sec", "end_sec", "species", "confidence", "topk", "frog_score")
+
+
+# ---- input ----
+def _inputs(paths: List[str]) -> List[Path]:
+    out: List[Path] = []
+    for p in map(Path, paths):
+        if p.is_dir():
+            out += sorted(f for f in p.rglob("*") if f.suffix.lower() in AUDIO_EXTS)
+        else:
+            out.append(p)
+    return out
+
+
+def read_blocks(path: Path, block_sec: float) -> Iterator[Tuple[np.ndarray, int]]:
+    """(mono float32 block, native sample rate) for consecutive blocks of the file."""
+    try:
+        import soundfile as sf
+    except Exception as e:
+        raise RuntimeError("soundfile not installed. Run: pip install soundfile") from e
+    with sf.SoundFile(str(path)) as f:
+        frames = max(1, int(block_sec * f.samplerate))
+        for block in f.blocks(blocksize=frames, dtype="float32", always_2d=True):
+            yield block.mean(axis=1) if block.shape[1] > 1 else block[:, 0], f.samplerate
+
+
+# ---- output ----
+class DetectionWriter:
+    """Appends rows to .csv (flushed per batch) or .parquet (one row group per batch)."""
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.rows = 0
+        self._pq = None
+        if self.path.suffix.lower() == ".parquet":
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except Exception as e:
+                raise RuntimeError("pyarrow not installed (needed for .parquet). Run: pip install pyarrow") from e
+            self._pa = pa
+            self._schema = pa.schema([("file", pa.string()), ("start_sec", pa.float64()), ("end_sec", pa.float64()),
+                                      ("species", pa.string()), ("confidence", pa.float32()),
+                                      ("topk", pa.string()), ("frog_score", pa.float32())])
+            self._pq = pq.ParquetWriter(str(self.path), self._schema)
+        else:
+            self._f = open(self.path, "w", newline="")
+            self._csv = csv.writer(self._f)
+            self._csv.writerow(COLUMNS)
+
+    def write(self, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        if self._pq is not None:
+            cols = {c: [r[c] for r in rows] for c in COLUMNS}
+            self._pq.write_table(self._pa.Table.from_pydict(cols, schema=self._schema))
+        else:
+            self._csv.writerows([r[c] if r[c] is not None else "" for c in COLUMNS] for r in rows)
+            self._f.flush()
+        self.rows += len(rows)
+
+    def close(self):
+        if self._pq is not None:
+            self._pq.close()
+        else:
+            self._f.close()
+
+
+# ---- detection ----
+class _Merger:
+    """Incremental merge_segments: joins adjacent windows with the same top class."""
+    def __init__(self, hop_sec: float):
+        self.hop_sec = hop_sec
+        self.open: Optional[Dict[str, Any]] = None
+
+    def push(self, row: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """A window's row (None = window below --min-conf or skipped); returns closed segments."""
+        seg = self.open
+        if (row is not None and seg is not None and row["species"] == seg["species"]
+                and row["start_sec"] - seg["_last"] <= self.hop_sec + 1e-6):
+            seg.update(end_sec=row["end_sec"], _last=row["start_sec"],
+                       confidence=max(seg["confidence"], row["confidence"]),
+                       frog_score=None if seg["frog_score"] is None else max(seg["frog_score"], row["frog_score"]))
+            return []
+        closed = self.flush()
+        if row is not None:
+            self.open = {**row, "_last": row["start_sec"]}
+        return closed
+
+    def flush(self) -> List[Dict[str, Any]]:
+        seg, self.open = self.open, None
+        if seg is None:
+            return []
+        del seg["_last"]
+        return [seg]
+
+
+class StreamDetector:
+    def __init__(self, pipeline: P.Pipeline, idx_to_class: Dict[int, str], batch: int = 64,
+                 topk: int = 3, min_conf: float = 0.5, merge: bool = False):
+        icfg = pipeline.infer_cfg
+        self.pipeline, self.idx_to_class = pipeline, idx_to_class
+        self.win, self.hop = int(icfg["win_sec"] * P.PANN_SR), int(icfg["hop_sec"] * P.PANN_SR)
+        self.batch, self.topk, self.min_conf, self.merge = max(1, int(batch)), int(topk), float(min_conf), merge
+        try:
+            self.frog_idx = [P._audioset_index(l) for l in icfg["frog_gate_labels"]]
+        except ValueError:
+            self.frog_idx = []
+        self.stages: Dict[str, float] = {}
+
+    def run(self, path: Path, writer: DetectionWriter, block_sec: float = 30.0) -> Dict[str, float]:
+        """Detect over one file; returns {audio_sec, windows, kept, rows}."""
+        name = str(path)
+        merger = _Merger(self.hop / P.PANN_SR) if self.merge else None
+        stats = {"audio_sec": 0.0, "windows": 0, "kept": 0, "rows": 0}
+        span = self.win + (self.batch - 1) * self.hop          # samples for one full batch of windows
+        buf, buf_start = np.zeros(0, dtype=np.float32), 0      # buf[0] is 32k sample buf_start
+        resample = None
+
+        def emit(rows: List[Optional[Dict[str, Any]]]):
+            if merger is not None:
+                rows = [seg for r in rows for seg in merger.push(r)]
+            rows = [r for r in rows if r is not None]
+            writer.write(rows)
+            stats["rows"] += len(rows)
+
+        for block, sr in read_blocks(path, block_sec):
+            if resample is None:
+                resample = _Resampler(sr)
+            y = resample(block)
+            buf = np.concatenate([buf, y]) if buf.size else y.copy()
+            while buf.shape[0] >= span:
+                emit(self._score(name, buf[:span], buf_start, self.batch, stats))
+                buf, buf_start = buf[self.batch * self.hop:], buf_start + self.batch * self.hop
+        if resample is not None:
+            tail = resample(np.zeros(0, dtype=np.float32), last=True)
+            buf = np.concatenate([buf, tail]) if tail.size else buf
+        total = buf_start + buf.shape[0]
+        if buf.shape[0] >= self.win or (total and buf_start == 0):
+            n = 1 + (max(buf.shape[0], self.win) - self.win) // self.hop
+            emit(self._score(name, buf, buf_start, n, stats))
+        if merger is not None:
+            rest = merger.flush()
+            writer.write(rest)
+            stats["rows"] += len(rest)
+        stats["audio_sec"] = total / P.PANN_SR
+        return stats
+
+    def _score(self, name: str, seg: np.ndarray, seg_start: int, n: int, stats: Dict[str, float]
+               ) -> List[Optional[Dict[str, Any]]]:
+        """n windows at the start of seg -> one row (or None) per window, in order."""
+        pipe = self.pipeline
+        if seg.shape[0] < self.win:
+            seg = np.pad(seg, (0, self.win - seg.shape[0]))
+        seg = seg[:self.win + (n - 1) * self.hop]
+        keep = np.ones(n, dtype=bool)
+        with P.trace_stages(self.stages), torch.no_grad():
+            if pipe.infer_cfg["gate"]:
+                with P._stage("gate"):
+                    keep = P.activity_gate(seg, self.win, self.hop, pipe.infer_cfg)
+            stats["windows"] += n
+            stats["kept"] += int(keep.sum())
+            rows: List[Optional[Dict[str, Any]]] = [None] * n
+            if not keep.any():
+                return rows
+            x = pipe._windows(seg, self.win, self.hop)
+            _, logits, audioset = pipe._score_windows(x if keep.all() else x[keep], gate=False)
+            probs = torch.softmax(logits, dim=-1).cpu().numpy()
+        frog = (audioset[:, self.frog_idx].max(dim=1).values.numpy()
+                if audioset is not None and self.frog_idx else None)
+        for j, i in enumerate(np.flatnonzero(keep)):
+            p = probs[j]
+            order = np.argsort(-p)[:self.topk]
+            if p[order[0]] < self.min_conf:
+                continue
+            start = (seg_start + i * self.hop) / P.PANN_SR
+            rows[i] = {
+                "file": name,
+                "start_sec": round(start, 3),
+                "end_sec": round(start + self.win / P.PANN_SR, 3),
+                "species": self.idx_to_class[int(order[0])],
+                "confidence": round(float(p[order[0]]), 4),
+                "topk": ";".join(f"{self.idx_to_class[int(c)]}:{p[c]:.4f}" for c in order),
+                "frog_score": None if frog is None else round(float(frog[j]), 4),
+            }
+        return rows
+
+
+# ---- CLI ----
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Bounded-memory streaming detector for long recordings.")
+    ap.add_argument("inputs", nargs="+", help="Audio files or folders (searched recursively)")
+    ap.add_argument("--ckpt", default=str(Path(__file__).resolve().parent),
+                    help="Checkpoint dir with config.json, class_to_idx.json and the head weights")
+    ap.add_argument("--weights", default=None, help="Head weights filename inside --ckpt")
+    ap.add_argument("--out", required=True, help="Detections file (.csv or .parquet)")
+    ap.add_argument("--batch", type=int, default=64, help="Windows per CNN14 pass")
+    ap.add_argument("--block-sec", type=float, default=30.0, help="Seconds read from disk per block")
+    ap.add_argument("--min-conf", type=float, default=0.5, help="Only write windows whose top class reaches this")
+    ap.add_argument("--topk", type=int, default=3)
+    ap.add_argument("--merge", action="store_true", help="Merge adjacent windows with the same top class")
+    ap.add_argument("--win-sec", type=float, default=None, help="Window length (default: inference config)")
+    ap.add_argument("--hop-sec", type=float, default=None, help="Window hop (default: inference config)")
+    ap.add_argument("--threads", type=int, default=0, help="torch.set_num_threads (0 = torch default)")
+    args = ap.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    files = _inputs(args.inputs)
+    if not files:
+        raise SystemExit("No audio files found.")
+    pipe, _, idx_to_class = P.from_pretrained(args.ckpt, filename=args.weights)
+    if args.win_sec:
+        pipe.infer_cfg["win_sec"] = args.win_sec
+    if args.hop_sec:
+        pipe.infer_cfg["hop_sec"] = args.hop_sec
+    det = StreamDetector(pipe, idx_to_class, batch=args.batch, topk=args.topk,
+                         min_conf=args.min_conf, merge=args.merge)
+    writer = DetectionWriter(args.out)
+    print(f"[info] {len(files)} file(s) -> {args.out} | win {pipe.infer_cfg['win_sec']} s, "
+          f"hop {pipe.infer_cfg['hop_sec']} s, batch {det.batch}, gate {'on' if pipe.infer_cfg['gate'] else 'off'}")
+
+    t_run, audio_sec, failed = time.perf_counter(), 0.0, 0
+    try:
+        for path in files:
+            t0 = time.perf_counter()
+            try:
+                st = det.run(path, writer, block_sec=args.block_sec)
+            except Exception as e:
+                failed += 1
+                print(f"[warn] {path}: {type(e).__name__}: {e}")
+                continue
+            dt = time.perf_counter() - t0
+            audio_sec += st["audio_sec"]
+            skipped = 1.0 - st["kept"] / max(1, st["windows"])
+            print(f"[file] {path.name}: {st['audio_sec'] / 3600:.2f} h, {st['windows']} windows "
+                  f"({skipped:.0%} gated), {st['rows']} rows, {st['audio_sec'] / 3600 / (dt / 60):.2f} h/min, "
+                  f"rss {_rss_mb():.0f} MB")
+    finally:
+        writer.close()
+
+    total = time.perf_counter() - t_run
+    stages = ", ".join(f"{k} {v / 1000:.1f}s" for k, v in sorted(det.stages.items()) if k != "audio_sec")
+    print(f"[done] {audio_sec / 3600:.2f} h of audio in {total / 60:.1f} min "
+          f"({audio_sec / 3600 / max(1e-9, total / 60):.2f} h/min), {writer.rows} rows, {failed} failed | {stages}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,358 @@
+# backend/model/TruncateCNN14.py
+# Cheaper CNN14 extractors for the frog classifier. We separate a handful of
+# species but pay for all six CNN14 blocks (sized for 527 AudioSet classes).
+# For every --depths x --keep variant this:
+#   - cuts the trunk after conv block <depth> and pools that block's output
+#     like CNN14 (mean over mel bins, max + mean over time; no fc1)
+#   - with --keep < 1, prunes every kept block to that fraction of its
+#     channels, ranked by filter L1 norm (structured: whole filters go, and the
+#     next block's input channels with them; the trunk is not fine-tuned)
+#   - retrains the MLP head on the variant's embeddings as
+#     model/FrognetSem2Tester.py does (2 s / 1 s windows, jittered copies,
+#     gain + noise augmentation, label smoothing, AdamW, clip-level
+#     aggregation), next to a "full" CNN14 baseline trained the same way
+#   - writes a checkpoint Predictor.from_pretrained serves as-is
+#     (config.json "extractor" block + extractor.pt + head + class_to_idx.json)
+#
+#   python backend/model/TruncateCNN14.py --data "Frog Data" --out checkpoints/reduced
+#   python backend/model/TruncateCNN14.py --data "Frog Data" --out reduced --depths 4 5 --keep 1.0 0.5 0.25
+#   FROG_MODEL_DIR=checkpoints/reduced/d4 uvicorn ...      # serve a variant
+#
+# Data layout as FrognetSem2Tester.py: <data>/<species>/*.wav for training,
+# <data>/<test-folder>/<species>/*.wav held out.
+#
+# Report (<out>/report.json and stdout), per variant: embedding dim, extractor
+# params, p50 latency of Pipeline.score_wave on a --latency-sec clip (in the
+# base checkpoint's inference mode), window and clip accuracy, and the change
+# against "full". The suggested default is the fastest variant whose clip
+# accuracy is within --max-loss of full.
+
+from __future__ import annotations
+import argparse, hashlib, json, sys, time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+try:
+    from backend.model import Predictor as P
+except ModuleNotFoundError:  # run as a script from backend/model
+    import Predictor as P  # type: ignore
+
+CNN14_CHANNELS = (64, 128, 256, 512, 1024, 2048)
+AUDIO_EXTS = (".wav", ".mp3", ".m4a", ".flac")
+
+
+# ---- extractors ----
+def _select_bn(dst: nn.BatchNorm2d, src: nn.BatchNorm2d, idx: torch.Tensor):
+    for name in ("weight", "bias", "running_mean", "running_var"):
+        getattr(dst, name).data.copy_(getattr(src, name).data[idx])
+
+
+def reduce_cnn14(cnn14: nn.Module, depth: int, keep: float = 1.0) -> P.ReducedCnn14:
+    """
+    A ReducedCnn14 from a panns Cnn14: its front end and first `depth` conv
+    blocks, each pruned to round(keep * channels) filters by L1 norm
+    (keep=1.0 copies the blocks unchanged).
+    """
+    if not 1 <= depth <= len(CNN14_CHANNELS):
+        raise ValueError(f"depth must be 1..{len(CNN14_CHANNELS)}, got {depth}")
+    channels = [max(1, int(round(keep * c))) for c in CNN14_CHANNELS[:depth]]
+    ext = P.ReducedCnn14(channels)
+    for name in ("spectrogram_extractor", "logmel_extractor", "bn0"):
+        getattr(ext, name).load_state_dict(getattr(cnn14, name).state_dict())
+    in_idx = torch.arange(1)
+    with torch.no_grad():
+        for i, dst in enumerate(ext.blocks):
+            src = getattr(cnn14, f"conv_block{i + 1}")
+            k = channels[i]
+            w1 = src.conv1.weight[:, in_idx]
+            mid = torch.sort(torch.topk(w1.abs().sum(dim=(1, 2, 3)), k).indices).values
+            w2 = src.conv2.weight[:, mid]
+            out = torch.sort(torch.topk(w2.abs().sum(dim=(1, 2, 3)), k).indices).values
+            dst.conv1.weight.copy_(w1[mid])
+            dst.conv2.weight.copy_(w2[out])
+            _select_bn(dst.bn1, src.bn1, mid)
+            _select_bn(dst.bn2, src.bn2, out)
+            in_idx = out
+    return ext.eval()
+
+
+def _variant_name(depth: int, keep: float) -> str:
+    return f"d{depth}" + (f"-k{keep:g}" if keep < 1.0 else "")
+
+
+def _load_cnn14(random_weights: bool) -> Tuple[nn.Module, nn.Module]:
+    """(extractor as Predictor serves it, raw panns Cnn14 behind it)."""
+    if random_weights:  # timings only: accuracy is meaningless without the AudioSet weights
+        try:
+            from panns_inference.models import Cnn14
+        except Exception as e:
+            raise RuntimeError("panns-inference not installed. Run: pip install panns-inference") from e
+        torch.manual_seed(0)
+        ext = Cnn14(sample_rate=P.PANN_SR, window_size=1024, hop_size=320, mel_bins=64,
+                    fmin=50, fmax=14000, classes_num=527).eval()
+        ext.cache_id = "panns-random"
+        return ext, ext
+    ext = P._load_panns_cnn14()
+    cnn14 = P._cnn14_module(ext)
+    if cnn14 is None:
+        raise SystemExit("Needs an eager panns Cnn14 (USE_PIP_PANNS=1 or torch.hub), not a TorchScript file")
+    return ext, cnn14
+
+
+# ---- data (FrognetSem2Tester.py layout and augmentation) ----
+def index_data(root: str, test_folder: str) -> Tuple[List[Tuple[Path, str]], List[Tuple[Path, str]]]:
+    train, test = [], []
+    for d in sorted(Path(root).iterdir()):
+        if not d.is_dir():
+            continue
+        if d.name == test_folder:
+            test += [(f, sub.name) for sub in sorted(d.iterdir()) if sub.is_dir()
+                     for f in sorted(sub.iterdir()) if f.suffix.lower() in AUDIO_EXTS]
+        else:
+            train += [(f, d.name) for f in sorted(d.iterdir()) if f.suffix.lower() in AUDIO_EXTS]
+    return train, test
+
+
+def _mix_gaussian_snr(wave: np.ndarray, snr_db: float, rng: np.random.Generator) -> np.ndarray:
+    rms = np.sqrt(np.mean(wave ** 2) + 1e-12)
+    noise = rng.standard_normal(size=wave.shape).astype(np.float32)
+    rms_n = np.sqrt(np.mean(noise ** 2) + 1e-12)
+    noise *= rms / (10 ** (snr_db / 20.0) * rms_n + 1e-12)
+    return np.clip(wave + noise, -1.0, 1.0)
+
+
+def windows(files: List[Tuple[Path, str]], class_to_idx: Dict[str, int], train: bool, win_sec: float,
+            hop_sec: float, num_aug: int, rng: np.random.Generator, batch: int = 64
+            ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Batches of (32k windows [b, win], labels [b], file index [b]). Training
+    adds num_aug start-jittered copies (+-0.2 s) per window and applies random
+    gain (+-6 dB) and, 70% of the time, Gaussian noise at 20..-5 dB SNR.
+    """
+    win, sr = int(win_sec * P.PANN_SR), P.PANN_SR
+    buf: List[Tuple[np.ndarray, int, int]] = []
+    for fi, (path, label) in enumerate(files):
+        try:
+            y = P.decode_audio(str(path), sr)
+        except Exception as e:
+            print(f"[warn] {path}: {type(e).__name__}: {e}")
+            continue
+        dur = y.shape[0] / sr
+        starts = [float(s) for s in np.arange(0.0, max(0.0, dur - win_sec + 1e-6) + 1e-6, hop_sec)]
+        if train:
+            starts = [t for s in starts for t in [s] + [max(0.0, s + float(rng.uniform(-0.2, 0.2)))
+                                                      for _ in range(num_aug)]]
+        for s in starts:
+            w = y[int(s * sr):int(s * sr) + win]
+            w = np.pad(w, (0, win - w.shape[0])) if w.shape[0] < win else w
+            if train:
+                w = np.clip(w * 10 ** (rng.uniform(-6, 6) / 20.0), -1.0, 1.0)
+                if rng.random() < 0.7:
+                    w = _mix_gaussian_snr(w, float(rng.choice([20, 10, 5, 0, -5])), rng)
+            buf.append((w.astype(np.float32), class_to_idx[label], fi))
+            if len(buf) >= batch:
+                yield _stack(buf)
+                buf = []
+    if buf:
+        yield _stack(buf)
+
+
+def _stack(buf):
+    return (np.stack([w for w, _, _ in buf]), np.array([l for _, l, _ in buf]), np.array([f for _, _, f in buf]))
+
+
+def embed_windows(batches, cnn14: nn.Module, variants: Dict[str, nn.Module]
+                  ) -> Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray]:
+    """
+    Embeddings of every window for every variant ("full" = CNN14 + fc1). The
+    log-mel front end is shared by all variants, so it runs once per batch.
+    """
+    embs: Dict[str, List[np.ndarray]] = {name: [] for name in ["full", *variants]}
+    labels, files = [], []
+    for x, y, f in batches:
+        with torch.no_grad():
+            mel = cnn14.logmel_extractor(cnn14.spectrogram_extractor(torch.from_numpy(x)))
+            mel = cnn14.bn0(mel.transpose(1, 3)).transpose(1, 3)[:, 0]
+        embs["full"].append(P._embed_logmel(cnn14, mel)[0].numpy())
+        for name, ext in variants.items():
+            embs[name].append(ext.embed_logmel(mel)[0].numpy())
+        labels.append(y)
+        files.append(f)
+    return {k: np.concatenate(v) for k, v in embs.items()}, np.concatenate(labels), np.concatenate(files)
+
+
+# ---- head (FrognetSem2Tester.py recipe) ----
+class _SmoothCE(nn.Module):
+    def __init__(self, eps: float):
+        super().__init__()
+        self.eps = eps
+
+    def forward(self, logits, target):
+        logp = torch.log_softmax(logits, dim=1)
+        onehot = torch.zeros_like(logp).scatter_(1, target.unsqueeze(1), 1)
+        soft = (1 - self.eps) * onehot + self.eps / logits.size(1)
+        return (-soft * logp).sum(dim=1).mean()
+
+
+def train_head(emb: np.ndarray, labels: np.ndarray, num_classes: int, epochs: int = 75, lr: float = 5e-4,
+               weight_decay: float = 1e-4, label_smooth: float = 0.05, batch: int = 32, seed: int = 0) -> nn.Module:
+    """
+    Linear(d,256) -> ReLU -> Dropout(0.3) -> Linear(256,C), saved with the
+    HeadMLP_TypeB keys (net.0 / net.3) that load_head expects.
+    """
+    torch.manual_seed(seed)
+    head = P.HeadMLP_TypeB(num_classes, in_dim=emb.shape[1])
+    head.net[2] = nn.Dropout(0.3)
+    opt = torch.optim.AdamW(head.parameters(), lr=lr, weight_decay=weight_decay)
+    crit = _SmoothCE(label_smooth) if label_smooth > 0 else nn.CrossEntropyLoss()
+    x, y = torch.from_numpy(emb).float(), torch.from_numpy(labels).long()
+    head.train()
+    for _ in range(epochs):
+        perm = torch.randperm(x.shape[0])
+        for i in range(0, x.shape[0], batch):
+            idx = perm[i:i + batch]
+            loss = crit(head(x[idx]), y[idx])
+            opt.zero_grad()
+            loss.backward()
+            opt.step()
+    head.net[2] = nn.Identity()
+    return head.eval()
+
+
+def evaluate(head: nn.Module, emb: np.ndarray, labels: np.ndarray, files: np.ndarray,
+             icfg: Dict) -> Tuple[float, float]:
+    """(window accuracy, clip accuracy with Predictor's window aggregation)."""
+    with torch.no_grad():
+        probs = torch.softmax(head(torch.from_numpy(emb).float()), dim=1).numpy()
+    win_acc = float(np.mean(probs.argmax(axis=1) == labels)) if len(labels) else 0.0
+    hits = [int(P._aggregate_windows(probs[files == f], icfg).argmax()) == int(labels[files == f][0])
+            for f in np.unique(files)]
+    return win_acc, float(np.mean(hits)) if hits else 0.0
+
+
+def latency_ms(pipe: P.Pipeline, seconds: float, repeats: int) -> float:
+    """p50 ms of Pipeline.score_wave on a noise clip (decode excluded)."""
+    y = (0.1 * np.random.default_rng(0).standard_normal(int(seconds * P.PANN_SR))).astype(np.float32)
+    with torch.no_grad():
+        pipe.score_wave(y)
+        ms = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            pipe.score_wave(y)
+            ms.append((time.perf_counter() - t0) * 1000.0)
+    return float(np.median(ms))
+
+
+# ---- output ----
+def write_checkpoint(out_dir: Path, ext: Optional[P.ReducedCnn14], head: nn.Module,
+                     class_to_idx: Dict[str, int], base_cfg: Dict, meta: Dict):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cfg = {k: v for k, v in base_cfg.items() if k != "extractor"}
+    cfg["created_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    if ext is not None:
+        torch.save(ext.state_dict(), out_dir / P.EXTRACTOR_FILE)
+        cfg["extractor"] = {"type": "cnn14-reduced", "channels": ext.channels, "weights": P.EXTRACTOR_FILE,
+                            # heads published from here must only go on this extractor (check_head_fits)
+                            "sha256": hashlib.sha256((out_dir / P.EXTRACTOR_FILE).read_bytes()).hexdigest(),
+                            **meta}
+    (out_dir / "config.json").write_text(json.dumps(cfg, indent=2))
+    (out_dir / "class_to_idx.json").write_text(json.dumps(class_to_idx, indent=2))
+    torch.save(head.state_dict(), out_dir / P.DEFAULT_HEAD)
+
+
+def _params_m(m: nn.Module) -> float:
+    return round(sum(p.numel() for p in m.parameters()) / 1e6, 2)
+
+
+# ---- CLI ----
+def main():
+    ap = argparse.ArgumentParser(description="Truncated / channel-pruned CNN14 variants with retrained heads.")
+    ap.add_argument("--data", required=True, help="Root with <species>/ folders and the test folder")
+    ap.add_argument("--test-folder", default="Test Data")
+    ap.add_argument("--ckpt", default=str(Path(__file__).resolve().parent),
+                    help="Base checkpoint dir: its config.json inference block is kept")
+    ap.add_argument("--out", required=True, help="One checkpoint dir per variant goes under here")
+    ap.add_argument("--depths", type=int, nargs="+", default=[3, 4, 5], help="Conv blocks kept (1..6)")
+    ap.add_argument("--keep", type=float, nargs="+", default=[1.0, 0.5], help="Channel fraction kept per block")
+    ap.add_argument("--epochs", type=int, default=75)
+    ap.add_argument("--lr", type=float, default=5e-4)
+    ap.add_argument("--weight-decay", type=float, default=1e-4)
+    ap.add_argument("--label-smooth", type=float, default=0.05)
+    ap.add_argument("--batch", type=int, default=32)
+    ap.add_argument("--num-aug-win", type=int, default=2, help="Jittered copies per training window")
+    ap.add_argument("--latency-sec", type=float, default=10.0, help="Clip length for the latency column")
+    ap.add_argument("--repeats", type=int, default=5)
+    ap.add_argument("--max-loss", type=float, default=0.02, help="Clip accuracy a suggested default may give up")
+    ap.add_argument("--threads", type=int, default=0, help="torch.set_num_threads (0 = torch default)")
+    ap.add_argument("--random-weights", action="store_true",
+                    help="Random-init CNN14 (offline latency check only; accuracies are meaningless)")
+    args = ap.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    base_cfg = P._load_json(Path(args.ckpt) / "config.json")
+    icfg = P._inference_cfg(base_cfg)
+    win_sec, hop_sec = float(icfg["win_sec"]), float(icfg["hop_sec"])
+    train_files, test_files = index_data(args.data, args.test_folder)
+    if not train_files or not test_files:
+        raise SystemExit(f"Need training folders and '{args.test_folder}' under {args.data}")
+    classes = sorted({l for _, l in train_files} | {l for _, l in test_files})
+    class_to_idx = {c: i for i, c in enumerate(classes)}
+
+    full_ext, cnn14 = _load_cnn14(args.random_weights)
+    variants = {_variant_name(d, k): reduce_cnn14(cnn14, d, k) for d in args.depths for k in args.keep}
+    print(f"[info] {len(classes)} classes, {len(train_files)} train / {len(test_files)} test files | "
+          f"variants: full, {', '.join(variants)}")
+
+    rng = np.random.default_rng(1234)
+    t0 = time.perf_counter()
+    tr_emb, tr_y, _ = embed_windows(windows(train_files, class_to_idx, True, win_sec, hop_sec,
+                                            args.num_aug_win, rng), cnn14, variants)
+    te_emb, te_y, te_f = embed_windows(windows(test_files, class_to_idx, False, win_sec, hop_sec, 0, rng),
+                                       cnn14, variants)
+    print(f"[info] embedded {len(tr_y)} train / {len(te_y)} test windows in {time.perf_counter() - t0:.0f}s")
+
+    rows = []
+    for name in ["full", *variants]:
+        ext = variants.get(name)
+        head = train_head(tr_emb[name], tr_y, len(classes), epochs=args.epochs, lr=args.lr,
+                          weight_decay=args.weight_decay, label_smooth=args.label_smooth, batch=args.batch)
+        win_acc, clip_acc = evaluate(head, te_emb[name], te_y, te_f, icfg)
+        pipe = P.Pipeline(full_ext if ext is None else ext, head, infer_cfg=icfg)
+        depth, keep = (6, 1.0) if ext is None else (len(ext.channels), ext.channels[0] / CNN14_CHANNELS[0])
+        rows.append({"variant": name, "depth": depth, "keep": round(keep, 3), "embed_dim": tr_emb[name].shape[1],
+                     "params_m": _params_m(cnn14 if ext is None else ext),
+                     "latency_ms": round(latency_ms(pipe, args.latency_sec, args.repeats), 1),
+                     "window_acc": round(win_acc, 4), "clip_acc": round(clip_acc, 4)})
+        write_checkpoint(Path(args.out) / name, ext, head, class_to_idx, base_cfg,
+                         {"depth": depth, "keep": rows[-1]["keep"], "clip_acc": rows[-1]["clip_acc"]})
+        print(f"[variant] {name:<10s} dim {rows[-1]['embed_dim']:>5d} | {rows[-1]['params_m']:6.2f} M params | "
+              f"{rows[-1]['latency_ms']:8.1f} ms | window acc {win_acc:.3f} | clip acc {clip_acc:.3f}")
+
+    full = rows[0]
+    for r in rows:
+        r["speedup"] = round(full["latency_ms"] / max(1e-9, r["latency_ms"]), 2)
+        r["clip_acc_change"] = round(r["clip_acc"] - full["clip_acc"], 4)
+    ok = [r for r in rows if -r["clip_acc_change"] <= args.max_loss]
+    best = min(ok, key=lambda r: r["latency_ms"])
+    report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "data": args.data, "classes": classes,
+              "mode": icfg["mode"], "latency_sec": args.latency_sec, "threads": torch.get_num_threads(),
+              "random_weights": args.random_weights, "max_loss": args.max_loss,
+              "suggested": best["variant"], "rows": rows}
+    (Path(args.out) / "report.json").write_text(json.dumps(report, indent=2))
+
+    print(f"\n{'variant':<10} {'dim':>5} {'params':>8} {'latency':>10} {'speedup':>8} {'clip acc':>9} {'change':>8}")
+    for r in rows:
+        mark = "  <- suggested" if r is best else ""
+        print(f"{r['variant']:<10} {r['embed_dim']:>5d} {r['params_m']:>7.2f}M {r['latency_ms']:>8.1f}ms "
+              f"{r['speedup']:>7.2f}x {r['clip_acc']:>9.3f} {r['clip_acc_change']:>+8.3f}{mark}")
+    print(f"[saved] {Path(args.out) / 'report.json'}; serve a variant with FROG_MODEL_DIR={Path(args.out) / best['variant']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
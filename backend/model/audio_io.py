@@ -0,0 +1,124 @@
+# backend/model/audio_io.py
+# Decode audio to float32 mono at a target rate from a path, bytes or a
+# file-like object, without touching disk when the format allows it:
+#   1) soundfile on an in-memory buffer (WAV/FLAC/OGG, MP3 with libsndfile>=1.1)
+#   2) ffmpeg reading stdin and writing raw f32le to stdout (M4A/AAC/...)
+#   3) temp file + librosa.load, only for inputs ffmpeg cannot read from a
+#      pipe (e.g. MP4/M4A with the moov atom at the end)
+
+from __future__ import annotations
+import io, os, shutil, subprocess, tempfile, time
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Union
+
+import numpy as np
+
+AudioSource = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO]
+
+
+def is_path(src: AudioSource) -> bool:
+    return isinstance(src, (str, os.PathLike))
+
+
+def source_name(src: AudioSource) -> Optional[str]:
+    """Filename hint (used for the temp-file suffix and error messages)."""
+    if is_path(src):
+        return str(src)
+    return getattr(src, "name", None) if not isinstance(src, (bytes, bytearray, memoryview)) else None
+
+
+def source_bytes(src: AudioSource) -> bytes:
+    """Raw encoded bytes of any source (reads file-likes from the start)."""
+    if is_path(src):
+        return Path(src).read_bytes()
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        return bytes(src)
+    if hasattr(src, "seek"):
+        try:
+            src.seek(0)
+        except Exception:
+            pass
+    return src.read()
+
+
+def _to_mono(y: np.ndarray) -> np.ndarray:
+    return y.mean(axis=1) if y.ndim == 2 else y
+
+
+def _resample(y: np.ndarray, orig_sr: int, sr: int) -> np.ndarray:
+    if orig_sr == sr:
+        return y
+    import librosa  # deferred: pulls in numba
+    return librosa.resample(y, orig_sr=orig_sr, target_sr=sr, res_type="soxr_hq")
+
+
+def _decode_soundfile(data: bytes) -> Optional[tuple]:
+    """(mono float32, native sr) or None if libsndfile can't read it."""
+    try:
+        import soundfile as sf
+        y, native_sr = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+    except Exception:
+        return None
+    return _to_mono(y), int(native_sr)
+
+
+def _decode_ffmpeg_pipe(data: bytes, sr: int) -> Optional[np.ndarray]:
+    if not shutil.which("ffmpeg"):
+        return None
+    cmd = ["ffmpeg", "-nostdin", "-v", "error", "-i", "pipe:0",
+           "-f", "f32le", "-ac", "1", "-ar", str(sr), "pipe:1"]
+    try:
+        proc = subprocess.run(cmd, input=data, capture_output=True, check=False)
+    except OSError:
+        return None
+    if proc.returncode != 0 or not proc.stdout:
+        return None
+    return np.frombuffer(proc.stdout, dtype=np.float32)
+
+
+def _decode_tempfile(data: bytes, sr: int, suffix: str) -> np.ndarray:
+    import librosa
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    try:
+        with tmp:
+            tmp.write(data)
+        y, _ = librosa.load(tmp.name, sr=sr, mono=True)
+        return y
+    finally:
+        try:
+            os.remove(tmp.name)
+        except OSError:
+            pass
+
+
+def decode_audio(src: AudioSource, sr: int, timings: Optional[Dict[str, float]] = None) -> np.ndarray:
+    """
+    Decode `src` to float32 mono at `sr`, shape (T,).
+    timings, if given, accumulates "decode" and "resample" ms (ffmpeg resamples
+    while decoding, so that path only reports "decode").
+    """
+    t0 = time.perf_counter()
+    native_sr = sr
+    if is_path(src):
+        import librosa
+        y, native_sr = librosa.load(str(src), sr=None, mono=True)
+    else:
+        data = source_bytes(src)
+        if not data:
+            raise ValueError("Empty audio payload.")
+        got = _decode_soundfile(data)
+        if got is not None:
+            y, native_sr = got
+        else:
+            y = _decode_ffmpeg_pipe(data, sr)
+            if y is None:
+                suffix = Path(source_name(src) or "").suffix or ".bin"
+                y = _decode_tempfile(data, sr, suffix)
+    t1 = time.perf_counter()
+    y = _resample(y, int(native_sr), sr)
+    t2 = time.perf_counter()
+    if timings is not None:
+        timings["decode"] = timings.get("decode", 0.0) + (t1 - t0) * 1000.0
+        if native_sr != sr:
+            timings["resample"] = timings.get("resample", 0.0) + (t2 - t1) * 1000.0
+    return np.ascontiguousarray(y, dtype=np.float32)
@@ -0,0 +1,123 @@
+# backend/model/cascade.py
+# Cascade pre-screen: a FrogNet-sized student (two convs on a 64x64 log-mel
+# image, see frognet.py) distilled from the CNN14 head's outputs by
+# DistillCascade.py. The student scores every clip first; only clips whose
+# student top-1 probability or top-1/top-2 margin is below threshold are
+# escalated to CNN14 + head (Pipeline.enable_cascade).
+#
+# Files next to the head weights:
+#   student.pt     student state dict
+#   student.json   {"num_classes", "teacher" (head filename), "min_conf",
+#                   "min_margin", "spec_size", ...; DistillCascade.py's pick}
+#
+# FROGNET_CASCADE=1 makes from_pretrained load it; FROGNET_CASCADE_MIN_CONF /
+# FROGNET_CASCADE_MIN_MARGIN override the stored thresholds.
+
+from __future__ import annotations
+import json, os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+try:
+    from backend.model.frognet import FrogNet
+except ModuleNotFoundError:  # backend/model itself is on sys.path
+    from frognet import FrogNet  # type: ignore
+
+STUDENT_FILE = "student.pt"
+STUDENT_META = "student.json"
+SPEC_SIZE = (64, 64)        # FrogNet's fc1 expects 32 x 16 x 16 after two 2x pools
+N_FFT, HOP, FMIN, FMAX = 1024, 320, 50.0, 14000.0
+TOP_DB = 80.0
+
+_mel_fb: Dict[int, torch.Tensor] = {}
+
+
+def _mel_filterbank(sr: int) -> torch.Tensor:
+    fb = _mel_fb.get(sr)
+    if fb is None:
+        import librosa  # deferred: pulls in numba
+        fb = _mel_fb[sr] = torch.from_numpy(
+            librosa.filters.mel(sr=sr, n_fft=N_FFT, n_mels=SPEC_SIZE[0], fmin=FMIN, fmax=FMAX)).float()
+    return fb
+
+
+def student_input(ys: Sequence[np.ndarray], sr: int = 32000) -> torch.Tensor:
+    """
+    Mono clips (any lengths) -> student images [n,1,64,64]: log-mel power in
+    dB relative to the clip's max (floored at -80 dB, like power_to_db with
+    ref=np.max) resized bilinearly to 64x64 and scaled to [-1, 1].
+    """
+    fb, window = _mel_filterbank(sr), torch.hann_window(N_FFT)
+    out = []
+    for y in ys:
+        x = torch.from_numpy(np.ascontiguousarray(y, dtype=np.float32))
+        if x.numel() < N_FFT:
+            x = F.pad(x, (0, N_FFT - x.numel()))
+        spec = torch.stft(x, N_FFT, HOP, window=window, center=True, return_complex=True).abs().pow(2)
+        db = 10.0 * torch.log10(torch.clamp(fb @ spec, min=1e-10))
+        db = torch.clamp(db - db.max(), min=-TOP_DB)
+        img = F.interpolate(db[None, None], size=SPEC_SIZE, mode="bilinear", align_corners=False)[0]
+        out.append(img / (TOP_DB / 2) + 1.0)
+    return torch.stack(out)
+
+
+def accept_mask(probs: np.ndarray, min_conf: float, min_margin: float) -> np.ndarray:
+    """Rows [n,C] the student answers itself: top-1 >= min_conf and top-1 - top-2 >= min_margin."""
+    top2 = -np.sort(-probs, axis=1)[:, :2]
+    margin = top2[:, 0] - (top2[:, 1] if probs.shape[1] > 1 else 0.0)
+    return (top2[:, 0] >= min_conf) & (margin >= min_margin)
+
+
+class Cascade:
+    """Student pre-screen used by Pipeline.forward / predict_waves."""
+    def __init__(self, student: torch.nn.Module, min_conf: float = 0.9, min_margin: float = 0.0,
+                 batch: int = 64):
+        self.student = student.eval()
+        self.min_conf, self.min_margin, self.batch = float(min_conf), float(min_margin), max(1, int(batch))
+
+    def probs(self, ys: Sequence[np.ndarray], sr: int = 32000) -> np.ndarray:
+        """Student class probabilities [n,C]."""
+        out = []
+        with torch.no_grad():
+            for i in range(0, len(ys), self.batch):
+                out.append(torch.softmax(self.student(student_input(ys[i:i + self.batch], sr)), dim=-1))
+        return torch.cat(out).numpy()
+
+    def screen(self, ys: Sequence[np.ndarray], sr: int = 32000) -> Tuple[np.ndarray, np.ndarray]:
+        """(student probs [n,C], accepted [n] bool); rejected rows go to CNN14."""
+        probs = self.probs(ys, sr)
+        return probs, accept_mask(probs, self.min_conf, self.min_margin)
+
+
+# ---- files ----
+def save_student(out_dir: str, student: torch.nn.Module, meta: Dict[str, Any]):
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    torch.save(student.state_dict(), out / STUDENT_FILE)
+    (out / STUDENT_META).write_text(json.dumps({"spec_size": list(SPEC_SIZE), **meta}, indent=2))
+
+
+def load_cascade(ckpt_dir: str, head_file: Optional[str] = None) -> Optional[Cascade]:
+    """
+    The cascade stored next to the head, or None (with a [warn]) if there is
+    none or it was distilled from a different head file.
+    """
+    ckpt = Path(ckpt_dir)
+    meta_path, weights = ckpt / STUDENT_META, ckpt / STUDENT_FILE
+    if not (meta_path.is_file() and weights.is_file()):
+        print(f"[warn] cascade: no {STUDENT_FILE}/{STUDENT_META} in {ckpt}; serving CNN14 only")
+        return None
+    meta = json.loads(meta_path.read_text())
+    if head_file and meta.get("teacher") not in (None, head_file):
+        print(f"[warn] cascade: student was distilled from {meta['teacher']}, not {head_file}; serving CNN14 only")
+        return None
+    student = FrogNet(num_classes=int(meta["num_classes"]))
+    student.load_state_dict(torch.load(weights, map_location="cpu", weights_only=True))
+    min_conf = float(os.getenv("FROGNET_CASCADE_MIN_CONF", meta.get("min_conf", 0.9)))
+    min_margin = float(os.getenv("FROGNET_CASCADE_MIN_MARGIN", meta.get("min_margin", 0.0)))
+    print(f"[info] cascade: student pre-screen, escalate below conf {min_conf} / margin {min_margin}")
+    return Cascade(student, min_conf, min_margin)
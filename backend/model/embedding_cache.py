@@ -0,0 +1,176 @@
+# backend/model/embedding_cache.py
+# Content-addressed cache for CNN14 embeddings.
+#   key = blake2b(audio bytes) + extractor identity (+ windowing params)
+#   tier 1: in-memory LRU bounded by bytes
+#   tier 2: optional on-disk .npy store that survives restarts
+# Concurrent misses on the same key are coalesced: one caller computes,
+# the others wait for its result.
+
+from __future__ import annotations
+import hashlib, os, tempfile, threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import torch
+
+
+def audio_key(data: bytes, ident: str) -> str:
+    """Stable hex key for (audio bytes, extractor identity)."""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(ident.encode("utf-8"))
+    h.update(b"\0")
+    h.update(data)
+    return h.hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, max_bytes: int = 64 << 20, disk_dir: Optional[str] = None):
+        self.max_bytes = int(max_bytes)
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self._mem: "OrderedDict[str, torch.Tensor]" = OrderedDict()
+        self._mem_bytes = 0
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+    @classmethod
+    def from_env(cls) -> Optional["EmbeddingCache"]:
+        """FROGNET_EMB_CACHE_MB (0 disables) and FROGNET_EMB_CACHE_DIR (optional disk tier)."""
+        mb = float(os.getenv("FROGNET_EMB_CACHE_MB", "64"))
+        if mb <= 0:
+            return None
+        return cls(max_bytes=int(mb * (1 << 20)), disk_dir=os.getenv("FROGNET_EMB_CACHE_DIR") or None)
+
+    # ---- public ----
+    def get_or_compute(self, key: str, compute: Callable[[], torch.Tensor]) -> torch.Tensor:
+        with self._lock:
+            emb = self._mem_get(key)
+            if emb is not None:
+                self.stats["hits"] += 1
+                return emb
+            fut = self._inflight.get(key)
+            owner = fut is None
+            if owner:
+                fut = Future()
+                self._inflight[key] = fut
+            else:
+                self.stats["coalesced"] += 1
+        if not owner:
+            return fut.result()
+
+        try:
+            emb = self._disk_get(key)
+            if emb is not None:
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+            else:
+                with self._lock:
+                    self.stats["misses"] += 1
+                emb = compute().detach().cpu().float().contiguous()
+                self._disk_put(key, emb)
+            with self._lock:
+                self._mem_put(key, emb)
+            fut.set_result(emb)
+            return emb
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def get(self, key: str, count: bool = True) -> Optional[torch.Tensor]:
+        """
+        Lookup without computing (memory, then disk); counts a miss on None.
+        count=False leaves the hit/miss counters alone (side entries stored
+        next to an embedding, e.g. the AudioSet output).
+        """
+        with self._lock:
+            emb = self._mem_get(key)
+            if emb is not None:
+                self.stats["hits"] += count
+                return emb
+        emb = self._disk_get(key)
+        with self._lock:
+            if emb is not None:
+                self.stats["disk_hits"] += count
+                self._mem_put(key, emb)
+            else:
+                self.stats["misses"] += count
+        return emb
+
+    def put(self, key: str, emb: torch.Tensor):
+        emb = emb.detach().cpu().float().contiguous()
+        self._disk_put(key, emb)
+        with self._lock:
+            self._mem_put(key, emb)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            out = dict(self.stats)
+            out.update(entries=len(self._mem), bytes=self._mem_bytes, max_bytes=self.max_bytes)
+        lookups = out["hits"] + out["disk_hits"] + out["misses"]
+        out["hit_rate"] = round((out["hits"] + out["disk_hits"]) / lookups, 4) if lookups else 0.0
+        out["disk"] = str(self.disk_dir) if self.disk_dir else None
+        return out
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            self._mem_bytes = 0
+
+    # ---- memory tier (caller holds the lock) ----
+    def _mem_get(self, key: str) -> Optional[torch.Tensor]:
+        emb = self._mem.get(key)
+        if emb is not None:
+            self._mem.move_to_end(key)
+        return emb
+
+    def _mem_put(self, key: str, emb: torch.Tensor):
+        size = emb.numel() * emb.element_size()
+        if size > self.max_bytes:
+            return
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_bytes -= old.numel() * old.element_size()
+        self._mem[key] = emb
+        self._mem_bytes += size
+        while self._mem_bytes > self.max_bytes:
+            _, ev = self._mem.popitem(last=False)
+            self._mem_bytes -= ev.numel() * ev.element_size()
+            self.stats["evictions"] += 1
+
+    # ---- disk tier ----
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.npy"
+
+    def _disk_get(self, key: str) -> Optional[torch.Tensor]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        if not path.is_file():
+            return None
+        try:
+            return torch.from_numpy(np.load(path))
+        except Exception as e:
+            print(f"[warn] dropping unreadable cache entry {path}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+
+    def _disk_put(self, key: str, emb: torch.Tensor):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, emb.numpy())
+            os.replace(tmp, path)  # atomic: readers never see a partial file
+        except Exception as e:
+            print(f"[warn] could not persist embedding {key}: {e}")
@@ -0,0 +1,332 @@
+# backend/model/registry.py
+# Local, versioned registry of FrogNet heads that share one loaded CNN14.
+#
+#   <root>/
+#     registry.json          {"active", "pinned", "history", "canary"}
+#     1.0.0/                 config.json, class_to_idx.json, <head>.pth
+#     1.1.0/ ...
+#
+# Versions are loaded next to the one being served and swapped in with a
+# single reference assignment, so in-flight requests finish on the head they
+# started with and new ones pick up the new head; the extractor, batcher and
+# embedding cache are untouched. A canary routes `percent` of traffic to a
+# candidate head. Unless a version is pinned, refresh() follows the newest
+# published version; an explicit activate() or rollback() pins what it
+# selects (unpin() to follow new publishes again), so the watcher can't undo it.
+# Replica processes (replicas.py) load the selected version themselves from
+# head_source(). A version whose config.json "extractor" block or embedding
+# dim doesn't match the served extractor is refused on publish and activate.
+#
+#   python backend/model/registry.py --root /models publish 1.1.0 --from runs/exp7
+#   python backend/model/registry.py --root /models list
+
+from __future__ import annotations
+import argparse, hashlib, json, os, random, re, shutil, tempfile, threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from backend.model.Predictor import Pipeline, check_head_fits, load_head
+except ModuleNotFoundError:  # backend/model itself is on sys.path
+    from Predictor import Pipeline, check_head_fits, load_head  # type: ignore
+
+STATE_FILE = "registry.json"
+HISTORY_LEN = 10
+
+
+@dataclass
+class HeadVersion:
+    version: str
+    model: Pipeline
+    idx_to_class: Dict[int, str]
+
+
+def _version_key(v: str):
+    """Sort '1.10.0' after '1.9.0'; non-numeric parts compare as text."""
+    return [(0, int(p), "") if p.isdigit() else (1, 0, p) for p in re.split(r"[.\-_+]", v)]
+
+
+def _weights_file(vdir: Path) -> Optional[str]:
+    """config.json["weights"], else FROGNET_WEIGHTS if present, else the only .pth."""
+    cfg_path = vdir / "config.json"
+    if cfg_path.is_file():
+        name = json.loads(cfg_path.read_text()).get("weights")
+        if name:
+            return name
+    default = os.getenv("FROGNET_WEIGHTS", "frognet_head_maxprob_a3_k3.pth")
+    if (vdir / default).is_file():
+        return default
+    pths = sorted(p.name for p in vdir.glob("*.pth"))
+    return pths[0] if len(pths) == 1 else None
+
+
+def list_versions(root: Path) -> List[str]:
+    return sorted((p.name for p in Path(root).iterdir()  # ".<version>.*" = publish in progress
+                   if p.is_dir() and not p.name.startswith(".") and (p / "class_to_idx.json").is_file()),
+                  key=_version_key)
+
+
+def publish_version(root: Path, version: str, src_dir: str, weights: Optional[str] = None) -> Path:
+    """Copy a checkpoint dir into <root>/<version> (atomic rename; versions are immutable)."""
+    root = Path(root)
+    dst = root / version
+    if dst.exists():
+        raise FileExistsError(f"Version {version} already exists in {root}")
+    src = Path(src_dir)
+    weights = weights or _weights_file(src)
+    if not weights or not (src / weights).is_file():
+        raise FileNotFoundError(f"No head weights found in {src}; pass weights=<file>.")
+    root.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(dir=root, prefix=f".{version}."))
+    for name in ("config.json", "class_to_idx.json", weights):
+        shutil.copy2(src / name, tmp / name)
+    cfg = json.loads((tmp / "config.json").read_text())
+    cfg["weights"] = weights
+    cfg["sha256"] = hashlib.sha256((tmp / weights).read_bytes()).hexdigest()
+    (tmp / "config.json").write_text(json.dumps(cfg, indent=2))
+    os.replace(tmp, dst)
+    return dst
+
+
+class ModelRegistry:
+    def __init__(self, root: str, base: Pipeline, base_idx_to_class: Dict[int, str],
+                 base_version: str = "builtin"):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._base = base
+        self._base_version = base_version
+        self._lock = threading.Lock()
+        self._loaded: Dict[str, HeadVersion] = {base_version: HeadVersion(base_version, base, base_idx_to_class)}
+        self._state: Dict[str, Any] = {"active": base_version, "pinned": False, "history": [], "canary": None}
+        self._active = self._loaded[base_version]
+        self._canary: Optional[HeadVersion] = None
+        self._canary_pct = 0.0
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._restore()
+
+    @classmethod
+    def from_env(cls, base: Pipeline, base_idx_to_class: Dict[int, str]) -> Optional["ModelRegistry"]:
+        """FROGNET_REGISTRY_DIR (unset = no registry), FROGNET_REGISTRY_POLL_SEC (0 = no watcher)."""
+        root = os.getenv("FROGNET_REGISTRY_DIR")
+        if not root:
+            return None
+        reg = cls(root, base, base_idx_to_class)
+        reg.refresh()
+        poll = float(os.getenv("FROGNET_REGISTRY_POLL_SEC", "0"))
+        if poll > 0:
+            reg.watch(poll)
+        return reg
+
+    # ---- catalogue ----
+    def versions(self) -> List[str]:
+        return list_versions(self.root)
+
+    def publish(self, version: str, src_dir: str, weights: Optional[str] = None) -> Path:
+        """publish_version, refusing heads that don't fit the served extractor."""
+        head, _, _ = load_head(src_dir, weights or _weights_file(Path(src_dir)))
+        check_head_fits(self._base, head, src_dir)
+        return publish_version(self.root, version, src_dir, weights)
+
+    # ---- serving ----
+    def select(self, key: Optional[str] = None) -> HeadVersion:
+        """
+        Head for one request: the canary for `percent` of traffic, else the
+        active version. A key (e.g. audio hash) makes the choice sticky.
+        """
+        active, canary, pct = self._active, self._canary, self._canary_pct
+        if canary is None or pct <= 0:
+            return active
+        if key is None:
+            roll = random.random() * 100.0
+        else:
+            roll = int(hashlib.blake2b(key.encode(), digest_size=4).hexdigest(), 16) % 10000 / 100.0
+        return canary if roll < pct else active
+
+    def head_source(self, version: str) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        (version dir, head weights file) for processes that load heads
+        themselves (inference replicas); None for the base checkpoint.
+        """
+        if version == self._base_version:
+            return None
+        vdir = self.root / version
+        return str(vdir), _weights_file(vdir)
+
+    @property
+    def active(self) -> HeadVersion:
+        return self._active
+
+    def activate(self, version: str, pin: bool = True, _rollback: bool = False) -> HeadVersion:
+        """
+        Load `version` (if needed) and make it the active head. Pinned by
+        default: an operator's choice must survive refresh() and restarts.
+        """
+        hv = self._load(version)
+        with self._lock:
+            prev = self._active.version
+            if _rollback:
+                self._state["history"] = self._state["history"][1:]
+            elif prev != version:
+                self._state["history"] = ([prev] + self._state["history"])[:HISTORY_LEN]
+            self._active = hv  # the swap: one reference assignment
+            self._state["active"] = version
+            self._state["pinned"] = bool(pin)
+            if self._canary is not None and self._canary.version == version:
+                self._canary, self._canary_pct, self._state["canary"] = None, 0.0, None
+            self._save()
+        print(f"[registry] active head {prev} -> {version}")
+        return hv
+
+    def rollback(self) -> HeadVersion:
+        """Re-activate the previously active version (pinned, like activate)."""
+        with self._lock:
+            history = list(self._state["history"])
+        if not history:
+            raise RuntimeError("No previous version to roll back to.")
+        return self.activate(history[0], _rollback=True)
+
+    def pin(self, version: Optional[str] = None) -> Dict[str, Any]:
+        """Pin the active (or given) version so refresh() won't move it."""
+        if version is not None and version != self._active.version:
+            self.activate(version, pin=True)
+        else:
+            with self._lock:
+                self._state["pinned"] = True
+                self._save()
+        return self.snapshot()
+
+    def unpin(self) -> Dict[str, Any]:
+        with self._lock:
+            self._state["pinned"] = False
+            self._save()
+        return self.snapshot()
+
+    def set_canary(self, version: str, percent: float) -> Dict[str, Any]:
+        percent = float(percent)
+        if not 0.0 < percent <= 100.0:
+            raise ValueError("Canary percent must be in (0, 100].")
+        hv = self._load(version)
+        with self._lock:
+            self._canary, self._canary_pct = hv, percent
+            self._state["canary"] = {"version": version, "percent": percent}
+            self._save()
+        return self.snapshot()
+
+    def clear_canary(self) -> Dict[str, Any]:
+        with self._lock:
+            self._canary, self._canary_pct, self._state["canary"] = None, 0.0, None
+            self._save()
+        return self.snapshot()
+
+    def refresh(self) -> Optional[HeadVersion]:
+        """Follow the newest published version unless pinned."""
+        if self._state["pinned"]:
+            return None
+        versions = self.versions()
+        if not versions or versions[-1] == self._active.version:
+            return None
+        return self.activate(versions[-1], pin=False)
+
+    def watch(self, interval_sec: float):
+        """Poll for new versions in a background thread."""
+        if self._watcher is not None:
+            return
+        def _loop():
+            while not self._stop.wait(interval_sec):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"[warn] registry refresh failed: {e}")
+        self._watcher = threading.Thread(target=_loop, name="frognet-registry", daemon=True)
+        self._watcher.start()
+
+    def close(self):
+        self._stop.set()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            out = json.loads(json.dumps(self._state))
+            out["loaded"] = sorted(self._loaded, key=_version_key)
+        out["available"] = self.versions()
+        return out
+
+    # ---- internals ----
+    def _load(self, version: str) -> HeadVersion:
+        with self._lock:
+            hv = self._loaded.get(version)
+        if hv is not None:
+            return hv
+        vdir = self.root / version
+        if not (vdir / "class_to_idx.json").is_file():
+            raise FileNotFoundError(f"Unknown model version {version!r} (no {vdir}/class_to_idx.json)")
+        head, idx_to_class, infer_cfg = load_head(str(vdir), _weights_file(vdir))
+        check_head_fits(self._base, head, str(vdir))
+        hv = HeadVersion(version, self._base.with_head(head, infer_cfg), idx_to_class)
+        with self._lock:
+            hv = self._loaded.setdefault(version, hv)
+            # keep only what can be served or rolled back to
+            keep = {self._base_version, self._active.version, version, *self._state["history"][:1]}
+            if self._canary is not None:
+                keep.add(self._canary.version)
+            for v in [v for v in self._loaded if v not in keep]:
+                del self._loaded[v]
+        return hv
+
+    def _restore(self):
+        path = self.root / STATE_FILE
+        if not path.is_file():
+            return
+        try:
+            saved = json.loads(path.read_text())
+        except Exception as e:
+            print(f"[warn] ignoring unreadable {path}: {e}")
+            return
+        self._state["history"] = list(saved.get("history") or [])
+        try:
+            if saved.get("active") and saved["active"] != self._active.version:
+                self._active = self._load(saved["active"])
+                self._state["active"] = saved["active"]
+            self._state["pinned"] = bool(saved.get("pinned"))
+            canary = saved.get("canary")
+            if canary:
+                self._canary, self._canary_pct = self._load(canary["version"]), float(canary["percent"])
+                self._state["canary"] = canary
+        except Exception as e:
+            print(f"[warn] could not restore registry state ({e}); serving {self._active.version}")
+
+    def _save(self):
+        """Persist state (caller holds the lock)."""
+        path = self.root / STATE_FILE
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self._state, f, indent=2)
+        os.replace(tmp, path)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Manage the local FrogNet head registry.")
+    ap.add_argument("--root", default=os.getenv("FROGNET_REGISTRY_DIR"), required=not os.getenv("FROGNET_REGISTRY_DIR"))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("publish", help="Copy a checkpoint dir in as a new version")
+    p.add_argument("version")
+    p.add_argument("--from", dest="src", required=True, help="Dir with config.json, class_to_idx.json, head .pth")
+    p.add_argument("--weights", default=None, help="Head weights filename inside --from")
+    sub.add_parser("list", help="List published versions and the saved serving state")
+    args = ap.parse_args()
+
+    root = Path(args.root)
+    if args.cmd == "publish":
+        print(f"[saved] {publish_version(root, args.version, args.src, args.weights)}")
+        return
+    state = json.loads((root / STATE_FILE).read_text()) if (root / STATE_FILE).is_file() else {}
+    for v in list_versions(root):
+        tags = [t for t, on in (("active", v == state.get("active")),
+                                ("pinned", v == state.get("active") and state.get("pinned")),
+                                ("canary", v == (state.get("canary") or {}).get("version"))) if on]
+        print(f"{v:<16} {' '.join(tags)}")
+
+
+if __name__ == "__main__":
+    main()
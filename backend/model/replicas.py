@@ -0,0 +1,231 @@
+# backend/model/replicas.py
+# Multi-process inference: N worker processes, each with its own copy of the
+# model (from_pretrained) and its own torch intra-op thread budget, so decode,
+# resample and the Python glue in Predictor.py stop contending for one GIL.
+#
+# Requests go to the replica with the fewest in-flight jobs. A job may name a
+# registry head version (see ModelRegistry.head_source): replicas load it onto
+# their extractor on first use and keep the REPLICA_HEADS most recent ones.
+#
+#   pool = ReplicaPool(ckpt_dir, replicas=4, threads_per_replica=2)
+#   pool.wait_ready()
+#   name, conf, topk = pool.predict(open("clip.wav", "rb").read(), topk=3)
+
+from __future__ import annotations
+import itertools, multiprocessing as mp, os, queue, threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from backend.model.audio_io import AudioSource, is_path, source_bytes
+except ModuleNotFoundError:  # backend/model itself is on sys.path
+    from audio_io import AudioSource, is_path, source_bytes  # type: ignore
+
+REPLICA_HEADS = int(os.getenv("FROGNET_REPLICA_HEADS", "3"))   # registry heads kept loaded per replica
+
+
+def _replica_main(idx: int, ckpt_dir: str, filename: Optional[str], threads: int,
+                  req_q: "mp.Queue", res_q: "mp.Queue"):
+    """Worker process: load the model once, then serve (job_id, src, topk, head) forever."""
+    import torch
+    torch.set_num_threads(max(1, threads))
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # already set by an import side effect
+
+    try:
+        try:
+            from backend.model.Predictor import RejectedClip, check_head_fits, from_pretrained, load_head, predict_one
+            from backend.model.embedding_cache import EmbeddingCache
+        except ModuleNotFoundError:
+            from Predictor import RejectedClip, check_head_fits, from_pretrained, load_head, predict_one  # type: ignore
+            from embedding_cache import EmbeddingCache  # type: ignore
+        model, preprocess, idx_to_class = from_pretrained(ckpt_dir, filename=filename)
+        cache = EmbeddingCache.from_env()
+        if cache is not None:
+            model.enable_cache(cache)
+    except Exception as e:
+        res_q.put((None, idx, "dead", f"{type(e).__name__}: {e}"))
+        return
+    res_q.put((None, idx, "ready", os.getpid()))
+
+    heads: "OrderedDict[str, tuple]" = OrderedDict()   # version -> (pipeline, idx_to_class)
+
+    def serving(head):
+        """The checkpoint's own head (None), else registry (version, dir, weights)."""
+        if head is None:
+            return model, idx_to_class
+        version, vdir, weights = head
+        if version not in heads:
+            h, classes, infer_cfg = load_head(vdir, weights)
+            check_head_fits(model, h, vdir)
+            heads[version] = (model.with_head(h, infer_cfg), classes)
+            while len(heads) > max(1, REPLICA_HEADS):
+                heads.popitem(last=False)
+        heads.move_to_end(version)
+        return heads[version]
+
+    while True:
+        job = req_q.get()
+        if job is None:
+            return
+        job_id, src, topk, head = job
+        try:
+            pipe, classes = serving(head)   # a head that fails to load fails the job, never falls back
+            out = predict_one(src, pipe, preprocess, classes, topk=topk)
+            res_q.put((job_id, idx, "ok", out))
+        except RejectedClip as e:  # activity gate / frog check: re-raised as such in the parent
+            res_q.put((job_id, idx, "rejected", (e.reason, str(e))))
+        except Exception as e:
+            res_q.put((job_id, idx, "err", f"{type(e).__name__}: {e}"))
+
+
+def _rejected(reason: str, msg: str) -> Exception:
+    try:
+        from backend.model.Predictor import REJECTIONS
+    except ModuleNotFoundError:
+        from Predictor import REJECTIONS  # type: ignore
+    return REJECTIONS.get(reason, REJECTIONS["rejected"])(msg)
+
+
+class ReplicaPool:
+    def __init__(self, ckpt_dir: str, replicas: int = 2, threads_per_replica: int = 1,
+                 filename: Optional[str] = None):
+        self.replicas = max(1, int(replicas))
+        self.threads_per_replica = max(1, int(threads_per_replica))
+        ctx = mp.get_context("spawn")  # fork + torch thread pools is unsafe
+        self._res_q = ctx.Queue()
+        self._req_qs = [ctx.Queue() for _ in range(self.replicas)]
+        self._procs = [
+            ctx.Process(
+                target=_replica_main,
+                args=(i, str(ckpt_dir), filename, self.threads_per_replica, self._req_qs[i], self._res_q),
+                name=f"frognet-replica-{i}",
+                daemon=True,
+            )
+            for i in range(self.replicas)
+        ]
+        self._lock = threading.Lock()
+        self._inflight = [0] * self.replicas
+        self._alive = [True] * self.replicas
+        self._ready = [False] * self.replicas
+        self._ready_evt = threading.Event()
+        self._pending: Dict[int, Tuple[int, Future]] = {}
+        self._ids = itertools.count()
+        self._closed = False
+        for p in self._procs:
+            p.start()
+        self._collector = threading.Thread(target=self._collect, name="frognet-replica-results", daemon=True)
+        self._collector.start()
+
+    @classmethod
+    def from_env(cls, ckpt_dir: str, filename: Optional[str] = None) -> Optional["ReplicaPool"]:
+        """
+        FROGNET_REPLICAS=N (0 = in-process, the default) and
+        FROGNET_THREADS_PER_REPLICA (default: cores // N).
+        """
+        n = int(os.getenv("FROGNET_REPLICAS", "0"))
+        if n <= 0:
+            return None
+        threads = int(os.getenv("FROGNET_THREADS_PER_REPLICA", "0")) or max(1, (os.cpu_count() or 1) // n)
+        return cls(ckpt_dir, replicas=n, threads_per_replica=threads, filename=filename)
+
+    # ---- public ----
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until every live replica has loaded its model."""
+        return self._ready_evt.wait(timeout)
+
+    def submit(self, src: AudioSource, topk: int = 3, head: Optional[Tuple[str, str, Optional[str]]] = None
+               ) -> Future:
+        """head: registry (version, dir, weights) to score with; None = the checkpoint's head."""
+        # Paths stay paths (workers read them); buffers cross the pipe as bytes
+        payload = str(src) if is_path(src) else source_bytes(src)
+        fut: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("ReplicaPool is closed.")
+            live = [i for i in range(self.replicas) if self._alive[i]]
+            if not live:
+                raise RuntimeError("No live inference replicas.")
+            idx = min(live, key=lambda i: (self._inflight[i], not self._ready[i]))
+            job_id = next(self._ids)
+            self._inflight[idx] += 1
+            self._pending[job_id] = (idx, fut)
+        self._req_qs[idx].put((job_id, payload, int(topk), head))
+        return fut
+
+    def predict(self, src: AudioSource, topk: int = 3, timeout: Optional[float] = None,
+                head: Optional[Tuple[str, str, Optional[str]]] = None):
+        return self.submit(src, topk, head).result(timeout)
+
+    def loads(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {"replica": i, "pid": p.pid, "alive": self._alive[i], "ready": self._ready[i],
+                 "inflight": self._inflight[i]}
+                for i, p in enumerate(self._procs)
+            ]
+
+    def close(self, timeout: float = 5.0):
+        with self._lock:
+            self._closed = True
+        for q in self._req_qs:
+            q.put(None)
+        for p in self._procs:
+            p.join(timeout)
+            if p.is_alive():
+                p.terminate()
+
+    # ---- result side ----
+    def _mark_dead(self, idx: int, reason: str):
+        with self._lock:
+            self._alive[idx] = False
+            orphans = [(jid, f) for jid, (i, f) in self._pending.items() if i == idx]
+            for jid, _ in orphans:
+                del self._pending[jid]
+            self._inflight[idx] = 0
+            if all(self._ready[i] or not self._alive[i] for i in range(self.replicas)):
+                self._ready_evt.set()
+        for _, f in orphans:
+            f.set_exception(RuntimeError(f"replica {idx} died: {reason}"))
+
+    def _collect(self):
+        while True:
+            try:
+                job_id, idx, status, payload = self._res_q.get(timeout=1.0)
+            except queue.Empty:
+                for i, p in enumerate(self._procs):
+                    if self._alive[i] and not p.is_alive():
+                        self._mark_dead(i, f"exit code {p.exitcode}")
+                with self._lock:
+                    if self._closed and not self._pending:
+                        return
+                continue
+            except (EOFError, OSError):
+                return
+
+            if job_id is None:
+                if status == "ready":
+                    with self._lock:
+                        self._ready[idx] = True
+                        if all(self._ready[i] or not self._alive[i] for i in range(self.replicas)):
+                            self._ready_evt.set()
+                else:
+                    print(f"[replicas] replica {idx} failed to start: {payload}")
+                    self._mark_dead(idx, payload)
+                continue
+
+            with self._lock:
+                entry = self._pending.pop(job_id, None)
+                if entry is not None:
+                    self._inflight[idx] -= 1
+            if entry is None:
+                continue
+            if status == "ok":
+                entry[1].set_result(payload)
+            elif status == "rejected":
+                entry[1].set_exception(_rejected(*payload))
+            else:
+                entry[1].set_exception(RuntimeError(payload))
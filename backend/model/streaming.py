@@ -0,0 +1,172 @@
+# backend/model/streaming.py
+# Incremental scoring of a live recording: PCM chunks in, rolling aggregated
+# predictions out.
+#   - chunks are resampled to 32 kHz as they arrive (soxr stream, no edge clicks)
+#   - every full window (win_sec, stepped by hop_sec) goes through CNN14 + head
+#     as soon as it is available
+#   - window probabilities are aggregated exactly like the offline windowed path,
+#     so the final update matches predict_one() on the same audio
+#   - the caller stops early once the aggregate is confident enough
+#   - a stream is capped at max_sec of audio (FROGNET_STREAM_MAX_SEC): window
+#     probabilities live in one preallocated array, so memory and the per-hop
+#     aggregation cost stay bounded however long the socket stays open
+#
+#   s = StreamScorer(pipeline, idx_to_class, in_sr=16000)
+#   for chunk in mic:
+#       for update in s.push(chunk):
+#           if update["done"]: ...
+
+from __future__ import annotations
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import torch
+
+try:
+    from backend.model.Predictor import PANN_SR, Pipeline, _aggregate_windows
+except ModuleNotFoundError:  # backend/model itself is on sys.path
+    from Predictor import PANN_SR, Pipeline, _aggregate_windows  # type: ignore
+
+PCM_FORMATS = {"f32le": np.float32, "s16le": np.int16}
+
+
+def pcm_to_float(data: bytes, fmt: str = "s16le") -> np.ndarray:
+    """Raw little-endian mono PCM -> float32 in [-1, 1]."""
+    if fmt not in PCM_FORMATS:
+        raise ValueError(f"Unknown PCM format {fmt!r}; expected one of {list(PCM_FORMATS)}")
+    dtype = np.dtype(PCM_FORMATS[fmt]).newbyteorder("<")
+    usable = len(data) - len(data) % dtype.itemsize
+    y = np.frombuffer(data[:usable], dtype=dtype)
+    if fmt == "s16le":
+        return y.astype(np.float32) / 32768.0
+    return y.astype(np.float32, copy=False)
+
+
+class _Resampler:
+    """Chunked resampling to 32 kHz that is continuous across chunk boundaries."""
+    def __init__(self, in_sr: int):
+        self.in_sr = int(in_sr)
+        self._stream = None
+        if self.in_sr != PANN_SR:
+            try:
+                import soxr
+            except Exception as e:
+                raise RuntimeError("soxr not installed. Run: pip install soxr") from e
+            self._stream = soxr.ResampleStream(self.in_sr, PANN_SR, 1, dtype="float32", quality="HQ")
+
+    def __call__(self, y: np.ndarray, last: bool = False) -> np.ndarray:
+        if self._stream is None:
+            return y
+        return self._stream.resample_chunk(y, last=last)
+
+
+class StreamScorer:
+    def __init__(self, pipeline: Pipeline, idx_to_class: Dict[int, str], in_sr: int = PANN_SR,
+                 topk: int = 3, exit_conf: Optional[float] = None, min_windows: Optional[int] = None,
+                 max_sec: Optional[float] = None):
+        """
+        exit_conf:   stop once the aggregated top-1 reaches this
+                     (default FROGNET_STREAM_EXIT_CONF, 0.9; <= 0 never stops early)
+        min_windows: windows required before an early exit
+                     (default FROGNET_STREAM_MIN_WINDOWS, 2)
+        max_sec:     stop with reason "max_duration" after this much audio
+                     (default FROGNET_STREAM_MAX_SEC, 600)
+        """
+        self.pipeline = pipeline
+        self.idx_to_class = idx_to_class
+        self.topk = int(topk)
+        self.exit_conf = float(os.getenv("FROGNET_STREAM_EXIT_CONF", "0.9") if exit_conf is None else exit_conf)
+        self.min_windows = int(os.getenv("FROGNET_STREAM_MIN_WINDOWS", "2") if min_windows is None else min_windows)
+        icfg = pipeline.infer_cfg
+        self.win = int(icfg["win_sec"] * PANN_SR)
+        self.hop = int(icfg["hop_sec"] * PANN_SR)
+        max_sec = float(os.getenv("FROGNET_STREAM_MAX_SEC", "600") if max_sec is None else max_sec)
+        self.max_windows = 1 + max(0, int(max_sec * PANN_SR) - self.win) // self.hop
+        self._resample = _Resampler(in_sr)
+        self._buf = np.zeros(0, dtype=np.float32)   # 32k samples not yet consumed by a window start
+        self._consumed = 0                          # absolute 32k sample index of _buf[0]
+        self._probs: Optional[np.ndarray] = None    # [max_windows, C], first n_windows rows filled
+        self._n = 0
+        self._agg_probs: Optional[np.ndarray] = None  # aggregate of the filled rows, reset per window
+        self.done = False
+        self.reason: Optional[str] = None           # "confident" | "max_duration" | "end" | "empty" once done
+
+    @property
+    def n_windows(self) -> int:
+        return self._n
+
+    def push(self, chunk: np.ndarray) -> List[Dict[str, Any]]:
+        """Feed float32 mono samples at in_sr; returns one update per new window."""
+        if self.done:
+            return []
+        y = self._resample(np.asarray(chunk, dtype=np.float32).reshape(-1))
+        self._buf = np.concatenate([self._buf, y]) if self._buf.size else y.copy()
+        return self._drain()
+
+    def finish(self) -> Dict[str, Any]:
+        """End of recording: flush the resampler, score what is left, return the final update."""
+        if not self.done:
+            tail = self._resample(np.zeros(0, dtype=np.float32), last=True)
+            if tail.size:
+                self._buf = np.concatenate([self._buf, tail])
+            self._drain()
+            if not self._n and self._buf.size:
+                # shorter than one window: zero-pad, as offline inference does
+                self._score(np.pad(self._buf, (0, max(0, self.win - self._buf.size)))[None, :self.win])
+        if not self.done:
+            self.done = True
+            self.reason = "end" if self._n else "empty"
+        return self._update()
+
+    # ---- internals ----
+    def _drain(self) -> List[Dict[str, Any]]:
+        updates = []
+        while not self.done and self._buf.size >= self.win:
+            self._score(self._buf[None, :self.win])
+            self._buf = self._buf[self.hop:]
+            self._consumed += self.hop
+            conf = float(self._agg().max())
+            if self.exit_conf > 0 and conf >= self.exit_conf and self.n_windows >= self.min_windows:
+                self.done, self.reason = True, "confident"
+            elif self._n >= self.max_windows:
+                self.done, self.reason = True, "max_duration"
+            updates.append(self._update())
+        return updates
+
+    def _score(self, x: np.ndarray):
+        _, logits = self.pipeline.score_windows(np.ascontiguousarray(x))
+        p = torch.softmax(logits, dim=-1)[0].cpu().numpy()
+        if self._probs is None:
+            self._probs = np.zeros((self.max_windows, p.shape[0]), dtype=np.float32)
+        self._probs[self._n] = p
+        self._n += 1
+        self._agg_probs = None
+
+    def _agg(self) -> np.ndarray:
+        if self._agg_probs is None:
+            probs = self._probs[:self._n]
+            if self.pipeline.infer_cfg["mode"] == "windowed":
+                self._agg_probs = _aggregate_windows(probs, self.pipeline.infer_cfg)
+            else:
+                self._agg_probs = probs.mean(axis=0)  # clip-mode heads: plain mean over the live windows
+        return self._agg_probs
+
+    def _update(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "windows": self.n_windows,
+            "audio_sec": round((self._consumed + self._buf.size) / PANN_SR, 3),
+            "done": self.done,
+        }
+        if self.reason:
+            out["reason"] = self.reason
+        if not self._n:
+            return out
+        probs = self._agg()
+        order = np.argsort(probs)[::-1][:self.topk]
+        out.update(
+            species=self.idx_to_class[int(order[0])],
+            confidence=float(probs[order[0]]),
+            topk=[(self.idx_to_class[int(i)], float(probs[int(i)])) for i in order],
+        )
+        return out
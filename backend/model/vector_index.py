@@ -0,0 +1,419 @@
+# backend/model/vector_index.py
+# Persistent nearest-neighbour index over clip embeddings (CNN14, 2048-d, or
+# narrower from a reduced extractor) for "find similar recordings".
+#   - vectors: L2-normalised, float16, in a memory-mapped matrix (4 KiB/row,
+#     on disk; only re-ranked rows are read)
+#   - search: IVF-PQ. Spherical k-means centroids split the rows into lists;
+#     a query scans only the `nprobe` closest lists, scoring rows from 64-byte
+#     product-quantisation codes, then re-ranks the best candidates with the
+#     float16 vectors. Before the index is trained (few rows) it scans all
+#     float16 vectors, which is exact.
+#   - inserts are incremental and durable; re-adding an id replaces its vector
+#   - one index per extractor: from_env keys the directory by the extractor's
+#     identity (Pipeline.cache_ident), so vectors from different extractors
+#     never share an index; an index refuses to open for another extractor
+#
+# Layout of the index directory:
+#   meta.json       dim, capacity, pq_m, ident (the extractor the vectors came from)
+#   vectors.f16     float16 [capacity, dim]
+#   codes.u8        uint8 [capacity, pq_m] PQ codes
+#   assign.i32      int32 [capacity] IVF list per row (-1 = untrained)
+#   ids.txt         one id per row, appended last (a row exists once its id line does)
+#   centroids.npy   float32 [nlist, dim] IVF centroids, once trained
+#   pq.npy          float32 [pq_m, 256, dim / pq_m] PQ codebooks, once trained
+#
+#   python -m backend.model.vector_index stats --dir backend/vector_index/<key>
+#   python -m backend.model.vector_index train --dir backend/vector_index/<key> --nlist 1024
+#   python -m backend.model.vector_index bench --dir backend/vector_index/<key>
+# (<key>: the served extractor's directory, "dir" in GET /ml/index)
+
+from __future__ import annotations
+import argparse, array, hashlib, json, math, os, threading, time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_DIM = 2048
+PQ_CODES = 256   # centroids per sub-quantiser (one uint8 per sub-vector)
+
+
+def index_key(ident: str) -> str:
+    """Directory name for an extractor identity (see VectorIndex.from_env)."""
+    return hashlib.blake2b(ident.encode(), digest_size=6).hexdigest()
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    if x.ndim == 1:
+        x = x[None, :]
+    n = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.maximum(n, 1e-12)
+
+
+def _nearest(x: np.ndarray, cent: np.ndarray, spherical: bool, chunk: int = 8192) -> np.ndarray:
+    """Index of the closest centroid per row (max dot if spherical, else min L2)."""
+    bias = None if spherical else 0.5 * (cent * cent).sum(1)
+    out = np.empty(x.shape[0], dtype=np.int32)
+    for s in range(0, x.shape[0], chunk):
+        sc = x[s:s + chunk] @ cent.T
+        if bias is not None:
+            sc -= bias
+        out[s:s + chunk] = np.argmax(sc, axis=1)
+    return out
+
+
+def kmeans(x: np.ndarray, k: int, iters: int = 10, seed: int = 0, spherical: bool = False) -> np.ndarray:
+    """Centroids [k, dim]; spherical=True gives unit-norm centroids for cosine."""
+    rng = np.random.default_rng(seed)
+    cent = x[rng.choice(x.shape[0], size=k, replace=False)].copy()
+    for _ in range(iters):
+        assign = _nearest(x, cent, spherical)
+        order = np.argsort(assign, kind="stable")
+        a = assign[order]
+        starts = np.flatnonzero(np.r_[True, a[1:] != a[:-1]])
+        sums = np.zeros_like(cent)
+        sums[a[starts]] = np.add.reduceat(x[order], starts, axis=0)
+        counts = np.bincount(assign, minlength=k).astype(np.float32)
+        empty = counts == 0
+        if spherical:
+            cent = _normalize(sums)
+        else:
+            cent = sums / np.maximum(counts, 1)[:, None]
+        cent[empty] = x[rng.choice(x.shape[0], size=int(empty.sum()))]   # reseed empty clusters
+    return cent
+
+
+class VectorIndex:
+    def __init__(self, root: str, dim: Optional[int] = None, nprobe: int = 16, train_at: int = 5000,
+                 pq_m: int = 64, ident: Optional[str] = None):
+        """
+        dim: vector width (default: the stored one; DEFAULT_DIM for a new index).
+        ident: extractor identity; opening an index built from another extractor,
+        or with another dim, raises ValueError rather than mixing embeddings.
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.nprobe = max(1, int(nprobe))
+        self.train_at = int(train_at)   # auto-train once this many rows exist (0 = never)
+        self._lock = threading.Lock()
+
+        meta_path = self.root / "meta.json"
+        meta = (json.loads(meta_path.read_text()) if meta_path.is_file()
+                else {"dim": int(dim or DEFAULT_DIM), "capacity": 0, "ident": ident,
+                      "pq_m": math.gcd(int(dim or DEFAULT_DIM), int(pq_m))})   # sub-vectors must split dim
+        if ident is not None and meta.get("ident") not in (None, ident):
+            raise ValueError(f"Vector index at {self.root} holds embeddings from extractor "
+                             f"{meta['ident']!r}, not {ident!r}; re-index into a new directory.")
+        if dim is not None and int(meta["dim"]) != int(dim):
+            raise ValueError(f"Vector index at {self.root} holds {meta['dim']}-d vectors, not {dim}-d; "
+                             "re-index into a new directory.")
+        self.dim, self.pq_m = int(meta["dim"]), int(meta["pq_m"])
+        self.ident = meta.get("ident") or ident
+        if self.dim % self.pq_m:
+            raise ValueError(f"dim {self.dim} is not divisible by pq_m {self.pq_m}")
+        self._capacity = 0
+        self._row_ver = np.zeros(0, np.int64)   # bumped on every write to a row (see train)
+        self._grow(max(int(meta["capacity"]), 1024))
+
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        ids_path = self.root / "ids.txt"
+        if ids_path.is_file():
+            text = ids_path.read_text(encoding="utf-8")
+            if text and not text.endswith("\n"):       # torn final append: drop it
+                text = text[: text.rfind("\n") + 1]
+                ids_path.write_text(text, encoding="utf-8")
+            self._ids = text.splitlines()
+            self._rows = {rid: r for r, rid in enumerate(self._ids)}
+        self._ids_file = open(ids_path, "a", encoding="utf-8")
+
+        self._centroids: Optional[np.ndarray] = None
+        self._pq: Optional[np.ndarray] = None
+        self._lists: List[array.array] = []
+        if (self.root / "centroids.npy").is_file() and (self.root / "pq.npy").is_file():
+            self._centroids = np.load(self.root / "centroids.npy")
+            self._pq = np.load(self.root / "pq.npy")
+            self._build_lists()
+
+    @classmethod
+    def from_env(cls, default_dir: str, dim: Optional[int] = None, ident: Optional[str] = None) -> "VectorIndex":
+        """
+        FROGNET_INDEX_DIR, FROGNET_INDEX_NPROBE (default 16), FROGNET_INDEX_TRAIN_AT (default 5000).
+        With an extractor ident the index lives in a subdirectory keyed by it:
+        serving another extractor starts an empty index (rerun index_approved.py)
+        and switching back reopens the old one.
+        """
+        root = Path(os.getenv("FROGNET_INDEX_DIR", default_dir))
+        if ident is not None:
+            if (root / "meta.json").is_file():
+                print(f"[warn] ignoring the vector index directly under {root} (no extractor key); "
+                      "rerun index_approved.py to rebuild it")
+            root = root / index_key(ident)
+        return cls(str(root), dim=dim, ident=ident,
+                   nprobe=int(os.getenv("FROGNET_INDEX_NPROBE", "16")),
+                   train_at=int(os.getenv("FROGNET_INDEX_TRAIN_AT", "5000")))
+
+    # ---- public ----
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, rec_id: str) -> bool:
+        return rec_id in self._rows
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    def get(self, rec_id: str) -> Optional[np.ndarray]:
+        r = self._rows.get(rec_id)
+        return None if r is None else np.asarray(self._vectors[r], dtype=np.float32)
+
+    def add(self, rec_id: str, vec: np.ndarray):
+        self.add_many([rec_id], np.asarray(vec)[None, :])
+
+    def add_many(self, ids: Sequence[str], vecs: np.ndarray):
+        """Insert or replace vectors [n, dim]; durable when this returns."""
+        vecs = _normalize(vecs)
+        if vecs.shape != (len(ids), self.dim):
+            raise ValueError(f"Expected {len(ids)} x {self.dim} vectors, got {vecs.shape}")
+        for rid in ids:
+            if not rid or "\n" in rid:
+                raise ValueError(f"Invalid id {rid!r}")
+        with self._lock:
+            new = [rid for rid in dict.fromkeys(ids) if rid not in self._rows]
+            if len(self._ids) + len(new) > self._capacity:
+                self._grow(max(self._capacity * 2, len(self._ids) + len(new)))
+            rows, nxt = [], len(self._ids)
+            for rid in ids:
+                r = self._rows.get(rid)
+                if r is None:
+                    r = self._rows[rid] = nxt
+                    self._ids.append(rid)
+                    nxt += 1
+                rows.append(r)
+            rows = np.asarray(rows)
+            old = np.asarray(self._assign[rows])
+            self._vectors[rows] = vecs.astype(np.float16)
+            self._row_ver[rows] += 1
+            if self.trained:
+                new_assign = _nearest(vecs, self._centroids, spherical=True)
+                self._codes[rows] = self._pq_encode(vecs)
+            else:
+                new_assign = np.full(len(rows), -1, np.int32)
+            self._assign[rows] = new_assign
+            for mm in (self._vectors, self._codes, self._assign):
+                mm.flush()
+            # ids last: a row is only visible after a restart once its data is on disk
+            if new:
+                self._ids_file.write("".join(f"{rid}\n" for rid in new))
+                self._ids_file.flush()
+                os.fsync(self._ids_file.fileno())
+            if self.trained:
+                moves = dict(zip(rows.tolist(), zip(old.tolist(), new_assign.tolist())))
+                for r, (a_old, a_new) in moves.items():
+                    if a_old == a_new:
+                        continue
+                    if a_old >= 0 and r in self._lists[a_old]:
+                        self._lists[a_old].remove(r)
+                    self._lists[a_new].append(r)
+        if not self.trained and self.train_at and len(self) >= self.train_at:
+            self.train()
+
+    def search(self, query: np.ndarray, k: int = 10, nprobe: Optional[int] = None,
+               exclude: Iterable[str] = (), rerank: int = 0) -> List[Tuple[str, float]]:
+        """
+        Top-k [(id, cosine distance)] for one query vector, nearest first.
+        rerank: candidates re-scored exactly after the PQ pass (default 16 x k, min 256).
+        """
+        q = _normalize(query)[0]
+        exclude = set(exclude)
+        want = k + len(exclude)
+        with self._lock:
+            n, ids = len(self._ids), self._ids
+            vectors, codes, cent, pq = self._vectors, self._codes, self._centroids, self._pq
+            if cent is not None:
+                order = np.argsort(-(cent @ q))[: (nprobe or self.nprobe)]
+                cand = np.concatenate([np.frombuffer(self._lists[c], dtype=np.int32) for c in order]
+                                      + [np.empty(0, np.int32)])
+        if n == 0:
+            return []
+
+        if cent is None:   # exact scan in chunks
+            scores, rows = np.empty(0, np.float32), np.empty(0, np.int64)
+            for s in range(0, n, 65536):
+                sc = np.asarray(vectors[s:min(n, s + 65536)], dtype=np.float32) @ q
+                scores = np.concatenate([scores, sc])
+                rows = np.concatenate([rows, np.arange(s, s + sc.size)])
+                if scores.size > want:
+                    keep = np.argpartition(-scores, want)[:want]
+                    scores, rows = scores[keep], rows[keep]
+        else:
+            # PQ pass: per sub-vector lookup table of <q_j, codeword>, summed over sub-vectors
+            cand = np.sort(cand)
+            lut = np.einsum("md,mkd->mk", q.reshape(self.pq_m, -1), pq).ravel()
+            offs = np.arange(self.pq_m, dtype=np.int32) * PQ_CODES
+            approx = np.take(lut, codes[cand].astype(np.int32) + offs).sum(axis=1)
+            r = rerank or max(16 * want, 256)
+            if approx.size > r:
+                cand = np.sort(cand[np.argpartition(-approx, r)[:r]])
+            rows = cand
+            scores = np.asarray(vectors[rows], dtype=np.float32) @ q if rows.size else np.empty(0, np.float32)
+
+        out = []
+        for i in np.argsort(-scores):
+            rid = ids[int(rows[i])]
+            if rid in exclude:
+                continue
+            out.append((rid, round(float(1.0 - scores[i]), 6)))
+            if len(out) >= k:
+                break
+        return out
+
+    def train(self, nlist: Optional[int] = None, sample: int = 20000, iters: int = 10, seed: int = 0):
+        """
+        (Re)build IVF lists and PQ codebooks from a sample, then assign and
+        encode every row. Inserts continue meanwhile: rows added or replaced
+        after the snapshot are encoded again from their current vector.
+        """
+        t0 = time.perf_counter()
+        with self._lock:
+            n = len(self._ids)
+            if n == 0:
+                return
+            nlist = min(n, int(nlist or max(1, min(4096, round(math.sqrt(n))))))
+            rng = np.random.default_rng(seed)
+            pick = np.sort(rng.choice(n, size=min(n, max(sample, nlist)), replace=False))
+            x = np.asarray(self._vectors[pick], dtype=np.float32)
+            ver = self._row_ver[:n].copy()
+        cent = kmeans(x, nlist, iters, seed, spherical=True)
+        sub = x.reshape(x.shape[0], self.pq_m, -1)
+        k_pq = min(PQ_CODES, x.shape[0])
+        pq = np.zeros((self.pq_m, PQ_CODES, sub.shape[2]), dtype=np.float32)
+        for j in range(self.pq_m):
+            pq[j, :k_pq] = kmeans(np.ascontiguousarray(sub[:, j]), k_pq, iters, seed + j)
+        del x, sub
+
+        def encode(lo, hi):
+            chunk = np.asarray(self._vectors[lo:hi], dtype=np.float32)
+            return _nearest(chunk, cent, spherical=True), self._pq_encode(chunk, pq)
+
+        assign = np.empty(n, dtype=np.int32)
+        codes = np.empty((n, self.pq_m), dtype=np.uint8)
+        for s in range(0, n, 16384):
+            e = min(n, s + 16384)
+            assign[s:e], codes[s:e] = encode(s, e)
+        with self._lock:
+            m = len(self._ids)   # rows added while training are encoded now
+            self._assign[:n], self._codes[:n] = assign, codes
+            if m > n:
+                self._assign[n:m], self._codes[n:m] = encode(n, m)
+            stale = np.flatnonzero(self._row_ver[:n] != ver)   # replaced while training
+            if stale.size:
+                chunk = np.asarray(self._vectors[stale], dtype=np.float32)
+                self._assign[stale] = _nearest(chunk, cent, spherical=True)
+                self._codes[stale] = self._pq_encode(chunk, pq)
+            self._assign.flush()
+            self._codes.flush()
+            for name, arr in (("centroids", cent), ("pq", pq)):
+                tmp = self.root / f"{name}.tmp.npy"
+                np.save(tmp, arr)
+                os.replace(tmp, self.root / f"{name}.npy")
+            self._centroids, self._pq = cent, pq
+            self._build_lists()
+        print(f"[info] vector index trained: {n} rows, {nlist} lists, "
+              f"PQ {self.pq_m}x{k_pq} in {time.perf_counter() - t0:.1f}s")
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "vectors": len(self),
+            "dim": self.dim,
+            "ident": self.ident,
+            "dir": str(self.root),
+            "trained": self.trained,
+            "nlist": 0 if self._centroids is None else int(self._centroids.shape[0]),
+            "nprobe": self.nprobe,
+            "pq_bytes_per_vector": self.pq_m,
+            "disk_mb": round(self._capacity * (self.dim * 2 + self.pq_m + 4) / (1 << 20), 1),
+        }
+
+    def close(self):
+        with self._lock:
+            self._ids_file.close()
+
+    # ---- internals ----
+    def _grow(self, capacity: int):
+        """(Re)map the data files at a larger capacity; existing rows are kept."""
+        for attr, name, dtype, width, fill in (("_vectors", "vectors.f16", np.float16, self.dim, 0),
+                                               ("_codes", "codes.u8", np.uint8, self.pq_m, 0),
+                                               ("_assign", "assign.i32", np.int32, 1, -1)):
+            path = self.root / name
+            row_bytes = width * np.dtype(dtype).itemsize
+            with open(path, "ab") as f:
+                have = f.tell() // row_bytes
+                if have < capacity:
+                    f.truncate(capacity * row_bytes)
+            shape = (capacity, width) if width > 1 else (capacity,)
+            mm = np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+            if fill and have < capacity:
+                mm[have:] = fill
+            setattr(self, attr, mm)
+        ver = np.zeros(capacity, np.int64)
+        ver[:self._row_ver.size] = self._row_ver[:capacity]
+        self._row_ver = ver
+        self._capacity = capacity
+        tmp = self.root / "meta.json.tmp"
+        tmp.write_text(json.dumps({"dim": self.dim, "capacity": capacity, "pq_m": self.pq_m, "ident": self.ident}))
+        os.replace(tmp, self.root / "meta.json")
+
+    def _pq_encode(self, vecs: np.ndarray, pq: Optional[np.ndarray] = None) -> np.ndarray:
+        pq = self._pq if pq is None else pq
+        sub = vecs.reshape(vecs.shape[0], self.pq_m, -1)
+        codes = np.empty((vecs.shape[0], self.pq_m), dtype=np.uint8)
+        for j in range(self.pq_m):
+            codes[:, j] = _nearest(np.ascontiguousarray(sub[:, j]), pq[j], spherical=False)
+        return codes
+
+    def _build_lists(self):
+        """Inverted lists from the per-row assignments."""
+        a = np.asarray(self._assign[:len(self._ids)])
+        order = np.argsort(a, kind="stable")
+        bounds = np.searchsorted(a[order], np.arange(self._centroids.shape[0] + 1))
+        rows = order.astype(np.int32)
+        self._lists = [array.array("i", rows[bounds[c]:bounds[c + 1]].tobytes())
+                       for c in range(self._centroids.shape[0])]
+
+
+# ---- CLI ----
+def main():
+    ap = argparse.ArgumentParser(description="Recording embedding index maintenance.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("stats", "train", "bench"):
+        p = sub.add_parser(name)
+        p.add_argument("--dir", required=True, help="Index directory")
+    sub.choices["train"].add_argument("--nlist", type=int, default=None, help="IVF lists (default sqrt(N))")
+    sub.choices["bench"].add_argument("--queries", type=int, default=100)
+    sub.choices["bench"].add_argument("--nprobe", type=int, default=None)
+    args = ap.parse_args()
+
+    index = VectorIndex(args.dir, train_at=0)
+    if args.cmd == "train":
+        index.train(nlist=args.nlist)
+    elif args.cmd == "bench" and len(index):
+        rng = np.random.default_rng(0)
+        ids = [index._ids[i] for i in rng.choice(len(index._ids), size=min(args.queries, len(index)), replace=False)]
+        ms, recall = [], []
+        for rid in ids:
+            q = index.get(rid)
+            t0 = time.perf_counter()
+            got = index.search(q, k=10, nprobe=args.nprobe)
+            ms.append((time.perf_counter() - t0) * 1000.0)
+            recall.append(bool(got) and got[0][0] == rid)
+        print(f"[bench] {len(ids)} queries: p50 {np.percentile(ms, 50):.2f} ms, "
+              f"p90 {np.percentile(ms, 90):.2f} ms, self-recall@1 {np.mean(recall):.3f}")
+    print(json.dumps(index.snapshot(), indent=2))
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
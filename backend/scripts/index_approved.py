@@ -0,0 +1,39 @@
+# backend/scripts/index_approved.py
+# Queue every approved recording that is not in the similar-recordings index
+# yet (e.g. approved before the index existed). The scoring workers do the
+# embedding; rerunning only queues what is still missing.
+#
+#   python -m backend.scripts.index_approved [--limit 1000] [--train]
+from __future__ import annotations
+
+import argparse
+
+from backend.app.routes.ml_runtime import get_vector_index
+from backend.app.scoring_jobs import enqueue_indexing
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Queue approved recordings for the vector index.")
+    ap.add_argument("--limit", type=int, default=0, help="Stop after queueing this many (0 = all)")
+    ap.add_argument("--train", action="store_true", help="Retrain the IVF lists now (after a large backfill)")
+    args = ap.parse_args()
+
+    index = get_vector_index()
+    if args.train:
+        index.train()
+        return
+
+    from backend import firebase
+    queued = skipped = 0
+    for doc in firebase.db.collection("recordings").where("status", "==", "approved").stream():
+        if doc.id in index:
+            skipped += 1
+            continue
+        queued += enqueue_indexing(doc.id, doc.to_dict() or {})
+        if args.limit and queued >= args.limit:
+            break
+    print(f"[done] queued {queued}, already indexed {skipped}, index size {len(index)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+# backend/scripts/rescore_recordings.py
+# Re-score every recording in Firestore `recordings` with a given head.
+#
+#   python -m backend.scripts.rescore_recordings --model-version 1.2.0 \
+#       --ckpt /models/1.2.0 --procs 4 --fetchers 16
+#
+# - pages through the collection by document id (cursor = last doc id)
+# - skips docs already scored with --model-version (unless --force)
+# - downloads audio with a bounded pool of fetcher threads
+# - decodes + embeds in large batches in --procs worker processes
+# - writes results back in Firestore batches
+# - checkpoints the cursor after every page: rerun the same command to resume
+# - records the ids of recordings that failed (fetch / decode / no audio):
+#   --retry-failed re-scores just those; --force starts the whole run over
+from __future__ import annotations
+
+import argparse, json, os, sys, tempfile, time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+import multiprocessing as mp
+
+from backend.app.scoring_jobs import (fetch_audio, rejected_fields, result_fields, source_for_recording,
+                                      write_results)
+
+# ---- worker processes ----
+_w = {}
+
+
+def _init_worker(ckpt: str, weights: str | None, threads: int):
+    import torch
+    torch.set_num_threads(max(1, threads))
+    from backend.model import Predictor as P
+    model, _, idx_to_class = P.from_pretrained(ckpt, filename=weights)
+    _w.update(P=P, model=model, idx_to_class=idx_to_class)
+
+
+def _score_chunk(items, topk: int):
+    """
+    [(rec_id, name, bytes)] -> [(rec_id, result | RejectedClip | error str)];
+    decode errors stay per item.
+    """
+    P = _w["P"]
+    out, ok = [], []
+    for rec_id, name, data in items:
+        try:
+            y = P.decode_audio(data, P.PANN_SR)
+            if y.size == 0:
+                raise ValueError("Decoded audio is empty.")
+            ok.append((rec_id, y, data))
+        except Exception as e:
+            out.append((rec_id, f"{type(e).__name__}: {e}"))
+    if ok:
+        results = P.predict_waves([y for _, y, _ in ok], _w["model"], _w["idx_to_class"], topk=topk)
+        # Clips the activity gate / frog check reject come back as RejectedClip: kept as such
+        out += [(rec_id, f"{type(res).__name__}: {res}"
+                 if isinstance(res, Exception) and not isinstance(res, P.RejectedClip) else res)
+                for (rec_id, _, _), res in zip(ok, results)]
+    return out
+
+
+# ---- checkpoint ----
+def _load_checkpoint(path: Path, version: str, fresh: bool = False) -> dict:
+    """The saved run for `version`, or a new one (always new when fresh)."""
+    if path.is_file() and not fresh:
+        ck = json.loads(path.read_text())
+        if ck.get("model_version") == version:
+            ck.setdefault("failed_ids", {})
+            return ck
+        print(f"[warn] {path} is for model version {ck.get('model_version')!r}; starting over")
+    return {"model_version": version, "last_doc_id": None, "seen": 0, "scored": 0, "rejected": 0,
+            "skipped": 0, "failed": 0, "failed_ids": {}, "elapsed_sec": 0.0, "done": False}
+
+
+def _record_failures(ck: dict, done_ids, failed: dict):
+    """Forget ids that now scored or were rejected, remember the ones that failed."""
+    for rec_id in done_ids:
+        ck["failed_ids"].pop(rec_id, None)
+    ck["failed_ids"].update({rec_id: err[:200] for rec_id, err in failed.items()})
+    ck["failed"] = len(ck["failed_ids"])
+
+
+def _save_checkpoint(path: Path, ck: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(ck, f, indent=2)
+    os.replace(tmp, path)
+
+
+# ---- main loop ----
+def _pages(db, page_size: int, after: str | None):
+    from google.cloud.firestore_v1.field_path import FieldPath
+    col = db.collection("recordings")
+    q = col.order_by(FieldPath.document_id()).limit(page_size)
+    cursor = col.document(after) if after else None
+    while True:
+        page = list((q.start_after({FieldPath.document_id(): cursor}) if cursor else q).stream())
+        if not page:
+            return
+        yield page
+        cursor = page[-1].reference
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Resumable bulk re-scoring of Firestore recordings.")
+    ap.add_argument("--model-version", required=True, help="Written as predictionModelVersion; docs already at it are skipped")
+    ap.add_argument("--ckpt", default=str(Path(__file__).resolve().parents[1] / "model"),
+                    help="Checkpoint / registry version dir with config.json, class_to_idx.json, head weights")
+    ap.add_argument("--weights", default=None, help="Head weights filename inside --ckpt")
+    ap.add_argument("--procs", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="Scoring processes")
+    ap.add_argument("--threads-per-proc", type=int, default=0, help="Torch threads per process (default cores // procs)")
+    ap.add_argument("--fetchers", type=int, default=16, help="Concurrent audio downloads")
+    ap.add_argument("--page-size", type=int, default=500)
+    ap.add_argument("--batch", type=int, default=32, help="Clips per scoring task")
+    ap.add_argument("--topk", type=int, default=3)
+    ap.add_argument("--checkpoint", default=None, help="Cursor file (default backend/rescore_<version>.json)")
+    ap.add_argument("--limit", type=int, default=0, help="Stop after this many recordings (0 = all)")
+    ap.add_argument("--force", action="store_true",
+                    help="Start over: ignore the checkpoint and re-score docs already at --model-version")
+    ap.add_argument("--retry-failed", action="store_true",
+                    help="Only re-score the recordings the checkpoint lists as failed")
+    ap.add_argument("--dry-run", action="store_true", help="Score but do not write to Firestore")
+    args = ap.parse_args()
+
+    from backend import firebase
+    bucket = firebase.storage.bucket().name
+    ck_path = Path(args.checkpoint or Path(__file__).resolve().parents[1] / f"rescore_{args.model_version}.json")
+    ck = _load_checkpoint(ck_path, args.model_version, fresh=args.force)
+    if args.retry_failed and not ck["failed_ids"]:
+        print(f"[done] {ck_path} lists no failed recordings")
+        return
+    if ck["done"] and not args.retry_failed:
+        print(f"[done] {ck_path} says this version finished ({ck['scored']} scored, {ck['failed']} failed); "
+              "use --retry-failed for the failures or --force to run again")
+        return
+    if ck["last_doc_id"] and not args.retry_failed:
+        print(f"[resume] after {ck['last_doc_id']} ({ck['seen']} seen, {ck['scored']} scored so far)")
+
+    threads = args.threads_per_proc or max(1, (os.cpu_count() or 1) // args.procs)
+    procs = ProcessPoolExecutor(max_workers=args.procs, mp_context=mp.get_context("spawn"),
+                                initializer=_init_worker, initargs=(args.ckpt, args.weights, threads))
+    fetchers = ThreadPoolExecutor(max_workers=args.fetchers, thread_name_prefix="rescore-fetch")
+    t_run = time.perf_counter()
+    run_scored = 0
+
+    def fetch(rec_id, src):
+        try:
+            name, data = fetch_audio(src)
+            return rec_id, name, data, None
+        except Exception as e:
+            return rec_id, None, None, f"{type(e).__name__}: {e}"
+
+    def score_docs(docs, retry=False):
+        """
+        Fetch, score and write one page of docs -> (ids written or skipped,
+        n_ok, n_rejected, failed {id: error}).
+        """
+        todo, failed, done_ids = [], {}, []
+        for doc in docs:
+            data = doc.to_dict() or {}
+            if not args.force and data.get("predictionModelVersion") == args.model_version:
+                ck["skipped"] += 0 if retry else 1
+                done_ids.append(doc.id)
+                continue
+            src = source_for_recording(data, bucket)
+            if src is None:
+                failed[doc.id] = "no audio source"
+            else:
+                todo.append((doc.id, src))
+
+        # Bounded concurrent downloads feed scoring tasks of --batch clips
+        chunk, tasks = [], []
+        for fut in as_completed([fetchers.submit(fetch, rec_id, src) for rec_id, src in todo]):
+            rec_id, name, data, err = fut.result()
+            if err is not None:
+                failed[rec_id] = err
+                continue
+            chunk.append((rec_id, name, data))
+            if len(chunk) >= args.batch:
+                tasks.append(procs.submit(_score_chunk, chunk, args.topk))
+                chunk = []
+        if chunk:
+            tasks.append(procs.submit(_score_chunk, chunk, args.topk))
+
+        updates, n_rejected = [], 0
+        for t in tasks:
+            for rec_id, res in t.result():
+                if isinstance(res, str):
+                    failed[rec_id] = res
+                elif isinstance(res, Exception):   # rejected: same fields as the live workers write
+                    updates.append((rec_id, rejected_fields(res, args.model_version)))
+                    n_rejected += 1
+                else:
+                    updates.append((rec_id, result_fields(res, args.model_version)))
+        done_ids += [rec_id for rec_id, _ in updates]
+        n_ok = len(updates) - n_rejected
+        updates += [(rec_id, {"analysisStatus": "failed", "analysisError": err[:500]})
+                    for rec_id, err in failed.items()]
+        if updates and not args.dry_run:
+            write_results(updates)
+        return done_ids, n_ok, n_rejected, failed
+
+    def finish_page(t_page, n_docs, done_ids, n_ok, n_rejected, failed, **cursor):
+        nonlocal run_scored
+        run_scored += n_ok
+        _record_failures(ck, done_ids, failed)
+        ck.update(**cursor, scored=ck["scored"] + n_ok, rejected=ck.get("rejected", 0) + n_rejected,
+                  elapsed_sec=round(ck["elapsed_sec"] + time.perf_counter() - t_page, 1))
+        _save_checkpoint(ck_path, ck)
+        rate = run_scored / max(1e-9, time.perf_counter() - t_run)
+        print(f"[page] {n_docs} docs: {n_ok} scored, {n_rejected} rejected, {len(failed)} failed | "
+              f"total {ck['scored']} scored, {ck['skipped']} skipped | {rate:.1f} rec/s")
+
+    try:
+        if args.retry_failed:
+            col = firebase.db.collection("recordings")
+            ids = list(ck["failed_ids"])
+            for lo in range(0, len(ids), args.page_size):
+                t_page = time.perf_counter()
+                docs = [col.document(rec_id).get() for rec_id in ids[lo:lo + args.page_size]]
+                gone = [d.id for d in docs if not d.exists]   # deleted since: nothing to retry
+                done_ids, n_ok, n_rejected, failed = score_docs([d for d in docs if d.exists], retry=True)
+                finish_page(t_page, len(docs), done_ids + gone, n_ok, n_rejected, failed)
+        else:
+            for page in _pages(firebase.db, args.page_size, ck["last_doc_id"]):
+                t_page = time.perf_counter()
+                finish_page(t_page, len(page), *score_docs(page),
+                            last_doc_id=page[-1].id, seen=ck["seen"] + len(page))
+                if args.limit and ck["seen"] >= args.limit:
+                    print(f"[stop] --limit {args.limit} reached; rerun to continue")
+                    return
+            ck["done"] = True
+            _save_checkpoint(ck_path, ck)
+    finally:
+        fetchers.shutdown(wait=False, cancel_futures=True)
+        procs.shutdown(wait=True, cancel_futures=True)
+
+    total = time.perf_counter() - t_run
+    print(f"[done] {ck['scored']} scored, {ck.get('rejected', 0)} rejected, {ck['skipped']} skipped, "
+          f"{ck['failed']} failed{' (--retry-failed to retry)' if ck['failed'] else ''}; "
+          f"this run {run_scored} in {total:.1f}s ({run_scored / max(1e-9, total):.1f} rec/s)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,17 @@
-import sys
+import os, sys
+from pathlib import Path
 from Predictor import from_pretrained, predict_one
 
 # Main functionality for predictor
 
 if __name__ == "__main__":
-    checkpt = r"C:\Users\vnitu\Downloads\checkpoints\frognet-v1" #get checkpoint 
+    if len(sys.argv) < 2:
+        sys.exit("usage: python RunPredict.py <file.wav> [checkpoint_dir]")
+    # checkpoint dir: 2nd argument, else FROGNET_CKPT, else this folder
+    checkpt = sys.argv[2] if len(sys.argv) > 2 else os.getenv("FROGNET_CKPT", str(Path(__file__).resolve().parent))
     wav  = sys.argv[1]  #take .wav path as argument
     model, preprocess, idx_to_class = from_pretrained(checkpt)
-    name, conf, top3 = predict_one(wav, model, preprocess, idx_to_class)\
+    name, conf, top3 = predict_one(wav, model, preprocess, idx_to_class)
     #display top 3 predictions and confidence scores
     print(f"Prediction: {name} (confidence: {conf:.3f})")
     print("Top-3:", top3)
\ No newline at end of file
@@ -0,0 +1,64 @@
+# tests/test_batch_predict.py
+# BatchPredict over a small folder tree with the fake-extractor pipeline: results
+# table, per-file decode errors, and manifest-based resume.
+
+import csv
+import os
+
+import numpy as np
+import soundfile as sf
+
+from backend.model import Predictor as P
+from backend.model.BatchPredict import Manifest, ResultWriter, run_batch
+from backend.model.StreamDetect import _inputs
+from tests.test_predictor import make_pipeline
+
+CLASSES = {0: "a", 1: "b", 2: "c"}
+
+
+def _run(pipe, root, out, manifest):
+    writer, man = ResultWriter(str(out)), Manifest(str(manifest), "m1")
+    try:
+        return run_batch(pipe, CLASSES, _inputs([str(root)]), writer, man, batch=2)
+    finally:
+        writer.close()
+        man.close()
+
+
+def test_batch_predict_scores_tree_and_resumes(tmp_path):
+    root = tmp_path / "rec"
+    (root / "site").mkdir(parents=True)
+    rng = np.random.default_rng(0)
+    for i, sr in enumerate((32000, 44100, 16000)):
+        sf.write(root / "site" / f"c{i}.wav", 0.1 * rng.standard_normal(sr * 2).astype(np.float32), sr)
+    (root / "broken.wav").write_bytes(b"not audio")
+    pipe = make_pipeline()
+    pipe.infer_cfg = P._inference_cfg({"inference": {"mode": "windowed"}})   # windows of a batch form one stack
+    out, manifest = tmp_path / "res.csv", tmp_path / "res.jsonl"
+
+    st = _run(pipe, root, out, manifest)
+    rows = list(csv.DictReader(open(out)))
+    assert (st["ok"], st["failed"], st["skipped"]) == (3, 1, 0)
+    assert {r["status"] for r in rows if r["file"].endswith("broken.wav")} == {"failed"}
+    assert all(r["species"] in CLASSES.values() for r in rows if r["status"] == "ok")
+    assert max(c[0] for c in pipe.extractor.calls) == 2                  # --batch clips (one window each) per pass
+
+    # rerun: scored files are skipped, the failed one is retried
+    st = _run(pipe, root, out, manifest)
+    assert (st["ok"], st["failed"], st["skipped"]) == (0, 1, 3)
+
+    # a file changed on disk is scored again
+    changed = root / "site" / "c0.wav"
+    os.utime(changed, ns=(changed.stat().st_atime_ns, changed.stat().st_mtime_ns + 10**9))
+    st = _run(pipe, root, out, manifest)
+    assert (st["ok"], st["failed"], st["skipped"]) == (1, 1, 2)
+    rows = list(csv.DictReader(open(out)))
+    assert len(rows) == 4 and len({r["file"] for r in rows}) == 4         # rescored rows replace, not append
+    assert {r["model"] for r in rows} == {"m1"}
+
+    # --force: a new table, not a second copy of every row
+    ResultWriter(str(out), truncate=True).close()
+    manifest.unlink()
+    st = _run(pipe, root, out, manifest)
+    assert (st["ok"], st["failed"], st["skipped"]) == (3, 1, 0)
+    assert len(list(csv.DictReader(open(out)))) == 4
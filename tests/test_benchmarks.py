@@ -0,0 +1,17 @@
+# tests/test_benchmarks.py
+# Regression flagging in backend/benchmarks/predictor_bench.py --compare.
+
+from backend.benchmarks.predictor_bench import compare
+
+
+def test_compare_flags_slowdowns_in_the_right_direction():
+    base = {"metrics": {"embed.10s.p50_ms": 100.0, "head.b32.rows_per_s": 5000.0,
+                        "rss.peak_mb": 800.0, "predict.x.p50_ms": 50.0, "only.base_ms": 1.0}}
+    new = {"metrics": {"embed.10s.p50_ms": 125.0, "head.b32.rows_per_s": 4000.0,
+                       "rss.peak_mb": 600.0, "predict.x.p50_ms": 54.0, "only.new_ms": 1.0}}
+    rows = {r["metric"]: r for r in compare(base, new, threshold=0.10)}
+    assert set(rows) == {"embed.10s.p50_ms", "head.b32.rows_per_s", "rss.peak_mb", "predict.x.p50_ms"}
+    assert rows["embed.10s.p50_ms"]["regression"]        # +25 % latency
+    assert rows["head.b32.rows_per_s"]["regression"]     # -20 % throughput
+    assert not rows["rss.peak_mb"]["regression"]         # got smaller
+    assert not rows["predict.x.p50_ms"]["regression"]    # +8 %, under threshold
@@ -0,0 +1,108 @@
+# tests/test_cascade.py
+# Cascade pre-screen: student answers vs escalation to CNN14, the threshold
+# sweep / pick of DistillCascade, and the student files next to the head.
+
+import io
+
+import numpy as np
+import soundfile as sf
+import torch
+
+from backend.model import Predictor as P
+from backend.model.DistillCascade import distill, pick, sweep
+from backend.model.cascade import Cascade, load_cascade, save_student, student_input
+from backend.model.frognet import FrogNet
+from tests.test_predictor import make_pipeline
+
+CLASSES = {0: "a", 1: "b", 2: "c"}
+
+
+def _wav_bytes(y):
+    buf = io.BytesIO()
+    sf.write(buf, y, P.PANN_SR, format="WAV", subtype="FLOAT")
+    return buf.getvalue()
+
+
+def _waves(n, seconds=2.0):
+    rng = np.random.default_rng(0)
+    return [(0.1 * rng.standard_normal(int(seconds * P.PANN_SR))).astype(np.float32) for _ in range(n)]
+
+
+def test_student_input_shape_and_range():
+    x = student_input(_waves(2, 1.0) + [np.zeros(500, np.float32)])
+    assert x.shape == (3, 1, 64, 64)
+    assert float(x.min()) >= -1.0 and float(x.max()) <= 1.0
+
+
+def test_cascade_accepts_or_escalates():
+    waves = _waves(4)
+    plain = make_pipeline()
+    expected = P.predict_waves(waves, plain, CLASSES)
+
+    torch.manual_seed(0)
+    pipe = make_pipeline()
+    pipe.enable_cascade(Cascade(FrogNet(3), min_conf=0.0))
+    t = {}
+    with P.trace_stages(t):
+        out = P.predict_waves(waves, pipe, CLASSES)
+    assert pipe.extractor.calls == [] and t["cascade_clips"] == 4 and t["cascade_escalated"] == 0
+    student = pipe.cascade.probs(waves)
+    assert [o[0] for o in out] == [CLASSES[int(i)] for i in student.argmax(axis=1)]
+
+    pipe.cascade.min_conf = 1.01                      # nothing is confident enough: all go to CNN14
+    t = {}
+    with P.trace_stages(t):
+        out = P.predict_waves(waves, pipe, CLASSES)
+    t1 = {}
+    one = P.predict_one(_wav_bytes(waves[0]), pipe, None, CLASSES, timings=t1)   # forward(): decoded once, then CNN14
+    assert t["cascade_escalated"] == 4 and t1["cascade_escalated"] == 1 and "student" in t1
+    assert [(o[0], round(o[1], 5)) for o in out] == [(e[0], round(e[1], 5)) for e in expected]
+    assert one[0] == expected[0][0]
+
+
+def test_cascade_runs_activity_gate_first_and_defers_to_frog_check():
+    t = np.arange(2 * P.PANN_SR) / P.PANN_SR
+    calls = (0.1 * np.sin(2 * np.pi * 1000 * t) * (t > 1.0)).astype(np.float32)
+    waves = [np.zeros_like(calls), calls]
+    torch.manual_seed(0)
+    pipe = make_pipeline()
+    pipe.infer_cfg.update(gate=True, mode="clip")
+    pipe.enable_cascade(Cascade(FrogNet(3), min_conf=0.0))   # the student would answer everything
+
+    st = {}
+    with P.trace_stages(st):
+        out = P.predict_waves(waves, pipe, CLASSES)
+    assert isinstance(out[0], P.NoActivityError) and out[1][0] in CLASSES.values()
+    assert st["cascade_clips"] == 1 and st["cascade_escalated"] == 0 and pipe.extractor.calls == []
+
+    pipe.infer_cfg.update(frog_gate=True, frog_gate_reject=True)   # only CNN14 can answer "is it a frog"
+    st = {}
+    with P.trace_stages(st):
+        P.predict_waves(waves, pipe, CLASSES)
+    assert "student" not in st and st["cascade_clips"] == 1 and st["cascade_escalated"] == 1
+    assert len(pipe.extractor.calls) == 1
+
+
+def test_sweep_and_pick():
+    teacher = np.array([[0.9, 0.1], [0.2, 0.8], [0.7, 0.3], [0.4, 0.6]])
+    student = np.array([[0.95, 0.05], [0.6, 0.4], [0.99, 0.01], [0.55, 0.45]])
+    truth = np.array([0, 1, 0, -1])                   # last clip unlabelled: teacher top-1 is the reference
+    rows = sweep(student, teacher, truth, confs=(0.5, 0.9), margins=(0.0,), student_ms=1.0, teacher_ms=10.0)
+    loose, strict = rows
+    assert loose["escalation"] == 0.0 and loose["accuracy_loss"] == 0.5      # student wrong on clips 1 and 3
+    assert strict["escalation"] == 0.5 and strict["accuracy_loss"] == 0.0
+    assert strict["est_speedup"] == round(10.0 / (1.0 + 0.5 * 10.0), 2)
+    assert pick(rows, max_loss=0.01) is strict and pick(rows, max_loss=0.5) is loose
+
+
+def test_distill_and_student_files(tmp_path):
+    x = student_input(_waves(8, 1.0))
+    soft = np.tile(np.array([[0.8, 0.1, 0.1]], np.float32), (8, 1))
+    student = distill(x, soft, np.full(8, -1), 3, epochs=15, lr=3e-3)
+    assert (student(x).argmax(dim=1) == 0).all()
+
+    save_student(str(tmp_path), student, {"num_classes": 3, "teacher": "head.pth", "min_conf": 0.7, "min_margin": 0.1})
+    cascade = load_cascade(str(tmp_path), "head.pth")
+    assert (cascade.min_conf, cascade.min_margin) == (0.7, 0.1)
+    assert torch.allclose(cascade.student(x), student(x))
+    assert load_cascade(str(tmp_path), "other_head.pth") is None      # distilled from a different head
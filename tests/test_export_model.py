@@ -0,0 +1,55 @@
+# tests/test_export_model.py
+# ExportModel artifacts round-trip through Predictor._load_backend and serve
+# the same predictions as the eager random-init CNN14 they came from.
+
+import numpy as np
+import pytest
+import torch
+
+from backend.benchmarks.predictor_bench import _random_cnn14
+from backend.model import Predictor as P
+from backend.model.ExportModel import compare_backends, export_artifacts, load_reference_clips
+
+
+@pytest.fixture(scope="module")
+def eager():
+    torch.manual_seed(0)
+    head = P.HeadMLP_TypeA(3).eval()
+    return P.Pipeline(_random_cnn14(), head, infer_cfg={"mode": "clip"})
+
+
+def test_torchscript_export_matches_eager(eager, tmp_path):
+    written = export_artifacts(eager.extractor, eager.head, tmp_path, ["torchscript"])
+    assert written == {"torchscript": list(P.BACKEND_ARTIFACTS["torchscript"])}
+
+    extractor, head = P._load_backend("torchscript", tmp_path)
+    assert head is not None
+    pipe = P.Pipeline(extractor, head, infer_cfg=eager.infer_cfg)
+    y = (0.1 * np.random.default_rng(0).standard_normal(3 * P.PANN_SR)).astype(np.float32)
+    emb, logits = pipe.score_wave(y)
+    ref_emb, ref_logits = eager.score_wave(y)
+    assert torch.allclose(emb, ref_emb, atol=1e-4)
+    assert torch.allclose(logits, ref_logits, atol=1e-4)
+
+    report = compare_backends(eager, tmp_path, ["torchscript"], load_reference_clips(None, 2, 2.0))
+    assert report["torchscript"]["top1_agreement"] == 1.0
+    assert report["torchscript"]["min_embedding_cosine"] > 0.9999
+
+
+def test_onnx_export_matches_eager(eager, tmp_path):
+    pytest.importorskip("onnxruntime")
+    export_artifacts(eager.extractor, eager.head, tmp_path, ["onnx"])
+    extractor, head = P._load_backend("onnx", tmp_path)
+    pipe = P.Pipeline(extractor, head, infer_cfg=eager.infer_cfg)
+    y = (0.1 * np.random.default_rng(1).standard_normal(3 * P.PANN_SR)).astype(np.float32)
+    emb, logits = pipe.score_wave(y)
+    ref_emb, ref_logits = eager.score_wave(y)
+    assert torch.nn.functional.cosine_similarity(emb, ref_emb).min() > 0.9999
+    assert torch.allclose(logits, ref_logits, atol=1e-3)
+
+
+def test_load_backend_errors(tmp_path):
+    with pytest.raises(ValueError, match="Unknown FROGNET_BACKEND"):
+        P._load_backend("tensorrt", tmp_path)
+    with pytest.raises(FileNotFoundError, match="ExportModel.py"):
+        P._load_backend("torchscript", tmp_path)
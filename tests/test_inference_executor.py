@@ -0,0 +1,62 @@
+# tests/test_inference_executor.py
+
+import asyncio
+import threading
+
+import pytest
+
+from backend.app.inference_executor import InferenceExecutor, QueueFullError
+
+
+def test_executor_runs_off_loop_and_reports_timing():
+    ex = InferenceExecutor(workers=1, max_queue=1)
+
+    async def main():
+        loop_thread = threading.get_ident()
+        result, timing = await ex.run(threading.get_ident)
+        return loop_thread, result, timing
+
+    loop_thread, worker_thread, timing = asyncio.run(main())
+    assert worker_thread != loop_thread
+    assert set(timing) == {"queue_depth", "queue_ms", "run_ms"}
+    assert ex.snapshot()["completed"] == 1
+
+
+def test_executor_rejects_past_queue_limit_with_retry_after():
+    ex = InferenceExecutor(workers=1, max_queue=1)
+    gate = threading.Event()
+
+    async def main():
+        running = asyncio.ensure_future(ex.run(gate.wait, 5))
+        queued = asyncio.ensure_future(ex.run(gate.wait, 5))
+        await asyncio.sleep(0.05)
+        with pytest.raises(QueueFullError) as err:
+            await ex.run(gate.wait, 5)
+        gate.set()
+        await asyncio.gather(running, queued)
+        return err.value
+
+    err = asyncio.run(main())
+    assert err.retry_after >= 1
+    assert ex.snapshot()["rejected"] == 1
+
+
+def test_cancelled_queued_calls_release_their_slots():
+    ex = InferenceExecutor(workers=1, max_queue=2)
+    gate = threading.Event()
+
+    async def main():
+        running = asyncio.ensure_future(ex.run(gate.wait, 5))
+        queued = [asyncio.ensure_future(ex.run(gate.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        for q in queued:                         # clients disconnect while queued
+            q.cancel()
+        await asyncio.gather(*queued, return_exceptions=True)
+        gate.set()
+        await running
+        return await ex.run(lambda: "ok")
+
+    result, _ = asyncio.run(main())
+    snap = ex.snapshot()
+    assert result == "ok"
+    assert (snap["waiting"], snap["running"], snap["cancelled"]) == (0, 0, 2)
@@ -0,0 +1,282 @@
+# tests/test_ml_routes.py
+# /ml HTTP routes against the fake-extractor pipeline (no weights, no Firebase).
+
+import io
+import json
+import zipfile
+
+import numpy as np
+import pytest
+import soundfile as sf
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.app.routes import ml_runtime
+from backend.model import Predictor as P
+from tests.test_predictor import FakeAudioSetCNN14, make_pipeline
+
+CLASSES = {0: "a", 1: "b", 2: "c"}
+
+
+def wav_bytes(seconds, seed):
+    y = np.random.default_rng(seed).standard_normal(int(seconds * 16000)).astype(np.float32) * 0.1
+    buf = io.BytesIO()
+    sf.write(buf, y, 16000, format="WAV")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    pipe = make_pipeline()
+    pipe.infer_cfg = P._inference_cfg({"inference": {"mode": "windowed", "win_sec": 1.0, "hop_sec": 0.5}})
+    monkeypatch.setattr(ml_runtime, "get_serving_model", lambda info=None: (pipe, None, CLASSES))
+    monkeypatch.setattr(ml_runtime, "get_replica_pool", lambda: None)
+    app = FastAPI()
+    app.include_router(ml_runtime.router)
+    return TestClient(app), pipe
+
+
+def test_predict_batch_streams_ndjson_with_per_file_errors(client):
+    client, pipe = client
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("night1/a.wav", wav_bytes(3, 1))
+        zf.writestr("night1/b.wav", wav_bytes(0.5, 2))
+        zf.writestr("night1/notes.txt", "ignored")
+        zf.writestr("__MACOSX/night1/._a.wav", "ignored")
+    files = [
+        ("files", ("c.wav", wav_bytes(2, 3), "audio/wav")),
+        ("files", ("broken.wav", b"not audio at all", "audio/wav")),
+        ("files", ("night1.zip", archive.getvalue(), "application/zip")),
+    ]
+    resp = client.post("/ml/predict-batch", files=files)
+    assert resp.status_code == 200
+    lines = [json.loads(l) for l in resp.text.splitlines()]
+    summary, results = lines[-1], {r["file"]: r for r in lines[:-1]}
+
+    assert summary == {**summary, "done": True, "files": 4, "ok": 3, "failed": 1}
+    assert set(results) == {"c.wav", "broken.wav", "night1/a.wav", "night1/b.wav"}
+    assert not results["broken.wav"]["ok"] and results["broken.wav"]["error"]
+
+    # same answer as the single-clip path
+    y = P.decode_audio(io.BytesIO(wav_bytes(3, 1)), P.PANN_SR)
+    probs = pipe.clip_probs(pipe.score_wave(y)[1])
+    assert results["night1/a.wav"]["species"] == CLASSES[int(np.argmax(probs))]
+    assert np.isclose(results["night1/a.wav"]["confidence"], probs.max(), atol=1e-5)
+
+
+def test_predict_reports_stages_and_metrics(client):
+    from backend.app import metrics
+    client, pipe = client
+    client.app.include_router(metrics.router)
+    resp = client.post("/ml/predict", files={"file": ("a.wav", wav_bytes(2, 4), "audio/wav")})
+    assert resp.status_code == 200
+    stages = resp.json()["timings_ms"]
+    assert {"upload_read", "queue_wait", "decode", "resample", "cnn14", "head", "topk"} <= set(stages)
+    assert 1.9 < stages["audio_sec"] < 2.1
+
+    text = client.get("/metrics").text
+    assert 'frognet_stage_seconds_count{stage="cnn14"}' in text
+    assert 'frognet_requests_total{endpoint="predict",status="ok"}' in text
+
+
+def test_predict_embeddings_raw_and_base64(client):
+    import base64
+    import torch
+    client, pipe = client
+    emb = np.random.default_rng(5).standard_normal((4, 2048)).astype(np.float16)
+    expected = torch.softmax(pipe.logits_from_embeddings(torch.from_numpy(emb.astype(np.float32))), -1).numpy()
+
+    resp = client.post("/ml/predict-embeddings?dtype=float16", content=emb.tobytes(),
+                       headers={"content-type": "application/octet-stream"})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["count"] == 4 and "head" in body["timings_ms"]
+    for row, res in zip(expected, body["results"]):
+        assert res["species"] == CLASSES[int(np.argmax(row))]
+        assert np.isclose(res["confidence"], row.max(), atol=1e-5)
+
+    resp = client.post("/ml/predict-embeddings", json={
+        "embeddings": base64.b64encode(emb.tobytes()).decode(), "dtype": "float16", "windows": True})
+    assert resp.status_code == 200 and resp.json()["count"] == 1
+
+    resp = client.post("/ml/predict-embeddings", content=b"\0" * 100,
+                       headers={"content-type": "application/octet-stream"})
+    assert resp.status_code == 400
+
+    b64 = base64.b64encode(emb.tobytes()).decode()
+    for bad in ({"topk": "three"}, {"topk": 2.5}, {"dtype": ["float16"]}, {"windows": "false"}):
+        resp = client.post("/ml/predict-embeddings", json={"embeddings": b64, "dtype": "float16", **bad})
+        assert resp.status_code == 400, bad
+    assert client.post("/ml/predict-embeddings", json=[b64]).status_code == 400
+
+
+def test_embedding_width_follows_the_served_extractor(client, monkeypatch, tmp_path):
+    import torch
+    client, pipe = client
+    torch.manual_seed(0)
+    pipe.head = P.HeadMLP_TypeA(3, in_dim=16).eval()          # as served by a reduced extractor
+    emb = np.random.default_rng(6).standard_normal((2, 16)).astype(np.float32)
+    resp = client.post("/ml/predict-embeddings", content=emb.tobytes(),
+                       headers={"content-type": "application/octet-stream"})
+    assert resp.status_code == 200 and resp.json()["count"] == 2
+    resp = client.post("/ml/predict-embeddings", content=np.zeros((3, 20), np.float32).tobytes(),
+                       headers={"content-type": "application/octet-stream"})
+    assert resp.status_code == 400 and "N x 16" in resp.json()["detail"]
+
+    monkeypatch.setattr(ml_runtime, "get_model", lambda: (pipe, None, CLASSES))
+    monkeypatch.setattr(ml_runtime, "_vector_index", None)
+    monkeypatch.setenv("FROGNET_INDEX_DIR", str(tmp_path))
+    index = ml_runtime.get_vector_index()
+    assert index.dim == 16 and index.ident == pipe.cache_ident()
+    index.add_many(["r0", "r1"], emb)
+    assert index.search(emb[0], k=1)[0][0] == "r0"
+    index.close()
+
+
+def test_activity_gate_skips_quiet_windows_and_rejects_silence(client):
+    client, pipe = client
+    pipe.infer_cfg["gate"] = True
+    sr = 16000
+    t = np.arange(6 * sr) / sr
+    calls = 0.1 * np.sin(2 * np.pi * 1000 * t) * ((t * 8) % 1 < 0.4) * ((t > 2) & (t < 4))
+    y = (calls + 1e-3 * np.random.default_rng(5).standard_normal(t.size)).astype(np.float32)
+    buf = io.BytesIO()
+    sf.write(buf, y, sr, format="WAV")
+
+    resp = client.post("/ml/predict", files={"file": ("calls.wav", buf.getvalue(), "audio/wav")})
+    assert resp.status_code == 200
+    gate = resp.json()["gate"]
+    assert gate["windows"] == 11 and 0 < gate["kept"] < 11
+    assert gate["skipped_ratio"] == round(1 - gate["kept"] / 11, 3)
+    assert "gate_kept" not in resp.json()["timings_ms"]
+
+    silent = io.BytesIO()
+    sf.write(silent, np.zeros(3 * sr, dtype=np.float32), sr, format="WAV")
+    calls_before = len(pipe.extractor.calls)
+    resp = client.post("/ml/predict", files={"file": ("quiet.wav", silent.getvalue(), "audio/wav")})
+    assert resp.status_code == 422
+    body = resp.json()
+    assert body["rejected"] == "no_activity" and body["gate"]["kept"] == 0
+    assert len(pipe.extractor.calls) == calls_before   # CNN14 never ran
+
+
+def test_predict_reports_is_frog_likely_and_rejects_when_configured(client):
+    client, pipe = client
+    pipe.extractor = FakeAudioSetCNN14()
+    pipe.infer_cfg.update(frog_gate_min_prob=0.9, frog_gate_top_n=1)
+    upload = {"file": ("a.wav", wav_bytes(2, 6), "audio/wav")}     # peak ~0.4: not a frog
+
+    body = client.post("/ml/predict", files=upload).json()
+    assert body["ok"] and body["is_frog_likely"] is False and 0 < body["frog_score"] < 0.9
+    assert "frog_score" not in body["timings_ms"]
+
+    pipe.infer_cfg["frog_gate_reject"] = True
+    resp = client.post("/ml/predict", files=upload)
+    assert resp.status_code == 422
+    assert resp.json()["rejected"] == "not_frog" and resp.json()["is_frog_likely"] is False
+
+
+def test_timeline_windows_and_merged_segments(client):
+    client, pipe = client
+    upload = {"file": ("long.wav", wav_bytes(6, 7), "audio/wav")}
+    resp = client.post("/ml/timeline", files=upload, data={"topk": 2, "merge": "true", "min_conf": 0.0,
+                                                          "win_sec": 2.0, "hop_sec": 1.0})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["duration_sec"] == 6.0 and [w["start"] for w in body["windows"]] == [0, 1, 2, 3, 4]
+    assert all(len(w["top"]) == 2 and w["end"] - w["start"] == 2.0 for w in body["windows"])
+    assert body["species"] in CLASSES.values()
+    assert len(pipe.extractor.calls) == 1                       # one batched pass
+
+    # min_conf 0: segments tile the windows; each covers a run with one top class
+    segs = body["segments"]
+    assert sum(s["windows"] for s in segs) == 5
+    assert segs[0]["start"] == 0 and segs[-1]["end"] == 6.0
+    for s in segs:
+        runs = [w for w in body["windows"] if s["start"] <= w["start"] <= s["end"] - 2.0]
+        assert {w["top"][0][0] for w in runs} == {s["species"]}
+
+    assert client.post("/ml/timeline", files=upload, data={"win_sec": 20}).status_code == 400
+
+
+def _wait_loaded(timeout=10.0):
+    import time
+    t0 = time.perf_counter()
+    while ml_runtime.readiness()["state"] == "loading" and time.perf_counter() - t0 < timeout:
+        time.sleep(0.01)
+    return ml_runtime.readiness()
+
+
+def test_background_load_reports_ready_with_phases(monkeypatch):
+    pipe = make_pipeline()
+    warmed = []
+    monkeypatch.setattr(ml_runtime, "_startup", {"state": "idle", "error": None, "phases_ms": {}})
+    monkeypatch.setattr(ml_runtime, "get_replica_pool", lambda: None)
+    monkeypatch.setattr(ml_runtime, "get_model", lambda: (pipe, None, CLASSES))
+    monkeypatch.setattr(ml_runtime, "_warmup", lambda model: warmed.append(model))
+
+    assert ml_runtime.readiness()["state"] == "idle"
+    ml_runtime.start_background_load()
+    ml_runtime.start_background_load()            # idempotent: one loader thread
+    state = _wait_loaded()
+    assert state["state"] == "ready" and state["error"] is None
+    assert {"warmup", "model_total"} <= set(state["phases_ms"])
+    assert warmed == [pipe]
+
+
+def test_background_load_failure_is_reported(monkeypatch):
+    def broken():
+        raise RuntimeError("Model folder not found")
+
+    monkeypatch.setattr(ml_runtime, "_startup", {"state": "idle", "error": None, "phases_ms": {}})
+    monkeypatch.setattr(ml_runtime, "get_replica_pool", lambda: None)
+    monkeypatch.setattr(ml_runtime, "get_model", broken)
+    ml_runtime.start_background_load()
+    state = _wait_loaded()
+    assert state["state"] == "failed"
+    assert state["error"] == "RuntimeError: Model folder not found"
+
+
+def test_predict_batch_bounds_decoded_clips_and_waits_out_a_full_queue(client, monkeypatch):
+    from backend.app.inference_executor import InferenceExecutor, QueueFullError
+    client, pipe = client
+    monkeypatch.setattr(ml_runtime, "BATCH_GROUP", 2)
+    monkeypatch.setattr(ml_runtime, "BATCH_INFLIGHT_GROUPS", 1)
+    live, peak = [0], [0]
+    decode, score = ml_runtime._decode_one, ml_runtime._predict_group
+
+    def counted_decode(name, data):
+        y = decode(name, data)
+        live[0] += 1
+        peak[0] = max(peak[0], live[0])
+        return y
+
+    def counted_score(model, idx_to_class, group, topk):
+        live[0] -= len(group)
+        return score(model, idx_to_class, group, topk)
+
+    class FullOnce(InferenceExecutor):
+        async def run(self, fn, *args, **kwargs):
+            if not self.stats["rejected"]:
+                self.stats["rejected"] += 1
+                raise QueueFullError(depth=1, retry_after=0)
+            return await super().run(fn, *args, **kwargs)
+
+    monkeypatch.setattr(ml_runtime, "_decode_one", counted_decode)
+    monkeypatch.setattr(ml_runtime, "_predict_group", counted_score)
+    ex = FullOnce(workers=1)
+    monkeypatch.setattr(ml_runtime, "get_executor", lambda: ex)
+    files = [("files", (f"{i}.wav", wav_bytes(1, i), "audio/wav")) for i in range(6)]
+    lines = [json.loads(l) for l in client.post("/ml/predict-batch", files=files).text.splitlines()]
+    assert lines[-1]["ok"] == 6 and lines[-1]["failed"] == 0
+    assert ex.stats["rejected"] == 1 and ex.stats["completed"] == 3   # the refused group was retried
+    assert peak[0] <= 2
+
+
+def test_predict_batch_rejects_oversized_upload_while_reading(client, monkeypatch):
+    client, _ = client
+    monkeypatch.setattr(ml_runtime, "BATCH_MAX_MB", 0.05)
+    files = [("files", (f"{i}.wav", wav_bytes(1, i), "audio/wav")) for i in range(3)]   # ~32 KB each
+    resp = client.post("/ml/predict-batch", files=files)
+    assert resp.status_code == 413 and "MB" in resp.json()["detail"]
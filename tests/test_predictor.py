@@ -0,0 +1,292 @@
+# tests/test_predictor.py
+# Unit tests for backend/model/Predictor.py using a tiny stand-in for CNN14,
+# so they run without panns weights or network access.
+
+import threading
+
+import numpy as np
+import pytest
+import torch
+import torch.nn as nn
+
+from backend.model import Predictor as P
+
+
+class FakeCNN14(nn.Module):
+    """Deterministic [B,T] -> {'embedding': [B,2048]} extractor that counts calls."""
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def forward(self, x):
+        self.calls.append(tuple(x.shape))
+        feat = torch.stack([x.abs().mean(dim=1), x.max(dim=1).values], dim=1)  # [B,2]
+        return {"embedding": feat.repeat(1, 1024)}
+
+
+def make_pipeline(num_classes: int = 3):
+    torch.manual_seed(0)
+    head = P.HeadMLP_TypeA(num_classes).eval()
+    return P.Pipeline(FakeCNN14(), head)
+
+
+def test_batch_scheduler_matches_unbatched_logits():
+    pipe = make_pipeline()
+    rng = np.random.default_rng(0)
+    waves = [rng.standard_normal(P.PANN_SR).astype(np.float32) for _ in range(4)]
+    expected = [pipe.logits_from_embeddings(P._embed_waves(pipe.extractor, torch.from_numpy(w)[None]))
+                for w in waves]
+    pipe.extractor.calls.clear()
+
+    sched = pipe.enable_batching(max_batch_size=8, max_wait_ms=50)
+    results = [None] * len(waves)
+
+    def call(i):
+        results[i] = sched.submit(waves[i]).result(timeout=10)[1]
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(waves))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    sched.close()
+
+    for got, exp in zip(results, expected):
+        assert got.shape == (1, 3)
+        assert torch.allclose(got, exp, atol=1e-5)
+    # all four requests shared fewer CNN14 passes than requests
+    assert len(pipe.extractor.calls) < len(waves)
+
+
+def test_batch_scheduler_buckets_by_length():
+    pipe = make_pipeline()
+    sched = pipe.enable_batching(max_batch_size=8, max_wait_ms=50)
+    short = np.ones(P.PANN_SR // 2, dtype=np.float32)
+    long = np.ones(P.PANN_SR * 3, dtype=np.float32)
+    futs = [sched.submit(short), sched.submit(long)]
+    outs = [f.result(timeout=10)[1] for f in futs]
+    sched.close()
+
+    assert all(o.shape == (1, 3) for o in outs)
+    lengths = sorted(shape[1] for shape in pipe.extractor.calls)
+    assert lengths == [P.PANN_SR // 2, P.PANN_SR * 3]
+
+
+def test_batch_scheduler_unequal_lengths_match_unbatched():
+    # 4.1 s and 4.9 s used to share a zero-padded pass, which shifts CNN14's time pooling
+    pipe = make_pipeline()
+    rng = np.random.default_rng(3)
+    waves = [rng.standard_normal(int(s * P.PANN_SR)).astype(np.float32) for s in (4.1, 4.9, 4.1)]
+    expected = [pipe.logits_from_embeddings(P._embed_waves(pipe.extractor, torch.from_numpy(w)[None]))
+                for w in waves]
+    pipe.extractor.calls.clear()
+
+    sched = pipe.enable_batching(max_batch_size=8, max_wait_ms=50)
+    futs = [sched.submit(w) for w in waves]
+    outs = [f.result(timeout=10)[1] for f in futs]
+    sched.close()
+
+    for got, exp in zip(outs, expected):
+        assert torch.allclose(got, exp, atol=1e-5)
+    assert sorted(pipe.extractor.calls) == [(1, waves[1].shape[0]), (2, waves[0].shape[0])]
+
+
+def test_frame_windows_is_zero_copy_view():
+    y = np.arange(P.PANN_SR * 5, dtype=np.float32)
+    win, hop = 2 * P.PANN_SR, P.PANN_SR
+    w = P._frame_windows(y, win, hop)
+    assert w.shape == (4, win)             # starts at 0,1,2,3 s like the tester
+    assert np.shares_memory(w, y)
+    assert w[1, 0] == hop
+
+    short = P._frame_windows(np.ones(100, dtype=np.float32), win, hop)
+    assert short.shape == (1, win) and short[0, 100:].sum() == 0
+
+
+def test_aggregate_probs_maxprob_topk_prefers_confident_windows():
+    probs = np.array([[0.9, 0.05, 0.05],
+                      [0.34, 0.33, 0.33],
+                      [0.2, 0.7, 0.1]])
+    agg = P.aggregate_probs(probs, method="maxprob", alpha=3.0, topk=2)
+    assert np.isclose(agg.sum(), 1.0)
+    assert int(np.argmax(agg)) == 0
+    assert P.choose_topk_for_clip(4) is None
+    assert P.choose_topk_for_clip(9, fixed_k=3) == 3
+
+
+def test_windowed_forward_returns_log_aggregated_probs(monkeypatch):
+    pipe = make_pipeline()
+    pipe.infer_cfg.update(mode="windowed", agg_method="avg", agg_topk=None)
+    y = np.random.default_rng(1).standard_normal(P.PANN_SR * 4).astype(np.float32)
+    monkeypatch.setattr(P, "_load_wave", lambda _path: y)
+
+    out = pipe("clip.wav")
+    emb, logits = pipe.score_wave(y)
+    probs = torch.softmax(logits, dim=-1).numpy()
+    assert emb.shape == (3, 2048)
+    assert out.shape == (1, 3)
+    assert np.allclose(torch.softmax(out, dim=-1).numpy()[0], probs.mean(axis=0), atol=1e-5)
+
+
+def test_shared_logmel_windows_match_per_window_stft(monkeypatch):
+    models = pytest.importorskip("panns_inference.models")
+    torch.manual_seed(0)
+    cnn14 = models.Cnn14(sample_rate=P.PANN_SR, window_size=1024, hop_size=320, mel_bins=64,
+                         fmin=50, fmax=14000, classes_num=527).eval()
+    pipe = P.Pipeline(cnn14, nn.Linear(2048, 3), infer_cfg={"mode": "windowed"})
+    y = 0.1 * np.random.default_rng(2).standard_normal(P.PANN_SR * 4).astype(np.float32)
+
+    mel = pipe._windows(y)
+    assert mel.shape == (3, 201, 64)
+    emb, _ = pipe.score_wave(y)
+    assert pipe.cache_ident().endswith("|mel=shared|sr=32000")
+
+    monkeypatch.setattr(P, "SHARED_FRONTEND", False)
+    assert pipe._windows(y).shape == (3, 2 * P.PANN_SR)
+    ref, _ = pipe.score_wave(y)
+    # Only the reflect-padded edge frames of each window differ
+    assert torch.nn.functional.cosine_similarity(emb, ref).min() > 0.999
+
+
+class FakeAudioSetCNN14(FakeCNN14):
+    """FakeCNN14 plus AudioSet output whose "Frog" probability is the clip's peak level."""
+    def forward(self, x):
+        out = super().forward(x)
+        clip = torch.full((x.shape[0], 527), 0.01)
+        clip[:, 0] = 0.5                                       # "Speech" always outranks frogs
+        clip[:, P.AUDIOSET_INDEX["Frog"]] = x.abs().max(dim=1).values.clamp(max=1.0)
+        return {**out, "clipwise_output": clip}
+
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_frog_check_reports_and_short_circuits_the_head(batched):
+    pipe = P.Pipeline(FakeAudioSetCNN14(), P.HeadMLP_TypeA(3).eval(),
+                      infer_cfg={"frog_gate_min_prob": 0.2, "frog_gate_top_n": 1})
+    if batched:
+        pipe.enable_batching(max_batch_size=4, max_wait_ms=1)
+    head_calls = []
+    pipe.head.register_forward_hook(lambda *a: head_calls.append(1))
+    frog = np.full(P.PANN_SR, 0.5, dtype=np.float32)
+    junk = np.full(P.PANN_SR, 0.05, dtype=np.float32)
+
+    t = {}
+    with P.trace_stages(t):
+        pipe.score_wave(frog)
+    assert t["frog_likely"] == 1.0 and np.isclose(t["frog_score"], 0.5)
+    with P.trace_stages(t):
+        pipe.score_wave(junk)                                  # reported, not rejected
+    assert t["frog_likely"] == 0.0 and len(head_calls) == 2
+
+    pipe.infer_cfg["frog_gate_reject"] = True
+    with pytest.raises(P.NotFrogError, match="0.050"):
+        pipe.score_wave(junk)
+    assert len(head_calls) == 2                                # head skipped
+    out = pipe.score_many([frog, junk])
+    assert isinstance(out[1], P.NotFrogError) and out[0][1].shape == (1, 3)
+    if batched:
+        pipe.scheduler.close()
+
+
+def test_merge_segments_splits_on_class_gaps_and_low_confidence():
+    probs = np.array([[0.9, 0.1], [0.8, 0.2], [0.3, 0.7], [0.55, 0.45], [0.9, 0.1], [0.9, 0.1]])
+    starts = np.array([0.0, 1.0, 2.0, 3.0, 4.0, 6.0])          # window at 5 s dropped by the gate
+    segs = P.merge_segments(starts, probs, {0: "a", 1: "b"}, win_sec=2.0, hop_sec=1.0, min_conf=0.6)
+    assert [(s["species"], s["start"], s["end"], s["windows"]) for s in segs] == [
+        ("a", 0.0, 3.0, 2), ("b", 2.0, 4.0, 1), ("a", 4.0, 6.0, 1), ("a", 6.0, 8.0, 1)]
+    assert segs[0]["confidence"] == 0.9 and segs[0]["mean_confidence"] == 0.85
+
+
+def test_embedding_cache_hits_skip_cnn14_and_persist(tmp_path, monkeypatch):
+    from backend.model.embedding_cache import EmbeddingCache
+
+    clip = tmp_path / "clip.wav"
+    clip.write_bytes(b"same-bytes")
+    y = np.random.default_rng(2).standard_normal(P.PANN_SR).astype(np.float32)
+    monkeypatch.setattr(P, "_load_wave", lambda _path: y)
+
+    pipe = make_pipeline()
+    pipe.infer_cfg["mode"] = "clip"
+    cache = pipe.enable_cache(EmbeddingCache(disk_dir=str(tmp_path / "emb")))
+    first = pipe(str(clip))
+    second = pipe(str(clip))
+    assert torch.allclose(first, second)
+    assert len(pipe.extractor.calls) == 1
+    assert cache.snapshot()["hits"] == 1 and cache.snapshot()["misses"] == 1
+
+    # a fresh process (new memory tier) is served from disk
+    pipe2 = make_pipeline()
+    pipe2.infer_cfg["mode"] = "clip"
+    cache2 = pipe2.enable_cache(EmbeddingCache(disk_dir=str(tmp_path / "emb")))
+    assert torch.allclose(pipe2(str(clip)), first)
+    assert pipe2.extractor.calls == [] and cache2.snapshot()["disk_hits"] == 1
+
+
+def test_embedding_cache_coalesces_concurrent_misses():
+    from backend.model.embedding_cache import EmbeddingCache
+
+    cache = EmbeddingCache()
+    gate = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        gate.wait(5)
+        return torch.ones(1, 2048)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    while cache.snapshot()["coalesced"] < 3:
+        pass
+    gate.set()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and len(results) == 4
+
+
+def test_embedding_cache_lru_is_bounded_by_bytes():
+    from backend.model.embedding_cache import EmbeddingCache
+
+    one = 2048 * 4
+    cache = EmbeddingCache(max_bytes=2 * one)
+    for k in ("a", "b", "c"):
+        cache.get_or_compute(k, lambda: torch.zeros(1, 2048))
+    snap = cache.snapshot()
+    assert snap["entries"] == 2 and snap["evictions"] == 1
+
+
+def test_decode_audio_from_memory_matches_file(tmp_path):
+    import io
+    import soundfile as sf
+    from backend.model.audio_io import decode_audio
+
+    sr_in = 16000
+    t = np.arange(sr_in, dtype=np.float32) / sr_in
+    stereo = np.stack([np.sin(2 * np.pi * 440 * t), np.sin(2 * np.pi * 660 * t)], axis=1) * 0.5
+    path = tmp_path / "tone.wav"
+    sf.write(path, stereo, sr_in)
+
+    from_file = decode_audio(str(path), P.PANN_SR)
+    from_bytes = decode_audio(path.read_bytes(), P.PANN_SR)
+    from_buffer = decode_audio(io.BytesIO(path.read_bytes()), P.PANN_SR)
+    assert from_bytes.dtype == np.float32 and from_bytes.shape == (P.PANN_SR,)
+    assert np.allclose(from_bytes, from_file, atol=1e-4)
+    assert np.array_equal(from_bytes, from_buffer)
+
+
+def test_debug_lines_are_sampled_onto_the_module_logger(monkeypatch, caplog):
+    import logging
+
+    monkeypatch.setattr(P, "DEBUG_SAMPLE", 1.0)
+    with caplog.at_level(logging.DEBUG, logger=P.__name__):
+        P._debug("head out shape (1, 3)")
+    assert [(r.name, r.levelno, r.getMessage()) for r in caplog.records] == \
+        [(P.__name__, logging.DEBUG, "head out shape (1, 3)")]
+
+    caplog.clear()
+    monkeypatch.setattr(P, "DEBUG_SAMPLE", 0.0)
+    with caplog.at_level(logging.DEBUG, logger=P.__name__):
+        P._debug("never")
+    assert caplog.records == []
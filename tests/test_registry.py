@@ -0,0 +1,116 @@
+# tests/test_registry.py
+# Versioned head registry: publish, hot swap, rollback, pinning and canary
+# routing on one shared (fake) extractor.
+
+import json
+
+import numpy as np
+import torch
+
+from backend.model import Predictor as P
+from backend.model.registry import ModelRegistry, publish_version
+from tests.test_predictor import make_pipeline
+
+
+def make_checkpoint(path, seed, num_classes=3):
+    path.mkdir(parents=True)
+    torch.manual_seed(seed)
+    torch.save(P.HeadMLP_TypeA(num_classes).state_dict(), path / "head.pth")
+    (path / "config.json").write_text(json.dumps({"inference": {"mode": "clip"}}))
+    (path / "class_to_idx.json").write_text(json.dumps({f"sp{i}": i for i in range(num_classes)}))
+    return path
+
+
+def make_registry(tmp_path, versions=("1.0.0", "1.1.0")):
+    root = tmp_path / "registry"
+    for i, v in enumerate(versions):
+        publish_version(root, v, str(make_checkpoint(tmp_path / f"src{i}", seed=i + 1)))
+    base = make_pipeline()
+    return ModelRegistry(str(root), base, {0: "a", 1: "b", 2: "c"}), base
+
+
+def test_activate_rollback_and_pin(tmp_path):
+    reg, base = make_registry(tmp_path)
+    y = np.random.default_rng(0).standard_normal(P.PANN_SR).astype(np.float32)
+    assert reg.versions() == ["1.0.0", "1.1.0"]
+
+    reg.refresh()                                   # follows the newest publish
+    assert reg.active.version == "1.1.0"
+    assert reg.active.model.extractor is base.extractor
+    new_logits = reg.active.model.score_wave(y)[1]
+
+    reg.activate("1.0.0")
+    assert not torch.allclose(reg.active.model.score_wave(y)[1], new_logits)
+    reg.rollback()
+    assert reg.active.version == "1.1.0"
+    assert torch.allclose(reg.active.model.score_wave(y)[1], new_logits)
+
+    reg.pin("1.0.0")
+    publish_version(reg.root, "1.2.0", str(make_checkpoint(tmp_path / "src2", seed=9)))
+    assert reg.refresh() is None and reg.active.version == "1.0.0"
+
+    # state survives a restart
+    again = ModelRegistry(str(reg.root), base, {0: "a", 1: "b", 2: "c"})
+    assert again.active.version == "1.0.0" and again.snapshot()["pinned"]
+
+
+def test_rollback_survives_refresh_and_restart(tmp_path, monkeypatch):
+    reg, base = make_registry(tmp_path)
+    reg.refresh()
+    assert reg.active.version == "1.1.0"
+    reg.rollback()                                  # bad head: back to builtin
+    assert reg.active.version == "builtin" and reg.snapshot()["pinned"]
+    assert reg.refresh() is None and reg.active.version == "builtin"
+
+    monkeypatch.setenv("FROGNET_REGISTRY_DIR", str(reg.root))
+    again = ModelRegistry.from_env(base, {0: "a", 1: "b", 2: "c"})
+    assert again.active.version == "builtin"
+
+    again.unpin()                                   # follow publishes again
+    assert again.refresh().version == "1.1.0"
+
+
+def test_canary_split_and_mixed_heads_in_one_batch(tmp_path):
+    reg, base = make_registry(tmp_path)
+    reg.activate("1.0.0")
+    reg.set_canary("1.1.0", 25)
+    picks = [reg.select(key=str(i)).version for i in range(2000)]
+    assert 0.2 < picks.count("1.1.0") / len(picks) < 0.3
+    assert reg.select(key="42").version == reg.select(key="42").version
+
+    # both heads share one batcher: each request is scored by its own head
+    y = np.random.default_rng(1).standard_normal(P.PANN_SR).astype(np.float32)
+    expected = {v: reg._load(v).model.score_wave(y)[1] for v in ("1.0.0", "1.1.0")}
+    base.enable_batching(max_batch_size=8, max_wait_ms=50)
+    futs = {v: base.scheduler.submit(y, reg._load(v).model.logits_from_embeddings) for v in expected}
+    for v, fut in futs.items():
+        assert torch.allclose(fut.result(timeout=10)[1], expected[v], atol=1e-5)
+    base.scheduler.close()
+
+    reg.activate("1.1.0")                           # promoting the canary ends it
+    assert reg.snapshot()["canary"] is None
+
+
+def test_versions_for_another_extractor_are_refused(tmp_path):
+    import pytest
+
+    reg, base = make_registry(tmp_path, versions=("1.0.0",))
+    base.extractor.extractor_ident = "cnn14"
+    reduced = make_checkpoint(tmp_path / "reduced", seed=3)
+    torch.save(P.HeadMLP_TypeA(3, in_dim=16).state_dict(), reduced / "head.pth")
+    cfg = {"inference": {"mode": "clip"}, "extractor": {"type": "cnn14-reduced", "channels": [8, 16]}}
+    (reduced / "config.json").write_text(json.dumps(cfg))
+
+    with pytest.raises(ValueError, match="cnn14-reduced:8-16"):
+        reg.publish("2.0.0", str(reduced))
+    publish_version(reg.root, "2.0.0", str(reduced))        # e.g. copied in by the CLI
+    with pytest.raises(ValueError, match="cnn14-reduced:8-16"):
+        reg.activate("2.0.0")
+    assert reg.active.version == "builtin"
+
+    del cfg["extractor"]                                     # right extractor claimed, wrong width
+    (reduced / "config.json").write_text(json.dumps(cfg))
+    with pytest.raises(ValueError, match="16-d"):
+        reg.publish("2.0.1", str(reduced))
+    reg.activate("1.0.0")                                    # a matching version still goes in
+    assert reg.active.version == "1.0.0"
@@ -0,0 +1,124 @@
+# tests/test_replicas.py
+# ReplicaPool with real spawned worker processes serving a tiny random-init
+# reduced-CNN14 checkpoint (loads offline): least-loaded dispatch, per-item
+# errors and rejections, dead replicas and shutdown.
+
+import io
+
+import numpy as np
+import pytest
+import soundfile as sf
+import torch
+
+from backend.model import Predictor as P
+from backend.model.TruncateCNN14 import write_checkpoint
+from backend.model.replicas import ReplicaPool
+
+
+def _wav(seconds, amp, seed=0):
+    """Quiet noise with amp-level 1 kHz call bursts in the second half (amp=0: silence)."""
+    t = np.arange(int(seconds * P.PANN_SR)) / P.PANN_SR
+    calls = np.sin(2 * np.pi * 1000 * t) * (t > seconds / 2)
+    y = (amp * (0.01 * np.random.default_rng(seed).standard_normal(t.size) + calls)).astype(np.float32)
+    buf = io.BytesIO()
+    sf.write(buf, y, P.PANN_SR, format="WAV", subtype="FLOAT")
+    return buf.getvalue()
+
+
+@pytest.fixture(scope="module")
+def ckpt(tmp_path_factory):
+    ckpt = tmp_path_factory.mktemp("tiny_ckpt")
+    torch.manual_seed(0)
+    ext = P.ReducedCnn14([8, 16])
+    head = P.HeadMLP_TypeB(2, in_dim=16).eval()
+    write_checkpoint(ckpt, ext, head, {"a": 0, "b": 1}, {"inference": {"mode": "clip", "gate": True}},
+                     {"depth": 2, "keep": 0.125})
+    return ckpt
+
+
+@pytest.fixture(scope="module")
+def pool(ckpt):
+    pool = ReplicaPool(str(ckpt), replicas=2, threads_per_replica=1)
+    assert pool.wait_ready(timeout=120)
+    yield pool
+    pool.close()
+
+
+def test_dispatches_to_least_loaded_replica(pool):
+    sent = []
+    for i, q in enumerate(pool._req_qs):
+        q.put = (lambda put, i: lambda job: (sent.append(i), put(job)))(q.put, i)
+    futs = [pool.submit(_wav(1.0, 0.1, seed=s)) for s in range(4)]
+    outs = [f.result(timeout=60) for f in futs]
+    for q in pool._req_qs:
+        del q.put
+
+    assert sorted(sent[:2]) == [0, 1]              # the second job never queues behind the first
+    assert all(name in ("a", "b") and 0.0 <= conf <= 1.0 for name, conf, _ in outs)
+    assert [l["inflight"] for l in pool.loads()] == [0, 0]
+
+
+def test_errors_and_rejections_stay_per_item(pool):
+    bad = pool.submit(b"not audio at all")
+    silent = pool.submit(_wav(1.0, 0.0))
+    good = pool.submit(_wav(1.0, 0.1))
+
+    with pytest.raises(RuntimeError):
+        bad.result(timeout=60)
+    with pytest.raises(P.NoActivityError):          # re-raised as the worker's RejectedClip subclass
+        silent.result(timeout=60)
+    assert good.result(timeout=60)[0] in ("a", "b")
+    assert all(l["alive"] and l["ready"] for l in pool.loads())
+
+
+def test_jobs_score_with_the_registry_head_they_name(pool, ckpt, tmp_path):
+    import json
+
+    from backend.model.registry import ModelRegistry, publish_version
+
+    src = tmp_path / "src"
+    src.mkdir()
+    torch.manual_seed(1)
+    torch.save(P.HeadMLP_TypeB(3, in_dim=16).state_dict(), src / "head.pth")
+    (src / "config.json").write_text((ckpt / "config.json").read_text())   # trained on the same extractor
+    (src / "class_to_idx.json").write_text(json.dumps({"x": 0, "y": 1, "z": 2}))
+    publish_version(tmp_path / "registry", "2.0.0", str(src))
+    reg = ModelRegistry.__new__(ModelRegistry)              # head_source only needs the root
+    reg.root, reg._base_version = tmp_path / "registry", "builtin"
+
+    assert reg.head_source("builtin") is None
+    head = ("2.0.0", *reg.head_source("2.0.0"))
+    outs = [pool.submit(_wav(1.0, 0.1, seed=s), head=head).result(timeout=60) for s in range(3)]
+    assert all(name in ("x", "y", "z") for name, _, _ in outs)
+    assert pool.predict(_wav(1.0, 0.1), timeout=60)[0] in ("a", "b")     # no head: the checkpoint's
+
+    with pytest.raises(RuntimeError, match="FileNotFoundError"):         # never falls back to another head
+        pool.predict(_wav(1.0, 0.1), timeout=60, head=("9.9.9", str(tmp_path / "nope"), "head.pth"))
+    other = json.loads((src / "config.json").read_text())
+    other["extractor"]["sha256"] = "0" * 64                               # another extractor's head
+    (src / "config.json").write_text(json.dumps(other))
+    publish_version(tmp_path / "registry", "2.0.1", str(src))
+    with pytest.raises(RuntimeError, match="trained on extractor"):
+        pool.predict(_wav(1.0, 0.1), timeout=60, head=("2.0.1", *reg.head_source("2.0.1")))
+    assert all(l["alive"] for l in pool.loads())
+
+
+def test_unloadable_checkpoint_marks_replicas_dead(tmp_path):
+    pool = ReplicaPool(str(tmp_path / "missing"), replicas=1)
+    assert pool.wait_ready(timeout=120)
+    assert pool.loads()[0]["alive"] is False
+    with pytest.raises(RuntimeError, match="No live inference replicas"):
+        pool.submit(b"x")
+    pool.close()
+
+
+def test_close_stops_workers_and_refuses_new_jobs(tmp_path):
+    torch.manual_seed(0)
+    write_checkpoint(tmp_path, P.ReducedCnn14([8]), P.HeadMLP_TypeB(2, in_dim=8).eval(), {"a": 0, "b": 1},
+                     {"inference": {"mode": "clip"}}, {"depth": 1, "keep": 0.125})
+    pool = ReplicaPool(str(tmp_path), replicas=1)
+    assert pool.wait_ready(timeout=120)
+    pool.close()
+    assert all(p.exitcode == 0 for p in pool._procs)
+    with pytest.raises(RuntimeError, match="closed"):
+        pool.submit(b"x")
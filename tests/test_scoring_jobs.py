@@ -0,0 +1,186 @@
+# tests/test_scoring_jobs.py
+# SQLite job queue (leases, retries, redelivery) and the scoring workers with
+# fake fetch / score / Firestore-write callables.
+
+import time
+
+from backend.app.scoring_jobs import JobQueue, ScoringWorkers
+
+
+def test_lease_retry_and_visibility_timeout(tmp_path):
+    q = JobQueue(str(tmp_path / "jobs.db"), max_attempts=2, backoff_sec=0.0)
+    q.enqueue("r1", {"path": "a.wav"})
+    q.enqueue("r2", {"path": "b.wav"})
+
+    jobs = q.lease("w1", 10, lease_sec=60)
+    assert sorted(j[1] for j in jobs) == ["r1", "r2"]
+    assert q.lease("w2", 10, lease_sec=60) == []           # leased jobs are invisible
+
+    r1, r2 = sorted(jobs, key=lambda j: j[1])
+    q.complete([r1[0]], "w1")
+    assert q.fail(r2[0], "w1", r2[3], "boom") is False      # attempt 1 of 2: requeued
+    (again,) = q.lease("w2", 10, lease_sec=0.01)            # ... and expires unacknowledged
+    time.sleep(0.02)
+    assert q.lease("w3", 10, lease_sec=60) == []            # expired at max attempts: parked
+    st = q.stats()
+    assert (st["done"], st["failed"], st["queued"], st["leased"]) == (1, 1, 0, 0)
+    assert st["throughput"]["60s"]["done"] == 1
+
+    assert q.retry_failed() == 1 and q.stats()["queued"] == 1
+
+
+def test_workers_score_in_batches_and_write_once(tmp_path):
+    q = JobQueue(str(tmp_path / "jobs.db"), max_attempts=3, backoff_sec=0.0)
+    for i in range(5):
+        q.enqueue(f"r{i}", {"path": f"{i}.wav", **({"status_after": "pending"} if i == 0 else {})})
+    writes, score_calls = [], []
+
+    def fetch(src):
+        if src["path"] == "3.wav":
+            raise FileNotFoundError(src["path"])
+        return src["path"], b"audio"
+
+    def score(items, topk):
+        score_calls.append(len(items))
+        return [("Bullfrog", 0.9, [("Bullfrog", 0.9), ("Green Frog", 0.1)])] * len(items), "1.2.0"
+
+    w = ScoringWorkers(q, workers=1, batch=8, fetch=fetch, score=score, write=writes.append)
+    assert w.run_once() == 5
+    assert score_calls == [4] and len(writes) == 1           # one predictor call, one batched write
+    fields = dict(writes[0])
+    assert fields["r0"]["status"] == "pending" and "status" not in fields["r1"]
+    assert fields["r1"]["predictedSpecies"] == "Bullfrog"
+    assert fields["r1"]["predictionModelVersion"] == "1.2.0"
+    assert "r3" not in fields                                # will be retried
+    st = q.stats()
+    assert (st["done"], st["queued"]) == (4, 1) and w.snapshot()["retried"] == 1
+
+
+def test_index_jobs_embed_without_writing_scores(tmp_path):
+    q = JobQueue(str(tmp_path / "jobs.db"), max_attempts=3, backoff_sec=0.0)
+    q.enqueue("r1", {"path": "1.wav"})
+    q.enqueue("index:r1", {"path": "1.wav", "action": "index", "recording_id": "r1"})
+    q.enqueue("index:r2", {"path": "2.wav", "action": "index", "recording_id": "r2"})
+    writes, indexed = [], []
+
+    def index(items, rec_ids):
+        indexed.extend(rec_ids)
+        return [None if rid == "r1" else ValueError("silent") for rid in rec_ids]
+
+    w = ScoringWorkers(q, workers=1, batch=8, fetch=lambda src: (src["path"], b"audio"),
+                       score=lambda items, topk: ([("Bullfrog", 0.9, [("Bullfrog", 0.9)])] * len(items), None),
+                       write=writes.append, index=index)
+    assert w.run_once() == 3
+    assert sorted(indexed) == ["r1", "r2"]
+    assert [rid for rid, _ in writes[0]] == ["r1"]          # only the scoring job writes to Firestore
+    snap = w.snapshot()
+    assert (snap["scored"], snap["indexed"], snap["retried"]) == (1, 1, 1)
+
+
+def test_backfill_writes_rejections_like_the_live_workers(tmp_path):
+    import io
+
+    import numpy as np
+    import soundfile as sf
+
+    from backend.model import Predictor as P
+    from backend.scripts import rescore_recordings as rescore
+    from tests.test_predictor import make_pipeline
+
+    def wav(y):
+        buf = io.BytesIO()
+        sf.write(buf, y.astype(np.float32), P.PANN_SR, format="WAV", subtype="FLOAT")
+        return buf.getvalue()
+
+    pipe = make_pipeline()
+    pipe.infer_cfg["gate"] = True
+    t = np.arange(2 * P.PANN_SR) / P.PANN_SR
+    calls = 0.1 * np.sin(2 * np.pi * 1000 * t) * (t > 1)
+    calls += 1e-3 * np.random.default_rng(0).standard_normal(t.size)
+    rescore._w.update(P=P, model=pipe, idx_to_class={0: "a", 1: "b", 2: "c"})
+    out = dict(rescore._score_chunk([("calls", "a.wav", wav(calls)), ("silent", "b.wav", wav(0 * t)),
+                                     ("broken", "c.wav", b"not audio")], topk=3))
+    assert out["calls"][0] in ("a", "b", "c")
+    assert isinstance(out["silent"], P.NoActivityError) and isinstance(out["broken"], str)
+
+    # the live worker path writes the same fields for the same rejection
+    q = JobQueue(str(tmp_path / "jobs.db"), max_attempts=3, backoff_sec=0.0)
+    q.enqueue("silent", {"path": "b.wav"})
+    writes = []
+    w = ScoringWorkers(q, workers=1, batch=8, fetch=lambda src: ("b.wav", b""),
+                       score=lambda items, topk: ([out["silent"]], "1.2.0"), write=writes.append)
+    w.run_once()
+    live = dict(writes[0])["silent"]
+    backfill = rescore.rejected_fields(out["silent"], "1.2.0")
+    live.pop("scoredAt"), backfill.pop("scoredAt")
+    assert live == backfill
+    assert backfill["analysisStatus"] == "rejected" and backfill["predictionModelVersion"] == "1.2.0"
+    assert backfill["rejectedReason"] == "no_activity"
+
+
+def test_backfill_checkpoint_force_and_failed_ids(tmp_path):
+    from backend.scripts import rescore_recordings as rescore
+
+    path = tmp_path / "rescore_1.2.0.json"
+    ck = rescore._load_checkpoint(path, "1.2.0")
+    rescore._record_failures(ck, ["r1"], {"r2": "TimeoutError: fetch", "r3": "no audio source"})
+    ck.update(last_doc_id="r9", seen=9, scored=6, done=True)
+    rescore._save_checkpoint(path, ck)
+
+    resumed = rescore._load_checkpoint(path, "1.2.0")
+    assert resumed["done"] and resumed["failed"] == 2 and set(resumed["failed_ids"]) == {"r2", "r3"}
+    rescore._record_failures(resumed, ["r2"], {})          # a --retry-failed pass scored r2
+    assert resumed["failed_ids"] == {"r3": "no audio source"} and resumed["failed"] == 1
+
+    fresh = rescore._load_checkpoint(path, "1.2.0", fresh=True)   # --force
+    assert fresh["last_doc_id"] is None and not fresh["done"]
+    assert (fresh["seen"], fresh["scored"], fresh["failed"], fresh["failed_ids"]) == (0, 0, 0, {})
+
+
+def test_rejected_uploads_skip_the_review_queue(tmp_path):
+    from backend.app.scoring_jobs import review_source
+    from backend.model.Predictor import NotFrogError
+
+    q = JobQueue(str(tmp_path / "jobs.db"), max_attempts=3, backoff_sec=0.0)
+    q.enqueue("blob", review_source(blob="recordings/blob.wav"))     # /recordings/upload-audio
+    q.enqueue("path", review_source(path="uploads/path.wav"))        # /audio/upload
+    q.enqueue("backfill", {"path": "uploads/old.wav"})               # no review-queue change
+    writes = []
+    w = ScoringWorkers(q, workers=1, batch=8, fetch=lambda src: ("x.wav", b"audio"),
+                       score=lambda items, topk: ([NotFrogError("not likely a frog")] * len(items), "1.2.0"),
+                       write=writes.append)
+    assert w.run_once() == 3
+    fields = dict(writes[0])
+    assert fields["blob"]["status"] == fields["path"]["status"] == "auto_rejected"
+    assert "status" not in fields["backfill"] and fields["backfill"]["rejectedReason"] == "not_frog"
+
+
+def test_final_failure_status_is_retried_until_written(tmp_path):
+    q = JobQueue(str(tmp_path / "jobs.db"), max_attempts=1, backoff_sec=0.0)
+    q.enqueue("r1", {"path": "gone.wav"})
+    q.enqueue("r2", {"path": "ok.wav"})
+    writes, down = [], [True]
+
+    def fetch(src):
+        if src["path"] == "gone.wav":
+            raise FileNotFoundError(src["path"])
+        return src["path"], b"audio"
+
+    def write(updates):
+        if down[0]:
+            raise ConnectionError("firestore unavailable")
+        writes.append(updates)
+
+    w = ScoringWorkers(q, workers=1, batch=8, fetch=fetch, write=write,
+                       score=lambda items, topk: ([("Bullfrog", 0.9, [("Bullfrog", 0.9)])] * len(items), None))
+    assert w.run_once() == 2
+    st = q.stats()
+    assert (st["queued"], st["failed"], st["done"]) == (2, 0, 0)   # nothing written: neither is parked or done
+
+    down[0] = False
+    assert w.run_once() == 2
+    fields = dict(writes[0])
+    assert fields["r1"]["analysisStatus"] == "failed" and "FileNotFoundError" in fields["r1"]["analysisError"]
+    assert fields["r2"]["analysisStatus"] == "scored"
+    st = q.stats()
+    assert (st["queued"], st["failed"], st["done"]) == (0, 1, 1) and w.snapshot()["failed"] == 1
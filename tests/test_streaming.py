@@ -0,0 +1,83 @@
+# tests/test_streaming.py
+# Incremental window scoring (backend/model/streaming.py) and the /ml/stream
+# WebSocket, on the fake extractor from test_predictor.
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.model import Predictor as P
+from backend.model.streaming import StreamScorer
+from tests.test_predictor import make_pipeline
+
+CLASSES = {0: "a", 1: "b", 2: "c"}
+
+
+def windowed_pipeline():
+    pipe = make_pipeline()
+    pipe.infer_cfg = P._inference_cfg({"inference": {"mode": "windowed", "win_sec": 1.0, "hop_sec": 0.5}})
+    return pipe
+
+
+def test_stream_final_matches_offline_windowed():
+    pipe = windowed_pipeline()
+    y = np.random.default_rng(0).standard_normal(4 * P.PANN_SR).astype(np.float32) * 0.1
+    expected = pipe.clip_probs(pipe.score_wave(y)[1])
+
+    s = StreamScorer(pipe, CLASSES, in_sr=P.PANN_SR, exit_conf=0)
+    partials = []
+    for chunk in np.array_split(y, 37):          # odd chunk sizes straddle window edges
+        partials += s.push(chunk)
+    final = s.finish()
+
+    assert len(partials) == 7 and final["windows"] == 7 and final["reason"] == "end"
+    assert final["species"] == CLASSES[int(np.argmax(expected))]
+    assert np.isclose(final["confidence"], expected.max(), atol=1e-5)
+
+
+def test_stream_exits_early_and_resamples():
+    pipe = windowed_pipeline()
+    sr = 16000
+    y = np.random.default_rng(1).standard_normal(10 * sr).astype(np.float32) * 0.1
+    s = StreamScorer(pipe, CLASSES, in_sr=sr, exit_conf=1e-6, min_windows=2)
+    updates = []
+    for chunk in np.array_split(y, 50):
+        updates += s.push(chunk)
+    assert s.done and s.reason == "confident"
+    assert s.n_windows == 2 and updates[-1]["done"]
+    assert 1.4 < updates[-1]["audio_sec"] < 2.0   # stopped well before the 10 s recording ended
+    assert s.push(y[:sr]) == []
+
+
+def test_stream_websocket(monkeypatch):
+    from backend.app.routes import ml_stream
+    pipe = windowed_pipeline()
+    monkeypatch.setattr(ml_stream, "get_serving_model", lambda info: (pipe, None, CLASSES))
+    app = FastAPI()
+    app.include_router(ml_stream.router)
+
+    pcm = (np.random.default_rng(2).standard_normal(3 * 16000) * 3000).astype("<i2").tobytes()
+    with TestClient(app).websocket_connect("/ml/stream?sr=16000&exit_conf=0") as ws:
+        for i in range(0, len(pcm), 6400):
+            ws.send_bytes(pcm[i:i + 6400])
+        ws.send_text("end")
+        msgs = []
+        while not msgs or msgs[-1]["type"] != "final":
+            msgs.append(ws.receive_json())
+    assert [m["type"] for m in msgs[:-1]] == ["partial"] * (len(msgs) - 1)
+    assert msgs[-1]["reason"] == "end" and msgs[-1]["species"] in CLASSES.values()
+
+
+def test_stream_stops_at_max_duration():
+    pipe = windowed_pipeline()
+    s = StreamScorer(pipe, CLASSES, in_sr=P.PANN_SR, exit_conf=0, max_sec=3.0)
+    y = np.random.default_rng(3).standard_normal(10 * P.PANN_SR).astype(np.float32) * 0.1
+    updates = []
+    for chunk in np.array_split(y, 20):
+        updates += s.push(chunk)
+
+    assert s.max_windows == 5 and s.n_windows == 5         # 1 s windows, 0.5 s hop, 3 s of audio
+    assert updates[-1]["done"] and updates[-1]["reason"] == "max_duration"
+    assert s.push(y[:P.PANN_SR]) == [] and s.finish()["reason"] == "max_duration"
+    expected = pipe.clip_probs(pipe.score_wave(y[:3 * P.PANN_SR])[1])
+    assert np.isclose(updates[-1]["confidence"], expected.max(), atol=1e-5)
@@ -0,0 +1,68 @@
+# tests/test_truncate_cnn14.py
+# Reduced CNN14 extractors: truncation matches CNN14's own blocks, L1 channel
+# pruning keeps shapes consistent, and a written checkpoint serves through
+# from_pretrained.
+
+import numpy as np
+import torch
+
+from backend.benchmarks.predictor_bench import _random_cnn14
+from backend.model import Predictor as P
+from backend.model.TruncateCNN14 import evaluate, reduce_cnn14, train_head, write_checkpoint
+
+
+def _mel(cnn14, x):
+    mel = cnn14.logmel_extractor(cnn14.spectrogram_extractor(x))
+    return cnn14.bn0(mel.transpose(1, 3)).transpose(1, 3)
+
+
+def test_truncated_trunk_matches_cnn14_blocks():
+    cnn14 = _random_cnn14()
+    x = 0.1 * torch.randn(2, P.PANN_SR)
+    with torch.no_grad():
+        h = _mel(cnn14, x)
+        for i in range(3):
+            h = getattr(cnn14, f"conv_block{i + 1}")(h, pool_size=(2, 2), pool_type="avg")
+        h = torch.mean(h, dim=3)
+        want = torch.max(h, dim=2)[0] + torch.mean(h, dim=2)
+    ext = reduce_cnn14(cnn14, depth=3)
+    got = ext(x)["embedding"]
+    assert ext.channels == [64, 128, 256]
+    assert torch.allclose(got, want, atol=1e-5)
+
+
+def test_pruned_trunk_shapes():
+    cnn14 = _random_cnn14()
+    ext = reduce_cnn14(cnn14, depth=4, keep=0.5)
+    assert ext.channels == [32, 64, 128, 256]
+    assert ext.blocks[1].conv1.weight.shape == (64, 32, 3, 3)
+    assert ext(0.1 * torch.randn(1, P.PANN_SR))["embedding"].shape == (1, 256)
+    # kept filters are the largest by L1 norm
+    norms = cnn14.conv_block1.conv1.weight.abs().sum(dim=(1, 2, 3))
+    kept = ext.blocks[0].conv1.weight.abs().sum(dim=(1, 2, 3))
+    assert kept.min() >= torch.sort(norms, descending=True).values[31] - 1e-6
+
+
+def test_reduced_checkpoint_serves(tmp_path):
+    ext = reduce_cnn14(_random_cnn14(), depth=3, keep=0.5)
+    rng = np.random.default_rng(0)
+    emb = rng.standard_normal((24, 128)).astype(np.float32)
+    labels = np.arange(24) % 2
+    head = train_head(emb + labels[:, None], labels, num_classes=2, epochs=5)
+    win_acc, clip_acc = evaluate(head, emb + labels[:, None], labels, np.arange(24) // 3,
+                                 P._inference_cfg({}))
+    assert 0.0 <= win_acc <= 1.0 and 0.0 <= clip_acc <= 1.0
+
+    cfg = {"inference": {"mode": "windowed"}}
+    write_checkpoint(tmp_path, ext, head, {"a": 0, "b": 1}, cfg, {"depth": 3, "keep": 0.5})
+    pipe, _, idx_to_class = P.from_pretrained(str(tmp_path))
+    assert isinstance(pipe.extractor, P.ReducedCnn14) and pipe.embed_dim == 128
+    assert idx_to_class == {0: "a", 1: "b"}
+
+    y = (0.1 * rng.standard_normal(5 * P.PANN_SR)).astype(np.float32)
+    emb, logits = pipe.score_wave(y)
+    assert emb.shape == (4, 128) and logits.shape == (4, 2)
+    # shared log-mel front end == re-running the STFT per window
+    win, hop = pipe._win_hop()
+    emb_per_window, _ = pipe.score_windows(P._frame_windows(y, win, hop))
+    assert torch.allclose(emb, emb_per_window, atol=1e-3)
@@ -0,0 +1,93 @@
+# tests/test_vector_index.py
+# IVF-PQ embedding index (backend/model/vector_index.py) on small clustered data.
+
+import numpy as np
+import pytest
+
+from backend.model.vector_index import VectorIndex
+
+
+def clustered(n, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((20, dim)).astype(np.float32)
+    return centers[rng.integers(0, 20, n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+
+
+def exact_topk(x, q, k):
+    xn = x / np.linalg.norm(x, axis=1, keepdims=True)
+    return list(np.argsort(-(xn @ (q / np.linalg.norm(q))))[:k])
+
+
+def test_exact_then_ivf_pq_survives_reopen(tmp_path):
+    x = clustered(3000, 64)
+    ids = [f"r{i}" for i in range(len(x))]
+    idx = VectorIndex(str(tmp_path), dim=64, pq_m=8, train_at=0, nprobe=8)
+    idx.add_many(ids[:2000], x[:2000])
+
+    q = x[7] + 0.1
+    hits = idx.search(q, k=5)
+    assert [h[0] for h in hits] == [ids[i] for i in exact_topk(x[:2000], q, 5)]   # untrained: exact
+    assert hits[0][1] <= hits[-1][1]
+
+    idx.train(nlist=16)
+    idx.add_many(ids[2000:], x[2000:])                      # incremental inserts after training
+    idx.close()
+
+    idx = VectorIndex(str(tmp_path), nprobe=8)
+    assert len(idx) == 3000 and idx.trained
+    recall = []
+    for i in range(0, 3000, 150):
+        got = {h[0] for h in idx.search(x[i], k=10)}
+        recall.append(len(got & {ids[j] for j in exact_topk(x, x[i], 10)}) / 10)
+    assert np.mean(recall) >= 0.9
+    assert idx.search(x[2500], k=1, exclude=["nobody"])[0][0] == "r2500"
+    assert "r2500" not in {h[0] for h in idx.search(x[2500], k=5, exclude=["r2500"])}
+
+
+def test_readd_replaces_vector(tmp_path):
+    x = clustered(300, 64, seed=1)
+    idx = VectorIndex(str(tmp_path), dim=64, pq_m=8, train_at=200)
+    idx.add_many([f"r{i}" for i in range(300)], x)          # crosses train_at: trains itself
+    assert idx.trained
+    idx.add("r0", x[299])
+    assert len(idx) == 300
+    assert {h[0] for h in idx.search(x[299], k=2)} == {"r0", "r299"}
+
+
+def test_index_is_keyed_by_extractor(tmp_path, monkeypatch):
+    monkeypatch.setenv("FROGNET_INDEX_DIR", str(tmp_path))
+    x = clustered(10, 64)
+    full = VectorIndex.from_env("unused", dim=64, ident="Cnn14|sr=32000")
+    full.add_many([f"r{i}" for i in range(10)], x)
+    full.close()
+
+    reduced = VectorIndex.from_env("unused", dim=16, ident="ReducedCnn14:d2|sr=32000")
+    assert reduced.dim == 16 and len(reduced) == 0 and reduced.root != full.root
+    reduced.add("r0", x[0, :16])
+    reduced.close()
+    assert len(VectorIndex.from_env("unused", dim=64, ident="Cnn14|sr=32000")) == 10
+
+    with pytest.raises(ValueError, match="extractor"):
+        VectorIndex(str(full.root), ident="ReducedCnn14:d2|sr=32000")
+    with pytest.raises(ValueError, match="16-d"):
+        VectorIndex(str(full.root), dim=16)
+
+
+def test_rows_replaced_during_training_get_fresh_codes(tmp_path):
+    x = clustered(300, 64, seed=2)
+    idx = VectorIndex(str(tmp_path), dim=64, pq_m=8, train_at=0)
+    idx.add_many([f"r{i}" for i in range(300)], x)
+    encode, calls = idx._pq_encode, []
+
+    def encode_then_insert(vecs, pq=None):
+        codes = encode(vecs, pq)
+        if not calls:
+            idx.add("r0", x[299])           # lands after train encoded the old r0
+        calls.append(1)
+        return codes
+
+    idx._pq_encode = encode_then_insert
+    idx.train(nlist=8)
+    r0, r299 = idx._rows["r0"], idx._rows["r299"]
+    assert (idx._codes[r0] == idx._codes[r299]).all() and idx._assign[r0] == idx._assign[r299]
+    assert {h[0] for h in idx.search(x[299], k=2, nprobe=8)} == {"r0", "r299"}